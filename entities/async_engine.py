@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Async Simulation Engine
+Posts device telemetry concurrently over a bounded aiohttp connection pool,
+reusing TelemetrySimulator's sensor models for payloads. Like the sync loop,
+it sends one phase-spread slot of devices per deadline (see
+scheduler.PhaseSchedule), and reports stats per interval.
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import aiohttp
+
+from metrics import TICK_DURATION, TICK_LAG, observe_request
+from scheduler import DEVICE_PERIODS, SKIP, SLOT_SECONDS, DeadlineTicker, PhaseSchedule
+
+DEFAULT_CONCURRENCY = 200  # Max in-flight requests
+DEFAULT_INTERVAL = 10  # Seconds between ticks
+JSON_HEADERS = {"Content-Type": "application/json"}
+TELEMETRY_ENDPOINT = "/api/v1/{token}/telemetry"
+
+
+class AsyncSimulationEngine:
+    def __init__(self, simulator, concurrency=DEFAULT_CONCURRENCY, interval=DEFAULT_INTERVAL, timeout=30,
+                 tick_callback=None, verbose=True, latency=None, policy=SKIP, slot_seconds=SLOT_SECONDS,
+                 periods=DEVICE_PERIODS):
+        self.simulator = simulator
+        self.url = simulator.url.rstrip("/")
+        self.concurrency = concurrency
+        self.interval = interval
+        self.timeout = timeout
+        self.tick_callback = tick_callback  # Called with each tick's stats
+        self.verbose = verbose
+        self.latency = latency  # Optional LatencyHistogram fed with every request's round trip
+        self.policy = policy  # What to do with slots missed while behind (see scheduler.DeadlineTicker)
+        self.slot_seconds = slot_seconds  # Devices are spread across the interval in slots this long
+        self.periods = periods  # Per-type reporting periods overriding the interval
+        self.history = []  # Per-tick stats, each summed over one interval's slots
+
+    def build_schedule(self):
+        """Spread devices across their reporting period (see scheduler.PhaseSchedule)"""
+        return PhaseSchedule(
+            ((name, info['type']) for name, info in self.simulator.device_tokens.items()),
+            self.interval, self.periods, self.slot_seconds
+        )
+
+    def iter_payloads(self, device_names=None):
+        """Yield (device name, access token, payload) for every simulated device, or only the named ones"""
+        device_tokens = self.simulator.device_tokens
+        for device_name, _, telemetry in self.simulator.iter_device_telemetry(device_names):
+            yield device_name, device_tokens[device_name]['token'], telemetry
+
+    async def _worker(self, session, payloads, stats):
+        """Drain the shared payload iterator, one request at a time"""
+        latency = self.latency
+        for device_name, token, telemetry in payloads:
+            body = json.dumps(telemetry)
+            started = time.perf_counter()
+            try:
+                async with session.post(
+                    f"{self.url}/api/v1/{token}/telemetry",
+                    data=body,
+                    headers=JSON_HEADERS
+                ) as response:
+                    await response.read()
+                    seconds = time.perf_counter() - started
+                    observe_request("POST", TELEMETRY_ENDPOINT, response.status, len(body), seconds)
+                    if latency is not None:
+                        latency.record(seconds)
+                    if response.status == 200:
+                        stats["sent"] += 1
+                        self.simulator.record_sent(device_name, telemetry)
+                    else:
+                        stats["failed"] += 1
+                if response.status == 401:
+                    # Credentials changed: refresh this device's token for the next tick
+                    await asyncio.to_thread(self.simulator.refresh_device_token, token)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                observe_request("POST", TELEMETRY_ENDPOINT, "error", len(body), time.perf_counter() - started)
+                stats["failed"] += 1
+
+    async def run_tick(self, session, device_names, stats, field_telemetry=False):
+        """Send one slot of device telemetry (and the field telemetry, once per interval) into a tick's stats"""
+        start = time.perf_counter()
+        if device_names:
+            payloads = self.iter_payloads(device_names)
+            # A fixed pool of workers bounds concurrency without one task per device
+            workers = min(self.concurrency, len(device_names))
+            await asyncio.gather(*(self._worker(session, payloads, stats) for _ in range(workers)))
+        stats["device_seconds"] += time.perf_counter() - start
+
+        if field_telemetry and self.simulator.asset_ids:
+            await asyncio.to_thread(self.simulator.send_field_telemetry, False)
+
+        elapsed = time.perf_counter() - start
+        stats["elapsed"] += elapsed
+        stats["overrun"] += max(0.0, elapsed - self.slot_seconds)
+
+    def finish_tick(self, iteration, stats):
+        """Record one interval's stats, summed over its slots"""
+        requests_made = stats["sent"] + stats["failed"]
+        stats["requests_per_second"] = requests_made / stats["device_seconds"] if stats["device_seconds"] else 0.0
+        TICK_DURATION.observe(stats["elapsed"])
+        self.history.append(stats)
+        if self.tick_callback:
+            self.tick_callback(stats)
+
+        if self.verbose:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] Tick {iteration}: {stats['sent']} ok, {stats['failed']} failed "
+                  f"in {stats['elapsed']:.2f}s ({stats['requests_per_second']:.0f} req/s, "
+                  f"overrun {stats['overrun']:.2f}s)")
+            if stats["overrun"] > 0:
+                print(f"⚠ Tick {iteration} overran its {self.slot_seconds:g}s slots by {stats['overrun']:.2f}s")
+
+    async def run_async(self, ticks=None):
+        """Run ticks until stopped (or for a fixed number of ticks), one slot of phase-spread devices at a time"""
+        schedule = self.build_schedule()
+        slots_per_interval = max(1, round(self.interval / self.slot_seconds)) if self.slot_seconds > 0 else 1
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Slots start on absolute deadlines, so time spent sending never accumulates as drift
+            ticker = DeadlineTicker(self.slot_seconds, self.policy)
+            iteration = 0
+            tick, stats = None, None  # Interval being sent and its stats so far
+            while ticks is None or iteration < ticks:
+                slot, lag, skipped = await ticker.wait_async()
+                TICK_LAG.observe(lag)
+                if skipped and self.verbose:
+                    print(f"⚠ Skipped {skipped} slot(s) while behind schedule")
+                if stats is not None and slot // slots_per_interval != tick:
+                    # Skipped past the end of the interval
+                    iteration += 1
+                    self.finish_tick(iteration, stats)
+                    stats = None
+                    if ticks is not None and iteration >= ticks:
+                        break
+                first = stats is None
+                if first:
+                    tick = slot // slots_per_interval
+                    stats = {"sent": 0, "failed": 0, "device_seconds": 0.0, "elapsed": 0.0, "overrun": 0.0,
+                             "lag": 0.0}
+                stats["lag"] = max(stats["lag"], lag)
+                await self.run_tick(session, schedule.due(slot), stats, field_telemetry=first)
+                if slot % slots_per_interval == slots_per_interval - 1:
+                    iteration += 1
+                    self.finish_tick(iteration, stats)
+                    stats = None
+        return self.history
+
+    def run(self, ticks=None):
+        """Run the engine from synchronous code"""
+        print("\n" + "="*60)
+        print("Starting Async Telemetry Simulation")
+        print("="*60)
+        print(f"Sending telemetry for {len(self.simulator.device_tokens)} devices every {self.interval} seconds")
+        print(f"Devices spread over {self.slot_seconds:g}s slots; concurrency limit: {self.concurrency}")
+        print("Press Ctrl+C to stop\n")
+
+        try:
+            return asyncio.run(self.run_async(ticks))
+        except KeyboardInterrupt:
+            print("\n\n" + "="*60)
+            print("✓ Simulation stopped by user")
+            print("="*60 + "\n")
+            return self.history
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Historical Telemetry Backfill
+Generates past telemetry with TelemetrySimulator's sensor models and uploads
+it as timestamped arrays, one device per worker. Records are streamed and
+sent in fixed-size chunks, so memory does not grow with the time span.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from tb_client import iter_chunks
+
+BACKFILL_CHUNK_SIZE = 1000  # Records per upload request
+BACKFILL_WORKERS = 8  # Devices uploaded in parallel
+
+
+def iter_device_history(simulator, device_name, device_type, start_ms, end_ms, period_ms):
+    """Yield {ts, values} records for one device between start and end"""
+    ts = start_ms
+    while ts < end_ms:
+        values = simulator.simulate_device(device_name, device_type)
+        if values is None:
+            return
+        yield {"ts": ts, "values": values}
+        ts += period_ms
+
+
+class BackfillProgress:
+    def __init__(self, total_devices, points_per_device):
+        self.lock = threading.Lock()
+        self.total_devices = total_devices
+        self.total_points = total_devices * points_per_device
+        self.devices_done = 0
+        self.points = 0
+        self.failed_chunks = 0
+        self.start = time.perf_counter()
+
+    def add(self, points=0, failed=0, device_done=False):
+        with self.lock:
+            self.points += points
+            self.failed_chunks += failed
+            if device_done:
+                self.devices_done += 1
+
+    def points_per_second(self):
+        elapsed = time.perf_counter() - self.start
+        return self.points / elapsed if elapsed else 0.0
+
+    def line(self):
+        percent = 100.0 * self.points / self.total_points if self.total_points else 100.0
+        return (f"  {self.points}/{self.total_points} points ({percent:.1f}%), "
+                f"{self.devices_done}/{self.total_devices} devices, "
+                f"{self.points_per_second():.0f} points/sec, {self.failed_chunks} failed chunks")
+
+
+def backfill_device(simulator, device_name, start_ms, end_ms, period_ms, chunk_size, progress):
+    device_info = simulator.device_tokens[device_name]
+    records = iter_device_history(simulator, device_name, device_info['type'], start_ms, end_ms, period_ms)
+    for chunk in iter_chunks(records, chunk_size):
+        if simulator.send_telemetry(device_info['token'], chunk):
+            progress.add(points=len(chunk))
+        else:
+            progress.add(failed=1)
+    progress.add(device_done=True)
+
+
+def run_backfill(simulator, start, end, period_seconds, workers=BACKFILL_WORKERS, chunk_size=BACKFILL_CHUNK_SIZE):
+    """Backfill every simulated device from start to end (datetimes)"""
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = int(end.timestamp() * 1000)
+    period_ms = int(period_seconds * 1000)
+    points_per_device = max(0, math.ceil((end_ms - start_ms) / period_ms))
+    progress = BackfillProgress(len(simulator.device_tokens), points_per_device)
+
+    print("\n" + "="*60)
+    print("Starting Telemetry Backfill")
+    print("="*60)
+    print(f"{start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M}, one sample every {period_seconds}s")
+    print(f"{progress.total_devices} devices × {points_per_device} samples, "
+          f"{workers} workers, {chunk_size} samples per request\n")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {
+            pool.submit(backfill_device, simulator, name, start_ms, end_ms, period_ms, chunk_size, progress)
+            for name in simulator.device_tokens
+        }
+        while pending:
+            done, pending = wait(pending, timeout=1.0)
+            for future in done:
+                future.result()
+            print(progress.line())
+
+    print("\n" + "="*60)
+    print(f"✓ Backfill complete: {progress.points} points at {progress.points_per_second():.0f} points/sec")
+    print("="*60 + "\n")
+    return progress
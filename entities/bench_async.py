@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Async Engine Benchmark
+Runs AsyncSimulationEngine over a synthetic fleet against a local stub
+ThingsBoard and reports achieved requests/sec and tick overrun.
+
+Pass --url to target an external stub (e.g. `python3 tb_stub_server.py`
+in another terminal) so the server does not share this process's core.
+"""
+
+import argparse
+import asyncio
+import random
+
+from async_engine import AsyncSimulationEngine
+from simulate_telemetry import TelemetrySimulator
+from tb_stub_server import StubThingsBoardServer
+
+DEVICE_TYPES = ["SI Soil Moisture Sensor"] * 8 + ["SI Water Meter", "SI Smart Valve"]
+
+
+def populate_fleet(simulator, fleet_size):
+    """Fill the simulator with synthetic devices of mixed types"""
+    simulator.device_tokens.clear()
+    simulator.moisture_trends.clear()
+    simulator.device_names_by_id.clear()
+    for i in range(fleet_size):
+        device_type = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        name = f"Bench Device {i}"
+        simulator.device_tokens[name] = {'token': f"BENCH_TOKEN_{i}", 'type': device_type, 'id': f"bench-{i}"}
+        simulator.device_names_by_id[f"bench-{i}"] = name
+        if device_type == 'SI Soil Moisture Sensor':
+            simulator.moisture_trends[name] = random.randint(50, 70)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the async simulation engine")
+    parser.add_argument("--url", help="external stub URL (default: start one in-process)")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=10)
+    parser.add_argument("--ticks", type=int, default=2)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        server = StubThingsBoardServer().start()
+        url = server.url
+
+    simulator = TelemetrySimulator(url, "tenant@thingsboard.org", "tenant")
+    summary = []
+    for fleet_size in args.devices:
+        populate_fleet(simulator, fleet_size)
+        print(f"\nFleet of {fleet_size} devices, concurrency {args.concurrency}, interval {args.interval}s")
+        print("-" * 60)
+        # One slot per interval and no per-type periods: the whole fleet per tick, to measure peak throughput
+        engine = AsyncSimulationEngine(simulator, concurrency=args.concurrency, interval=args.interval,
+                                       slot_seconds=args.interval, periods={})
+        history = asyncio.run(engine.run_async(args.ticks))
+        best = max(history, key=lambda s: s["requests_per_second"])
+        worst_overrun = max(s["overrun"] for s in history)
+        summary.append((fleet_size, best["requests_per_second"], worst_overrun,
+                        sum(s["failed"] for s in history)))
+
+    print("\n" + "="*60)
+    print(f"{'devices':>10} {'req/s':>10} {'max overrun':>12} {'errors':>8}")
+    for fleet_size, rate, overrun, errors in summary:
+        print(f"{fleet_size:>10} {rate:>10.0f} {overrun:>11.2f}s {errors:>8}")
+    print("="*60 + "\n")
+
+    if server:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+ThingsBoard Client Micro-Benchmark
+Compares per-call `requests.post` (new connection every request) against the
+pooled ThingsBoardClient, posting device telemetry to a local stub server.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tb_client import ThingsBoardClient
+from tb_stub_server import StubThingsBoardServer
+
+# Configuration
+REQUESTS_PER_RUN = 2000
+THREADS = 8
+POOL_SIZE = 8
+
+TELEMETRY = {"moisture": 55.3, "battery": 91}
+
+
+def bench(label, send, threads):
+    """Run REQUESTS_PER_RUN sends and print throughput"""
+    start = time.perf_counter()
+    if threads == 1:
+        ok = sum(1 for i in range(REQUESTS_PER_RUN) if send(i))
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            ok = sum(1 for result in pool.map(send, range(REQUESTS_PER_RUN)) if result)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {REQUESTS_PER_RUN / elapsed:>10.0f} req/s  ({ok}/{REQUESTS_PER_RUN} ok, {elapsed:.2f}s)")
+    return REQUESTS_PER_RUN / elapsed
+
+
+def main():
+    with StubThingsBoardServer() as server:
+        client = ThingsBoardClient(server.url, "tenant@thingsboard.org", "tenant", pool_size=POOL_SIZE)
+
+        def bare_send(i):
+            response = requests.post(f"{server.url}/api/v1/TOKEN_{i % 100}/telemetry", json=TELEMETRY)
+            return response.status_code == 200
+
+        def pooled_send(i):
+            return client.send_telemetry(f"TOKEN_{i % 100}", TELEMETRY)
+
+        print("\n" + "="*60)
+        print(f"Client benchmark: {REQUESTS_PER_RUN} telemetry posts against {server.url}")
+        print("="*60)
+        for threads in (1, THREADS):
+            print(f"\n{threads} thread(s):")
+            bare = bench("requests.post (per call)", bare_send, threads)
+            pooled = bench(f"ThingsBoardClient (pool={POOL_SIZE})", pooled_send, threads)
+            print(f"  speedup: {pooled / bare:.2f}x")
+        print()
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Export Reader Benchmark
+Compares json.load against the streaming ExportReader on the export tree in
+the repository root and on a synthetic tenant-scale dashboard built by
+repeating the widgets of the busiest exported dashboard. Reports wall time
+and peak Python allocations (tracemalloc) for reading every datasource;
+pages of the memory-mapped file are page cache, not process heap.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+from export_index import EXPORT_ROOT, iter_json_files, parse_export
+from export_stream import ExportReader
+
+SYNTHETIC_WIDGETS = 5000
+REPEATS = 3  # Timings take the best run
+
+
+def measure(run, repeats=REPEATS):
+    """Return (best seconds, peak traced bytes); timed without tracemalloc, which slows allocation-heavy code"""
+    elapsed = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        elapsed = min(elapsed or float("inf"), time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def load_tree(paths):
+    def run():
+        for path in paths:
+            with open(path, "rb") as f:
+                json.load(f)
+    return run
+
+
+def stream_tree(paths, use_mmap):
+    def run():
+        for path in paths:
+            with ExportReader(path, use_mmap) as reader:
+                parse_export(path, reader)
+    return run
+
+
+def load_datasources(path):
+    def run():
+        with open(path, "rb") as f:
+            document = json.load(f)
+        for widget in document["entity"]["configuration"]["widgets"].values():
+            for _ in widget["config"].get("datasources") or []:
+                pass
+    return run
+
+
+def stream_datasources(path, use_mmap):
+    def run():
+        with ExportReader(path, use_mmap) as reader:
+            for _ in reader.iter_datasources():
+                pass
+    return run
+
+
+def busiest_dashboard(root):
+    """Path of the exported dashboard with the most widgets"""
+    counts = []
+    for path, _ in iter_json_files(root):
+        if path.startswith("dashboard"):
+            with ExportReader(os.path.join(root, path)) as reader:
+                widgets = reader.find("configuration", "widgets", pos=reader.entity())
+                count = sum(1 for _ in reader.iter_members(widgets)) if widgets is not None else 0
+            counts.append((count, path))
+    return os.path.join(root, max(counts)[1])
+
+
+def write_synthetic_dashboard(template_path, widgets, path):
+    """Write a dashboard with `widgets` copies of the template's widgets, one widget at a time"""
+    with ExportReader(template_path) as reader:
+        templates = [widget for _, widget in reader.iter_widgets()]
+    with open(path, "w") as f:
+        f.write('{\n  "entityType" : "DASHBOARD",\n  "entity" : {\n    "configuration" : {\n      "widgets" : {')
+        for i in range(widgets):
+            widget = dict(templates[i % len(templates)], id=str(uuid.UUID(int=i)))
+            f.write("," if i else "")
+            f.write(f'\n        "{widget["id"]}" : {json.dumps(widget, indent=2)}')
+        f.write('\n      }\n    },\n    "title" : "Synthetic"\n  },\n  "relations" : [ ]\n}\n')
+    return os.path.getsize(path)
+
+
+def print_row(label, elapsed, peak, baseline=None):
+    speed = f"{baseline[0] / elapsed:>6.2f}x" if baseline else f"{'':>7}"
+    memory = f"{baseline[1] / peak:>7.0f}x" if baseline and peak else f"{'':>8}"
+    print(f"  {label:<28} {elapsed * 1000:>9.1f} ms {speed} {peak / (1024 * 1024):>9.1f} MB {memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark json.load against the streaming export reader")
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree (default: repository root)")
+    parser.add_argument("--widgets", type=int, default=SYNTHETIC_WIDGETS,
+                        help="widgets in the synthetic dashboard (0 skips it)")
+    args = parser.parse_args()
+    header = f"  {'reader':<28} {'time':>12} {'speed':>7} {'peak heap':>12} {'memory':>8}"
+
+    paths = [os.path.join(args.root, path) for path, _ in iter_json_files(args.root)]
+    size = sum(os.path.getsize(path) for path in paths)
+    print("\n" + "=" * 72)
+    print(f"EXPORT TREE: {len(paths)} files, {size / (1024 * 1024):.1f} MB (index rows from every file)")
+    print("=" * 72)
+    print(header)
+    baseline = measure(load_tree(paths))
+    print_row("json.load", *baseline)
+    print_row("ExportReader (read)", *measure(stream_tree(paths, False)), baseline)
+    print_row("ExportReader (mmap)", *measure(stream_tree(paths, True)), baseline)
+
+    if args.widgets:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "synthetic_dashboard.json")
+            size = write_synthetic_dashboard(busiest_dashboard(args.root), args.widgets, path)
+            print("\n" + "=" * 72)
+            print(f"SYNTHETIC DASHBOARD: {args.widgets} widgets, {size / (1024 * 1024):.1f} MB (every datasource)")
+            print("=" * 72)
+            print(header)
+            baseline = measure(load_datasources(path))
+            print_row("json.load", *baseline)
+            print_row("ExportReader (read)", *measure(stream_datasources(path, False)), baseline)
+            print_row("ExportReader (mmap)", *measure(stream_datasources(path, True)), baseline)
+    print("=" * 72)
+    print("speed and memory are relative to json.load (higher is better)\n")
+
+
+if __name__ == "__main__":
+    main()
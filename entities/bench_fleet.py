@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Fleet Model Benchmark
+Compares per-tick CPU time and memory per device of the dict-based sensor
+models in TelemetrySimulator against the vectorized FleetState.
+No server is needed: the simulator is built without logging in.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from fleet_model import FleetState
+from simulate_telemetry import TelemetrySimulator
+
+DEVICE_TYPES = ["SI Soil Moisture Sensor"] * 8 + ["SI Water Meter", "SI Smart Valve"]
+
+
+def build_dict_fleet(fleet_size):
+    """Build a simulator holding only the per-device dicts"""
+    simulator = TelemetrySimulator.__new__(TelemetrySimulator)
+    simulator.device_tokens = {}
+    simulator.moisture_trends = {}
+    simulator.device_fields = {}
+    simulator.fleet = None
+    for i in range(fleet_size):
+        device_type = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        name = f"Bench Device {i}"
+        simulator.device_tokens[name] = {'token': f"BENCH_TOKEN_{i}", 'type': device_type, 'id': f"bench-{i}"}
+        if device_type == 'SI Soil Moisture Sensor':
+            simulator.moisture_trends[name] = random.randint(50, 70)
+    return simulator
+
+
+def measure_memory(build):
+    """Return (object, bytes allocated while building it)"""
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def cpu_per_tick(tick, ticks):
+    start = time.process_time()
+    for _ in range(ticks):
+        tick()
+    return (time.process_time() - start) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dict vs NumPy fleet state")
+    parser.add_argument("--devices", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--ticks", type=int, default=5)
+    args = parser.parse_args()
+
+    print("\n" + "="*72)
+    print(f"{'devices':>9} {'model':>6} {'state/tick':>12} {'+payloads/tick':>15} {'bytes/device':>14}")
+    print("="*72)
+    for fleet_size in args.devices:
+        simulator, dict_bytes = measure_memory(lambda: build_dict_fleet(fleet_size))
+
+        def dict_tick():
+            for name, info in simulator.device_tokens.items():
+                simulator.simulate_device(name, info['type'])
+
+        # The dict models build their payloads while updating state
+        dict_cpu = cpu_per_tick(dict_tick, args.ticks)
+        print(f"{fleet_size:>9} {'dict':>6} {dict_cpu * 1000:>10.1f}ms {dict_cpu * 1000:>13.1f}ms "
+              f"{dict_bytes / fleet_size:>14.0f}")
+
+        fleet, _ = measure_memory(
+            lambda: FleetState.from_device_tokens(simulator.device_tokens, simulator.moisture_trends)
+        )
+        step_cpu = cpu_per_tick(fleet.step, args.ticks)
+
+        def numpy_tick():
+            fleet.step()
+            for _ in fleet.iter_payloads():
+                pass
+
+        full_cpu = cpu_per_tick(numpy_tick, args.ticks)
+        # Names are shared with the dict model; count only the added state
+        print(f"{fleet_size:>9} {'numpy':>6} {step_cpu * 1000:>10.1f}ms {full_cpu * 1000:>13.1f}ms "
+              f"{fleet.nbytes() / fleet_size:>14.0f}")
+    print("="*72)
+    print("bytes/device: dict = all per-device dicts; numpy = array state only\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Gateway Transport Benchmark
+Sweeps the gateway batch size for a synthetic fleet against the stub's MQTT
+listener and compares messages per tick and device updates/sec.
+"""
+
+import argparse
+import time
+
+from bench_async import populate_fleet
+from simulate_telemetry import GatewayTransport, TelemetrySimulator
+from tb_stub_server import StubThingsBoardServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gateway batch sizes")
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=3)
+    args = parser.parse_args()
+
+    with StubThingsBoardServer(mqtt_port=0) as server:
+        simulator = TelemetrySimulator(server.url, "tenant@thingsboard.org", "tenant")
+        populate_fleet(simulator, args.devices)
+
+        print("\n" + "="*60)
+        print(f"Gateway benchmark: {args.devices} devices, {args.ticks} ticks per batch size")
+        print("="*60)
+        print(f"{'batch':>8} {'msgs/tick':>10} {'updates/s':>12} {'tick time':>10}")
+        for batch_size in args.batch_sizes:
+            gateway = GatewayTransport(server.host, "GATEWAY_TOKEN", port=server.mqtt_port, batch_size=batch_size)
+            start = time.perf_counter()
+            total_updates = total_messages = 0
+            for _ in range(args.ticks):
+                updates, messages = gateway.send_tick(simulator.iter_device_telemetry())
+                total_updates += updates
+                total_messages += messages
+            elapsed = time.perf_counter() - start
+            gateway.close()
+            print(f"{batch_size:>8} {total_messages // args.ticks:>10} "
+                  f"{total_updates / elapsed:>12.0f} {elapsed / args.ticks:>9.3f}s")
+        print(f"\nStub received {server.mqtt_messages} messages, "
+              f"{server.gateway_device_updates} device updates")
+        print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Sharded Simulator Benchmark
+Runs the same synthetic fleet with 1, 2, 4... shards against a pool of stub
+server processes sharing one port, and reports how throughput scales.
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+
+from bench_async import populate_fleet
+from sharded_simulator import ShardCoordinator
+from simulate_telemetry import TelemetrySimulator
+from tb_stub_server import serve_forever
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded simulation scaling")
+    parser.add_argument("--devices", type=int, default=20000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--stub-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=3)
+    args = parser.parse_args()
+
+    port = free_port()
+    context = multiprocessing.get_context("spawn")
+    stubs = [
+        context.Process(target=serve_forever, args=(port, None, True, True), daemon=True)
+        for _ in range(args.stub_processes)
+    ]
+    for stub in stubs:
+        stub.start()
+    time.sleep(1.0)
+
+    url = f"http://127.0.0.1:{port}"
+    simulator = TelemetrySimulator(url, "tenant@thingsboard.org", "tenant")
+    populate_fleet(simulator, args.devices)
+
+    results = []
+    for shards in args.shards:
+        # interval=0 and slot_seconds=0: each shard sends whole-fleet ticks back to back, so we measure capacity
+        coordinator = ShardCoordinator(simulator, "tenant@thingsboard.org", "tenant", shards,
+                                       concurrency=args.concurrency, interval=0, ticks=args.ticks, slot_seconds=0)
+        start = time.perf_counter()
+        totals = coordinator.run()
+        elapsed = time.perf_counter() - start
+        sent = sum(t["sent"] for t in totals)
+        results.append((shards, sent / elapsed, sum(t["failed"] for t in totals)))
+
+    for stub in stubs:
+        stub.terminate()
+
+    print("="*60)
+    print(f"{args.devices} devices, {args.ticks} ticks, {args.stub_processes} stub processes")
+    print(f"{'shards':>8} {'req/s':>10} {'scaling':>9} {'errors':>8}")
+    base = results[0][1]
+    for shards, rate, errors in results:
+        print(f"{shards:>8} {rate:>10.0f} {rate / base:>8.2f}x {errors:>8}")
+    print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Telemetry Ingest Benchmark Suite
+Sweeps fleet size, tick interval, concurrency and gateway batch size, runs
+the simulator against ThingsBoard (or the local stub) for each combination
+and appends one JSON line per configuration to a results file, including
+throughput (device updates/sec), error rate, tick overrun and an HDR-style
+latency histogram.
+Runs from different commits or ThingsBoard setups can be told apart by
+--label and compared from the file.
+
+Batch size 0 sends one HTTP request per device through the async engine;
+a positive batch size publishes through the MQTT gateway API instead, so
+concurrency does not apply to those runs.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from async_engine import AsyncSimulationEngine
+from bench_async import populate_fleet
+from latency_histogram import LatencyHistogram
+from simulate_telemetry import MQTT_PORT, GatewayTransport, TelemetrySimulator
+from tb_stub_server import StubThingsBoardServer
+
+RESULTS_FILE = "bench_results.jsonl"
+GATEWAY_TOKEN = "GATEWAY_TOKEN"  # Any token is accepted by the stub; pass --gateway-token for a real server
+
+
+def current_commit():
+    """Short commit hash of the working tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_http(simulator, concurrency, interval, ticks):
+    """Per-device HTTP posts through the async engine"""
+    latency = LatencyHistogram()
+    # One slot per interval and no per-type periods: the whole fleet per tick, comparable with the gateway run
+    engine = AsyncSimulationEngine(simulator, concurrency=concurrency, interval=interval, verbose=False,
+                                   latency=latency, slot_seconds=interval, periods={})
+    history = asyncio.run(engine.run_async(ticks))
+    sent = sum(s["sent"] for s in history)
+    failed = sum(s["failed"] for s in history)
+    return {
+        "sent": sent,
+        "failed": failed,
+        "throughput": sum(s["sent"] + s["failed"] for s in history) / sum(s["device_seconds"] for s in history),
+        "tick_seconds": [round(s["elapsed"], 4) for s in history],
+        "overrun_seconds": [round(s["overrun"], 4) for s in history]
+    }, latency
+
+
+def run_gateway(simulator, host, mqtt_port, token, batch_size, interval, ticks):
+    """Batched publishes through the MQTT gateway API"""
+    latency = LatencyHistogram()
+    gateway = GatewayTransport(host, token, port=mqtt_port, batch_size=batch_size, latency=latency)
+    sent = failed = 0
+    busy = 0.0
+    tick_seconds = []
+    try:
+        for tick in range(ticks):
+            start = time.perf_counter()
+            try:
+                updates, _ = gateway.send_tick(simulator.iter_device_telemetry())
+                sent += updates
+            except Exception:
+                failed += len(simulator.device_tokens)
+            elapsed = time.perf_counter() - start
+            busy += elapsed
+            tick_seconds.append(elapsed)
+            if tick < ticks - 1:
+                time.sleep(max(0.0, interval - elapsed))
+    finally:
+        gateway.close()
+    return {
+        "sent": sent,
+        "failed": failed,
+        "throughput": (sent + failed) / busy if busy else 0.0,
+        "tick_seconds": [round(t, 4) for t in tick_seconds],
+        "overrun_seconds": [round(max(0.0, t - interval), 4) for t in tick_seconds]
+    }, latency
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep simulator load and record throughput and latency")
+    parser.add_argument("--url", help="ThingsBoard URL (default: start an in-process stub)")
+    parser.add_argument("--username", default="tenant@thingsboard.org")
+    parser.add_argument("--password", default="tenant")
+    parser.add_argument("--mqtt-port", type=int, default=MQTT_PORT, help="gateway MQTT port when --url is given")
+    parser.add_argument("--gateway-token", default=GATEWAY_TOKEN, help="gateway device access token")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--intervals", type=float, nargs="+", default=[10])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[0],
+                        help="0 = one HTTP request per device, N = N devices per gateway message")
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0, help="stub response delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub injected 500 rate")
+    parser.add_argument("--label", default="", help="free-form tag, e.g. the ThingsBoard node size")
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON lines file results are appended to")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    server = None
+    url = args.url
+    mqtt_port = args.mqtt_port
+    if not url:
+        server = StubThingsBoardServer(mqtt_port=0 if any(args.batch_sizes) else None,
+                                       latency_ms=args.latency_ms, error_rate=args.error_rate).start()
+        url = server.url
+        mqtt_port = server.mqtt_port
+
+    run_info = {
+        "run_id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "label": args.label,
+        "commit": current_commit(),
+        "url": url,
+        "python": platform.python_version(),
+        "host": platform.node()
+    }
+
+    simulator = TelemetrySimulator(url, args.username, args.password)
+    results = []
+    print("\n" + "="*60)
+    print(f"Benchmark suite against {url}, {args.ticks} ticks per configuration")
+    print("="*60)
+    print(f"{'devices':>8} {'interval':>8} {'conc':>5} {'batch':>6} {'upd/s':>9} {'err%':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'overrun':>8}")
+
+    try:
+        for fleet_size, interval, batch_size, concurrency in itertools.product(
+                args.devices, args.intervals, args.batch_sizes, args.concurrency):
+            if batch_size and concurrency != args.concurrency[0]:
+                continue  # Gateway runs ignore concurrency; run them once
+            populate_fleet(simulator, fleet_size)
+            if batch_size:
+                stats, latency = run_gateway(simulator, urlsplit(url).hostname, mqtt_port, args.gateway_token,
+                                             batch_size, interval, args.ticks)
+            else:
+                stats, latency = run_http(simulator, concurrency, interval, args.ticks)
+
+            attempts = stats["sent"] + stats["failed"]
+            result = dict(
+                run_info,
+                devices=fleet_size,
+                interval=interval,
+                concurrency=None if batch_size else concurrency,
+                batch_size=batch_size,
+                transport="gateway" if batch_size else "http",
+                ticks=args.ticks,
+                error_rate=stats["failed"] / attempts if attempts else 0.0,
+                max_overrun_seconds=max(stats["overrun_seconds"], default=0.0),
+                latency=latency.to_dict(),
+                **stats
+            )
+            results.append(result)
+            with open(args.output, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+            summary = result["latency"]
+            print(f"{fleet_size:>8} {interval:>8g} {concurrency if not batch_size else '-':>5} {batch_size:>6} "
+                  f"{result['throughput']:>9.0f} {result['error_rate'] * 100:>5.1f}% "
+                  f"{summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} "
+                  f"{result['max_overrun_seconds']:>7.2f}s")
+    finally:
+        simulator.client.close()
+        if server:
+            server.stop()
+
+    print("="*60)
+    print(f"✓ {len(results)} results appended to {args.output}\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
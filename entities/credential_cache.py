@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Device Credential Cache
+Persists device access tokens keyed by device id so a warm restart of the
+simulator can skip fetching credentials for every device.
+"""
+
+import json
+import os
+import threading
+
+
+class CredentialCache:
+    def __init__(self, path, url):
+        self.path = path
+        self.url = url
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load cached tokens; a cache written for another server is ignored"""
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("url") == self.url:
+            self.tokens = data.get("tokens", {})
+
+    def get(self, device_id):
+        return self.tokens.get(device_id)
+
+    def set(self, device_id, token):
+        with self.lock:
+            self.tokens[device_id] = token
+            self.dirty = True
+
+    def invalidate(self, device_id):
+        with self.lock:
+            if self.tokens.pop(device_id, None) is not None:
+                self.dirty = True
+
+    def save(self):
+        """Write the cache atomically if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"url": self.url, "tokens": self.tokens}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
@@ -4,40 +4,103 @@ ThingsBoard Dashboard Diagnostic Tool
 Checks if all required entities exist for the Smart Irrigation dashboard
 """
 
-import requests
+import argparse
 import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from diagnostics_snapshot import DiagnosticsSnapshot
+from fleet_health import SILENT_INTERVALS, TELEMETRY_KEYS, FleetHealth
+from tb_client import ThingsBoardClient
 
 # Configuration
 TB_URL = "http://localhost:8080"  # Change to your ThingsBoard URL
 USERNAME = "tenant@thingsboard.org"  # Change to your username
 PASSWORD = "tenant"  # Change to your password
+DIAGNOSTIC_WORKERS = 16  # Concurrent relation lookups
+SHOW_LIMIT = 10  # Entity names listed per finding
+SNAPSHOT_FILE = ".diagnostics_snapshot.db"  # Results of the last run, so unchanged entities are not re-checked
+SNAPSHOT_MAX_AGE = 3600  # Seconds before a field's cached relations are fetched again
+RECHECK_LIMIT = 500  # Expired fields re-fetched per run, oldest first
+
+DEVICE_TYPES = [
+    "SI Soil Moisture Sensor",
+    "SI Water Meter",
+    "SI Smart Valve"
+]
+REQUIRED_ASSET_ATTRIBUTES = ['cropType', 'maxMoistureThreshold', 'minMoistureThreshold']
+OPTIONAL_ASSET_ATTRIBUTES = ['perimeter', 'criticalAlarmsCount', 'majorAlarmsCount']
+
+
+def latest_value(row, key_type, key):
+    """Value of one key in an entity data query row, or None if it has never been set"""
+    cell = row["latest"].get(key_type, {}).get(key)
+    if cell is None or (key_type != "ENTITY_FIELD" and not cell.get("ts")):
+        return None
+    return cell["value"]
+
+
+def name_of(row):
+    return latest_value(row, "ENTITY_FIELD", "name")
+
+
+def fingerprint(row, key_type, keys):
+    """createdTime plus the update time of each key; changes whenever one of them is rewritten"""
+    cells = row["latest"].get(key_type, {})
+    stamps = ",".join(str(cells.get(key, {}).get("ts") or 0) for key in keys)
+    return f"{latest_value(row, 'ENTITY_FIELD', 'createdTime')}:{stamps}"
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(timestamp)))
+
+
+def examples(names):
+    """First few names of a finding, for printing"""
+    shown = ", ".join(names[:SHOW_LIMIT])
+    if len(names) > SHOW_LIMIT:
+        shown += f" ... and {len(names) - SHOW_LIMIT} more"
+    return shown
+
 
 class DashboardDiagnostics:
-    def __init__(self, url, username, password):
+    def __init__(self, url, username, password, snapshot_path=None, full=False):
+        """With snapshot_path, results are kept in SQLite and only changed entities are re-checked;
+        full=True re-checks everything and rewrites the snapshot."""
         self.url = url
-        self.token = None
-        self.login(username, password)
+        self.client = ThingsBoardClient(url, username, password)
+        print()
         self.issues = []
         self.warnings = []
-
-    def login(self, username, password):
-        """Login to ThingsBoard and get JWT token"""
-        response = requests.post(
-            f"{self.url}/api/auth/login",
-            json={"username": username, "password": password}
-        )
-        if response.status_code == 200:
-            self.token = response.json()["token"]
-            print("✓ Successfully logged in to ThingsBoard\n")
-        else:
-            raise Exception(f"Login failed: {response.text}")
-
-    def get_headers(self):
-        """Get authorization headers"""
-        return {
-            "Content-Type": "application/json",
-            "X-Authorization": f"Bearer {self.token}"
-        }
+        self.freshness = []  # Which results were re-checked and which came from the snapshot
+        self.snapshot = DiagnosticsSnapshot(snapshot_path, url) if snapshot_path else None
+        self.full = full
+        self.previous_run = None if full or self.snapshot is None else self.snapshot.taken_at
+        # Entity data query rows, fetched once and shared by the checks
+        self.assets = None
+        self.devices = None
+
+    def load_assets(self):
+        """Every SI Field with its attributes and latest telemetry, in a few paged queries"""
+        if self.assets is None:
+            self.assets = list(self.client.iter_entity_data(
+                {"type": "assetType", "assetTypes": ["SI Field"]},
+                entity_fields=("name", "createdTime"),
+                timeseries=("avgMoisture", "irrigationState"),
+                attributes=REQUIRED_ASSET_ATTRIBUTES + OPTIONAL_ASSET_ATTRIBUTES
+            ))
+        return self.assets
+
+    def load_devices(self):
+        """Every SI device with its latest moisture and battery readings"""
+        if self.devices is None:
+            self.devices = list(self.client.iter_entity_data(
+                {"type": "deviceType", "deviceTypes": DEVICE_TYPES},
+                entity_fields=("name", "type", "createdTime"),
+                timeseries=("moisture", "battery")
+            ))
+        return self.devices
 
     def check_device_profiles(self):
         """Check if required device profiles exist"""
@@ -50,15 +113,8 @@ class DashboardDiagnostics:
             "SI Smart Valve"
         ]
 
-        response = requests.get(
-            f"{self.url}/api/deviceProfiles",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0}
-        )
-
-        if response.status_code == 200:
-            profiles = response.json()["data"]
-            profile_names = [p["name"] for p in profiles]
+        try:
+            profile_names = {p["name"] for p in self.client.iter_device_profiles()}
 
             for required in required_profiles:
                 if required in profile_names:
@@ -66,8 +122,8 @@ class DashboardDiagnostics:
                 else:
                     print(f"  ✗ {required} - NOT FOUND")
                     self.issues.append(f"Missing device profile: {required}")
-        else:
-            self.issues.append("Failed to fetch device profiles")
+        except Exception as e:
+            self.issues.append(f"Failed to fetch device profiles: {e}")
 
         print()
 
@@ -76,88 +132,93 @@ class DashboardDiagnostics:
         print("[2/6] Checking Assets (SI Field)...")
         print("-" * 60)
 
-        response = requests.get(
-            f"{self.url}/api/tenant/assets",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0, "type": "SI Field"}
-        )
+        try:
+            assets = self.load_assets()
+            for row in assets[:10]:  # Show first 10
+                print(f"    - {name_of(row)}")
 
-        if response.status_code == 200:
-            assets = response.json()["data"]
             if len(assets) == 0:
                 print(f"  ✗ No 'SI Field' assets found")
                 self.issues.append("No SI Field assets exist")
             else:
+                if len(assets) > 10:
+                    print(f"    ... and {len(assets) - 10} more")
                 print(f"  ✓ Found {len(assets)} SI Field asset(s)")
-                for asset in assets:
-                    print(f"    - {asset['name']}")
-                    self.check_asset_attributes(asset)
-        else:
-            self.issues.append("Failed to fetch assets")
+            self.check_asset_attributes(assets)
+        except Exception as e:
+            self.issues.append(f"Failed to fetch assets: {e}")
 
         print()
 
-    def check_asset_attributes(self, asset):
-        """Check if asset has required attributes"""
-        asset_id = asset['id']['id']
-
-        # Check server attributes
-        response = requests.get(
-            f"{self.url}/api/plugins/telemetry/ASSET/{asset_id}/values/attributes/SERVER_SCOPE",
-            headers=self.get_headers()
-        )
-
-        if response.status_code == 200:
-            attributes = response.json()
-            attr_keys = [attr['key'] for attr in attributes]
-
-            required_attrs = ['cropType', 'maxMoistureThreshold', 'minMoistureThreshold']
-            optional_attrs = ['perimeter', 'criticalAlarmsCount', 'majorAlarmsCount']
-
-            missing_required = [attr for attr in required_attrs if attr not in attr_keys]
-            missing_optional = [attr for attr in optional_attrs if attr not in attr_keys]
-
-            if missing_required:
-                self.issues.append(f"Asset '{asset['name']}' missing required attributes: {', '.join(missing_required)}")
-
-            if missing_optional:
-                self.warnings.append(f"Asset '{asset['name']}' missing optional attributes: {', '.join(missing_optional)}")
+    def check_asset_attributes(self, assets):
+        """Check if every asset has the required attributes, reusing results of unchanged assets"""
+        attrs = REQUIRED_ASSET_ATTRIBUTES + OPTIONAL_ASSET_ATTRIBUTES
+        cached = self.snapshot.load_entities("ASSET") if self.previous_run else {}
+        now = time.time()
+        missing = {"required": {}, "optional": {}}  # kind -> attribute -> asset names
+        records = []
+        reused = 0
+        for row in assets:
+            asset_id = row["entityId"]["id"]
+            name = name_of(row)
+            stamp = fingerprint(row, "SERVER_ATTRIBUTE", attrs)
+            previous = cached.get(asset_id)
+            if previous and previous["fingerprint"] == stamp and previous["result"] is not None:
+                result, checked_at = previous["result"], previous["checked_at"]
+                reused += 1
+            else:
+                absent = [attr for attr in attrs if latest_value(row, "SERVER_ATTRIBUTE", attr) is None]
+                result = {"required": [attr for attr in absent if attr in REQUIRED_ASSET_ATTRIBUTES],
+                          "optional": [attr for attr in absent if attr in OPTIONAL_ASSET_ATTRIBUTES]}
+                checked_at = now
+            for kind in ("required", "optional"):
+                for attr in result[kind]:
+                    missing[kind].setdefault(attr, []).append(name)
+            records.append((asset_id, name, "SI Field", latest_value(row, "ENTITY_FIELD", "createdTime"), stamp,
+                            result, checked_at))
+
+        for kind, findings in (("required", self.issues), ("optional", self.warnings)):
+            for attr, names in missing[kind].items():
+                findings.append(f"{len(names)} asset(s) missing {kind} attribute '{attr}': {examples(names)}")
+
+        if self.snapshot:
+            self.snapshot.save_entities("ASSET", records)
+            self.snapshot.prune("ASSET", [record[0] for record in records])
+            self.snapshot.save()
+        if self.previous_run:
+            print(f"  ↺ Attributes: {len(assets) - reused} asset(s) re-validated, {reused} unchanged since "
+                  f"{format_time(self.previous_run)} (cached results)")
+            self.freshness.append(f"Asset attributes: {len(assets) - reused} re-validated, {reused} cached")
 
     def check_devices(self):
         """Check if SI devices exist"""
         print("[3/6] Checking Devices...")
         print("-" * 60)
 
-        device_types = [
-            "SI Soil Moisture Sensor",
-            "SI Water Meter",
-            "SI Smart Valve"
-        ]
-
-        total_devices = 0
-        for device_type in device_types:
-            response = requests.get(
-                f"{self.url}/api/tenant/devices",
-                headers=self.get_headers(),
-                params={"pageSize": 1000, "page": 0, "type": device_type}
-            )
-
-            if response.status_code == 200:
-                devices = response.json()["data"]
-                count = len(devices)
-                total_devices += count
-
-                if count > 0:
-                    print(f"  ✓ {device_type}: {count} device(s)")
-                    for device in devices[:3]:  # Show first 3
-                        print(f"    - {device['name']}")
-                    if count > 3:
-                        print(f"    ... and {count - 3} more")
-                else:
-                    print(f"  ⚠ {device_type}: No devices found")
-                    self.warnings.append(f"No devices of type '{device_type}' found")
+        try:
+            devices = self.load_devices()
+        except Exception as e:
+            self.issues.append(f"Failed to fetch devices: {e}")
+            print()
+            return
+
+        names_by_type = {device_type: [] for device_type in DEVICE_TYPES}
+        for row in devices:
+            names_by_type.setdefault(latest_value(row, "ENTITY_FIELD", "type"), []).append(name_of(row))
+
+        for device_type in DEVICE_TYPES:
+            names = names_by_type[device_type]
+            if names:
+                print(f"  ✓ {device_type}: {len(names)} device(s)")
+                for name in names[:3]:  # Show first 3
+                    print(f"    - {name}")
+                if len(names) > 3:
+                    print(f"    ... and {len(names) - 3} more")
+            else:
+                print(f"  ⚠ {device_type}: No devices found")
+                self.warnings.append(f"No devices of type '{device_type}' found")
 
-        if total_devices == 0:
+        if len(devices) == 0:
             self.issues.append("No SI devices exist")
 
         print()
@@ -167,118 +228,237 @@ class DashboardDiagnostics:
         print("[4/6] Checking Relations (Asset → Device)...")
         print("-" * 60)
 
-        # Get all assets
-        response = requests.get(
-            f"{self.url}/api/tenant/assets",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0, "type": "SI Field"}
-        )
-
-        if response.status_code == 200:
-            assets = response.json()["data"]
-
-            for asset in assets:
-                asset_id = asset['id']['id']
-
-                # Get relations
-                rel_response = requests.get(
-                    f"{self.url}/api/relations/info",
-                    headers=self.get_headers(),
-                    params={"fromId": asset_id, "fromType": "ASSET"}
-                )
-
-                if rel_response.status_code == 200:
-                    relations = rel_response.json()
-                    device_relations = [r for r in relations if r['to']['entityType'] == 'DEVICE']
-
-                    if len(device_relations) > 0:
-                        print(f"  ✓ {asset['name']}: {len(device_relations)} device(s) connected")
-                    else:
-                        print(f"  ✗ {asset['name']}: No devices connected")
-                        self.issues.append(f"Asset '{asset['name']}' has no device relations")
+        try:
+            assets = self.load_assets()
+            devices = self.load_devices()
+            relations, refreshed, looked_up = self.fetch_relations(assets, devices)
+        except Exception as e:
+            self.issues.append(f"Failed to fetch relations: {e}")
+            print()
+            return
+
+        related_devices = set()
+        unconnected = []
+        for position, row in enumerate(assets):
+            asset_id = row["entityId"]["id"]
+            if asset_id not in relations:
+                continue
+            device_ids = relations[asset_id]
+            related_devices |= device_ids
+            if not device_ids:
+                unconnected.append(name_of(row))
+            if position < 10:  # Show first 10
+                cached = "" if asset_id in refreshed else " (cached)"
+                if device_ids:
+                    print(f"  ✓ {name_of(row)}: {len(device_ids)} device(s) connected{cached}")
+                else:
+                    print(f"  ✗ {name_of(row)}: No devices connected{cached}")
+        if len(assets) > 10:
+            print(f"    ... and {len(assets) - 10} more asset(s)")
+        if unconnected:
+            self.issues.append(f"{len(unconnected)} asset(s) have no device relations: {examples(unconnected)}")
+
+        orphans = [name_of(row) for row in devices if row["entityId"]["id"] not in related_devices]
+        if orphans:
+            print(f"  ⚠ {len(orphans)} device(s) not related to any field")
+            self.warnings.append(f"{len(orphans)} device(s) not related to any field: {examples(orphans)}")
+        else:
+            print(f"  ✓ All {len(devices)} device(s) belong to a field")
+        if self.previous_run:
+            cached = len(assets) - len(refreshed)
+            print(f"  ↺ Relations: fetched for {len(refreshed)} field(s) and {looked_up} new device(s), "
+                  f"{cached} field(s) cached since {format_time(self.previous_run)} or earlier")
+            self.freshness.append(f"Relations: {len(refreshed)} field(s) and {looked_up} new device(s) fetched, "
+                                  f"{cached} field(s) cached")
         print()
 
+    def fetch_relations(self, assets, devices):
+        """Field id -> related device ids, fetching only what the snapshot cannot answer.
+
+        New fields and fields whose cached relations are older than
+        SNAPSHOT_MAX_AGE (at most RECHECK_LIMIT per run) are fetched from the
+        field side; devices created since the snapshot are looked up from the
+        device side. Returns (relations, ids of fields fetched, devices looked up).
+        """
+        now = time.time()
+        asset_ids = [row["entityId"]["id"] for row in assets]
+        if self.previous_run:
+            relations = self.snapshot.load_relations()
+            checked_at = self.snapshot.relation_checked_at()
+            known_devices = self.snapshot.load_entities("DEVICE")
+        else:
+            relations, checked_at, known_devices = {}, {}, {}
+
+        refresh = [asset_id for asset_id in asset_ids if asset_id not in checked_at]
+        expired = sorted((checked_at[asset_id], asset_id) for asset_id in asset_ids
+                         if asset_id in checked_at and now - checked_at[asset_id] > SNAPSHOT_MAX_AGE)
+        refresh += [asset_id for _, asset_id in expired[:RECHECK_LIMIT]]
+        # When every field is re-fetched, new devices are covered from the field side
+        new_devices = [] if len(refresh) == len(asset_ids) else [
+            row["entityId"]["id"] for row in devices if row["entityId"]["id"] not in known_devices]
+
+        with ThreadPoolExecutor(max_workers=DIAGNOSTIC_WORKERS) as pool:
+            fetched = list(pool.map(lambda asset_id: self.client.get_relations_info(asset_id, "ASSET"), refresh))
+            parents = list(pool.map(lambda device_id: self.client.get_relations_info_to(device_id, "DEVICE"),
+                                    new_devices))
+
+        refreshed = set()
+        for asset_id, asset_relations in zip(refresh, fetched):
+            if asset_relations is None:
+                continue  # Keep the cached relations, retry next run
+            device_ids = {r['to']['id'] for r in asset_relations if r['to']['entityType'] == 'DEVICE'}
+            relations[asset_id] = device_ids
+            refreshed.add(asset_id)
+            if self.snapshot:
+                self.snapshot.replace_relations(asset_id, device_ids, now)
+        found = [(r['from']['id'], device_id) for device_id, device_relations in zip(new_devices, parents)
+                 for r in device_relations or [] if r['from']['entityType'] == 'ASSET']
+        for asset_id, device_id in found:
+            relations.setdefault(asset_id, set()).add(device_id)
+
+        if self.snapshot:
+            self.snapshot.add_relations(found)
+            self.snapshot.save_entities("DEVICE", (
+                (row["entityId"]["id"], name_of(row), latest_value(row, "ENTITY_FIELD", "type"),
+                 latest_value(row, "ENTITY_FIELD", "createdTime"), latest_value(row, "ENTITY_FIELD", "createdTime"),
+                 None, known_devices.get(row["entityId"]["id"], {}).get("checked_at", now))
+                for row in devices
+            ))
+            self.snapshot.prune("DEVICE", [row["entityId"]["id"] for row in devices])
+            self.snapshot.save()
+        return relations, refreshed, len(new_devices)
+
     def check_telemetry(self):
-        """Check if recent telemetry exists"""
+        """Check if every device and field has telemetry"""
         print("[5/6] Checking Telemetry Data...")
         print("-" * 60)
 
+        try:
+            devices = self.load_devices()
+            assets = self.load_assets()
+        except Exception as e:
+            self.issues.append(f"Failed to fetch telemetry: {e}")
+            print()
+            return
+
         # Check devices
-        device_response = requests.get(
-            f"{self.url}/api/tenant/devices",
-            headers=self.get_headers(),
-            params={"pageSize": 5, "page": 0, "type": "SI Soil Moisture Sensor"}
-        )
-
-        devices_with_data = 0
-        devices_checked = 0
-
-        if device_response.status_code == 200:
-            devices = device_response.json()["data"][:3]  # Check first 3
-
-            for device in devices:
-                devices_checked += 1
-                device_id = device['id']['id']
-
-                tel_response = requests.get(
-                    f"{self.url}/api/plugins/telemetry/DEVICE/{device_id}/values/timeseries",
-                    headers=self.get_headers(),
-                    params={"keys": "moisture,battery"}
-                )
-
-                if tel_response.status_code == 200:
-                    telemetry = tel_response.json()
-                    if telemetry and len(telemetry) > 0:
-                        print(f"  ✓ {device['name']}: Has telemetry data")
-                        devices_with_data += 1
-                    else:
-                        print(f"  ✗ {device['name']}: No telemetry data")
-
-        if devices_checked > 0 and devices_with_data == 0:
+        sensors = [row for row in devices if latest_value(row, "ENTITY_FIELD", "type") == "SI Soil Moisture Sensor"]
+        silent_sensors = [name_of(row) for row in sensors if latest_value(row, "TIME_SERIES", "moisture") is None]
+        silent_devices = [name_of(row) for row in devices
+                          if latest_value(row, "TIME_SERIES", "moisture") is None
+                          and latest_value(row, "TIME_SERIES", "battery") is None]
+
+        if sensors:
+            mark = "✓" if not silent_sensors else "✗"
+            print(f"  {mark} {len(sensors) - len(silent_sensors)}/{len(sensors)} moisture sensor(s) have moisture data")
+        if devices:
+            mark = "✓" if not silent_devices else "✗"
+            print(f"  {mark} {len(devices) - len(silent_devices)}/{len(devices)} device(s) have telemetry data")
+            if silent_devices:
+                print(f"    No data: {examples(silent_devices)}")
+
+        if devices and len(silent_devices) == len(devices):
             self.warnings.append("No devices have telemetry data - run simulate_telemetry.py")
+        elif silent_sensors:
+            self.warnings.append(f"{len(silent_sensors)} moisture sensor(s) have no telemetry data: "
+                                 f"{examples(silent_sensors)}")
 
         # Check assets
-        asset_response = requests.get(
-            f"{self.url}/api/tenant/assets",
-            headers=self.get_headers(),
-            params={"pageSize": 3, "page": 0, "type": "SI Field"}
-        )
-
-        if asset_response.status_code == 200:
-            assets = asset_response.json()["data"][:3]
-
-            for asset in assets:
-                asset_id = asset['id']['id']
-
-                tel_response = requests.get(
-                    f"{self.url}/api/plugins/telemetry/ASSET/{asset_id}/values/timeseries",
-                    headers=self.get_headers(),
-                    params={"keys": "avgMoisture,irrigationState"}
-                )
-
-                if tel_response.status_code == 200:
-                    telemetry = tel_response.json()
-                    if telemetry and len(telemetry) > 0:
-                        print(f"  ✓ {asset['name']}: Has telemetry data")
-                    else:
-                        print(f"  ✗ {asset['name']}: No telemetry data")
+        silent_assets = [name_of(row) for row in assets if latest_value(row, "TIME_SERIES", "avgMoisture") is None]
+        if assets:
+            mark = "✓" if not silent_assets else "✗"
+            print(f"  {mark} {len(assets) - len(silent_assets)}/{len(assets)} field(s) have avgMoisture data")
+            if silent_assets:
+                print(f"    No data: {examples(silent_assets)}")
 
         print()
 
+    def field_devices(self, field):
+        """SI devices related to one field, with their latest telemetry"""
+        return [
+            row for row in self.client.iter_entity_data(
+                {"type": "relationsQuery", "rootEntity": field["entityId"], "direction": "FROM", "maxLevel": 1,
+                 "filters": [{"relationType": "Contains", "entityTypes": ["DEVICE"]}]},
+                entity_fields=("name", "type"),
+                timeseries=TELEMETRY_KEYS
+            )
+            if latest_value(row, "ENTITY_FIELD", "type") in DEVICE_TYPES
+        ]
+
+    def iter_field_devices(self):
+        """Yield (field row, device rows) for every SI Field, a bounded number of fields in flight"""
+        fields = self.client.iter_entity_data({"type": "assetType", "assetTypes": ["SI Field"]})
+        with ThreadPoolExecutor(max_workers=DIAGNOSTIC_WORKERS) as pool:
+            window = deque()
+            for field in fields:
+                window.append((field, pool.submit(self.field_devices, field)))
+                if len(window) >= 2 * DIAGNOSTIC_WORKERS:
+                    field, future = window.popleft()
+                    yield field, future.result()
+            while window:
+                field, future = window.popleft()
+                yield field, future.result()
+
+    def check_staleness(self, silent_intervals=SILENT_INTERVALS, offenders_csv=None):
+        """Stream every field's devices into freshness and battery statistics"""
+        print("Checking Fleet Freshness...")
+        print("-" * 60)
+
+        offenders = open(offenders_csv, "w", newline="") if offenders_csv else None
+        try:
+            health = FleetHealth(silent_intervals, offenders=offenders)
+            for field, devices in self.iter_field_devices():
+                field_health = health.start_field(name_of(field))
+                for row in devices:
+                    timestamps = [row["latest"].get("TIME_SERIES", {}).get(key, {}).get("ts") or 0
+                                  for key in TELEMETRY_KEYS]
+                    battery = latest_value(row, "TIME_SERIES", "battery")
+                    health.add(field_health, name_of(row), latest_value(row, "ENTITY_FIELD", "type"),
+                               max(timestamps) or None, float(battery) if battery else None)
+                health.end_field(field_health)
+            total = self.client.find_entity_data({
+                "entityFilter": {"type": "deviceType", "deviceTypes": DEVICE_TYPES},
+                "pageLink": {"page": 0, "pageSize": 1}
+            })
+        except Exception as e:
+            self.issues.append(f"Failed to fetch fleet telemetry: {e}")
+            print()
+            return None
+        finally:
+            if offenders:
+                offenders.close()
+
+        health.print_report()
+        if health.fields == 0:
+            self.issues.append("No SI Field assets exist")
+        elif health.devices == 0:
+            self.issues.append("No SI devices exist")
+        if health.never:
+            self.warnings.append(f"{health.never} device(s) have never sent telemetry")
+        if health.silent:
+            self.warnings.append(f"{health.silent} device(s) sent no telemetry for more than "
+                                 f"{silent_intervals} reporting intervals")
+        if health.low:
+            self.warnings.append(f"{health.low} device(s) below {health.low_battery}% battery")
+        unassigned = (total or {}).get("totalElements", health.devices) - health.devices
+        if unassigned > 0:
+            self.warnings.append(f"{unassigned} device(s) not related to any field are not in the freshness report")
+        if offenders_csv:
+            print(f"  ✓ Wrote {health.offender_count} offending device(s) to {offenders_csv}")
+        print()
+        return health
+
     def check_dashboard(self):
         """Check if dashboard exists"""
         print("[6/6] Checking Dashboard...")
         print("-" * 60)
 
-        response = requests.get(
-            f"{self.url}/api/tenant/dashboards",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0}
-        )
-
-        if response.status_code == 200:
-            dashboards = response.json()["data"]
-            irrigation_dashboards = [d for d in dashboards if "Irrigation" in d['title']]
+        try:
+            # textSearch narrows the listing server-side; the title check stays exact
+            irrigation_dashboards = [
+                d for d in self.client.iter_tenant_dashboards(text_search="Irrigation")
+                if "Irrigation" in d['title']
+            ]
 
             if len(irrigation_dashboards) > 0:
                 for dashboard in irrigation_dashboards:
@@ -286,6 +466,8 @@ class DashboardDiagnostics:
             else:
                 print(f"  ⚠ No 'Irrigation' dashboard found")
                 self.warnings.append("Dashboard not imported yet - import the JSON file")
+        except Exception as e:
+            self.issues.append(f"Failed to fetch dashboards: {e}")
 
         print()
 
@@ -331,22 +513,48 @@ class DashboardDiagnostics:
             if any("Dashboard" in warning for warning in self.warnings):
                 print("→ Import dashboard JSON file via ThingsBoard UI")
 
+        if self.freshness:
+            print(f"\n↺ INCREMENTAL RUN (snapshot of {format_time(self.previous_run)}):")
+            for line in self.freshness:
+                print(f"- {line}")
+            print("- Device profiles, device counts, telemetry and dashboards: fetched this run")
+
         print("\n" + "="*60 + "\n")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smart Irrigation dashboard diagnostics")
+    parser.add_argument("--staleness", action="store_true",
+                        help="report telemetry freshness and battery levels for every device instead")
+    parser.add_argument("--silent-intervals", type=float, default=SILENT_INTERVALS,
+                        help="reporting periods without telemetry before a device counts as silent")
+    parser.add_argument("--offenders-csv", metavar="PATH",
+                        help="write silent, never-reporting and low-battery devices to a CSV file")
+    parser.add_argument("--snapshot", metavar="PATH", default=SNAPSHOT_FILE,
+                        help="SQLite snapshot of the last run's results (default: %(default)s)")
+    parser.add_argument("--no-snapshot", action="store_true", help="check everything and keep no snapshot")
+    parser.add_argument("--full", action="store_true", help="re-check everything and rewrite the snapshot")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     print("\n" + "="*60)
     print("ThingsBoard Smart Irrigation Dashboard Diagnostics")
     print("="*60 + "\n")
 
     try:
-        diagnostics = DashboardDiagnostics(TB_URL, USERNAME, PASSWORD)
-        diagnostics.check_device_profiles()
-        diagnostics.check_assets()
-        diagnostics.check_devices()
-        diagnostics.check_relations()
-        diagnostics.check_telemetry()
-        diagnostics.check_dashboard()
+        diagnostics = DashboardDiagnostics(TB_URL, USERNAME, PASSWORD,
+                                           snapshot_path=None if args.no_snapshot else args.snapshot, full=args.full)
+        if args.staleness:
+            diagnostics.check_staleness(args.silent_intervals, args.offenders_csv)
+        else:
+            diagnostics.check_device_profiles()
+            diagnostics.check_assets()
+            diagnostics.check_devices()
+            diagnostics.check_relations()
+            diagnostics.check_telemetry()
+            diagnostics.check_dashboard()
         diagnostics.print_summary()
     except Exception as e:
         print(f"\n✗ Error: {e}")
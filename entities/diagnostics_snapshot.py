@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Diagnostics Snapshot
+SQLite record of what the last diagnostics run saw: entity ids with their
+createdTime and a fingerprint of their attribute update times, each entity's
+check result, and the field -> device relations with when they were fetched.
+Later runs re-validate only entities whose fingerprint changed and relations
+that are new or have expired, so frequent runs stay cheap on the server.
+"""
+
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS entities (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT,
+    type TEXT,
+    created_time INTEGER,
+    fingerprint TEXT,
+    result TEXT,
+    checked_at REAL
+);
+CREATE INDEX IF NOT EXISTS entities_kind ON entities (kind);
+CREATE TABLE IF NOT EXISTS relations (
+    asset_id TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    PRIMARY KEY (asset_id, device_id)
+);
+CREATE INDEX IF NOT EXISTS relations_device ON relations (device_id);
+CREATE TABLE IF NOT EXISTS relation_checks (
+    asset_id TEXT PRIMARY KEY,
+    checked_at REAL
+);
+"""
+
+
+class DiagnosticsSnapshot:
+    def __init__(self, path, url):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.taken_at = self.get_meta("taken_at")
+        if self.get_meta("url") != url:
+            # A snapshot of another server says nothing about this one
+            self.clear()
+            self.set_meta("url", url)
+            self.taken_at = None
+
+    def get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def clear(self):
+        for table in ("meta", "entities", "relations", "relation_checks"):
+            self.db.execute(f"DELETE FROM {table}")
+
+    # Entities
+
+    def load_entities(self, kind):
+        """id -> {fingerprint, result, checked_at} for one kind ("ASSET" or "DEVICE")"""
+        return {
+            entity_id: {"fingerprint": fingerprint, "result": json.loads(result) if result else None,
+                        "checked_at": checked_at}
+            for entity_id, fingerprint, result, checked_at in self.db.execute(
+                "SELECT id, fingerprint, result, checked_at FROM entities WHERE kind = ?", (kind,))
+        }
+
+    def save_entities(self, kind, entities):
+        """entities is an iterable of (id, name, type, created_time, fingerprint, result, checked_at)"""
+        self.db.executemany(
+            "INSERT OR REPLACE INTO entities (id, kind, name, type, created_time, fingerprint, result, checked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((entity_id, kind, name, entity_type, created_time, fingerprint, json.dumps(result), checked_at)
+             for entity_id, name, entity_type, created_time, fingerprint, result, checked_at in entities)
+        )
+
+    def prune(self, kind, current_ids):
+        """Forget entities of a kind (and their relations) that no longer exist; returns how many"""
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS current_ids (id TEXT PRIMARY KEY)")
+        self.db.execute("DELETE FROM current_ids")
+        self.db.executemany("INSERT OR IGNORE INTO current_ids (id) VALUES (?)", ((i,) for i in current_ids))
+        gone = "SELECT id FROM entities WHERE kind = ? AND id NOT IN (SELECT id FROM current_ids)"
+        column = "asset_id" if kind == "ASSET" else "device_id"
+        self.db.execute(f"DELETE FROM relations WHERE {column} IN ({gone})", (kind,))
+        if kind == "ASSET":
+            self.db.execute(f"DELETE FROM relation_checks WHERE asset_id IN ({gone})", (kind,))
+        return self.db.execute(f"DELETE FROM entities WHERE id IN ({gone})", (kind,)).rowcount
+
+    # Relations
+
+    def load_relations(self):
+        """asset id -> set of related device ids"""
+        relations = {}
+        for asset_id, device_id in self.db.execute("SELECT asset_id, device_id FROM relations"):
+            relations.setdefault(asset_id, set()).add(device_id)
+        return relations
+
+    def relation_checked_at(self):
+        """asset id -> when its relations were last fetched"""
+        return dict(self.db.execute("SELECT asset_id, checked_at FROM relation_checks"))
+
+    def replace_relations(self, asset_id, device_ids, checked_at):
+        self.db.execute("DELETE FROM relations WHERE asset_id = ?", (asset_id,))
+        self.db.executemany("INSERT OR IGNORE INTO relations (asset_id, device_id) VALUES (?, ?)",
+                            ((asset_id, device_id) for device_id in device_ids))
+        self.db.execute("INSERT OR REPLACE INTO relation_checks (asset_id, checked_at) VALUES (?, ?)",
+                        (asset_id, checked_at))
+
+    def add_relations(self, pairs):
+        """Record (asset id, device id) relations found from the device side"""
+        self.db.executemany("INSERT OR IGNORE INTO relations (asset_id, device_id) VALUES (?, ?)", pairs)
+
+    def save(self):
+        self.taken_at = str(time.time())
+        self.set_meta("taken_at", self.taken_at)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
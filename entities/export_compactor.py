@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Dashboard Export Compactor
+Finds widget payloads (settings functions, CSS, HTML, marker images, inline
+images) that are duplicated across the export tree by content hash, and
+writes a compacted copy of every dashboard: states that no root-reachable
+widget action can open are dropped together with the widgets only they
+placed, entity aliases and filters nothing references are dropped, and the
+JSON is written minified. Dashboards already reference their widget types by
+fully qualified name, so the duplicated payloads are reported (with those
+identical to a widget type's own code or defaults flagged) rather than
+rewritten; ThingsBoard has no way to share a settings value between widgets.
+Compacted dashboards stay importable as they are.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+from export_index import EXPORT_ROOT, iter_json_files
+
+OUTPUT_DIR = "compacted_export"  # Relative to the current directory
+DASHBOARD_DIRS = ("dashboard", "dashboard_new")
+WIDGET_TYPE_DIRS = ("widget_type", "widgets_bundle")
+MIN_PAYLOAD_BYTES = 512  # Shorter strings are not worth reporting as duplicates
+TOP_PAYLOADS = 15  # Duplicate groups listed in the report
+PARSE_REPEATS = 5  # json.loads timings take the best of this many runs
+
+
+def dashboard_entity(document):
+    """The dashboard inside an export document (wrapped or bare), or None"""
+    if not isinstance(document, dict):
+        return None
+    entity = document.get("entity") if isinstance(document.get("entity"), dict) else document
+    configuration = entity.get("configuration")
+    if isinstance(configuration, dict) and "widgets" in configuration:
+        return entity
+    return None
+
+
+def minified(document):
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def as_text(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def mentions(text, token):
+    """Whether a JSON-encoded text quotes token, either as a JSON string or inside code"""
+    return f'"{token}"' in text or f"'{token}'" in text or f'\\"{token}\\"' in text
+
+
+def parse_time(content, repeats=PARSE_REPEATS):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        json.loads(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Duplicate payloads
+
+def iter_payloads(value, path=""):
+    """Yield (JSON path, string) for every string of at least MIN_PAYLOAD_BYTES inside value"""
+    if isinstance(value, str):
+        if len(value) >= MIN_PAYLOAD_BYTES:
+            if value.lstrip().startswith("{"):
+                # Widget type defaultConfig and similar are JSON documents stored as strings
+                try:
+                    inner = json.loads(value)
+                except ValueError:
+                    inner = None
+                if isinstance(inner, (dict, list)):
+                    yield from iter_payloads(inner, path)
+                    return
+            yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from iter_payloads(item, f"{path}.{key}" if path else key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_payloads(item, f"{path}[]")
+
+
+def payload_kind(value):
+    if value.startswith(("tb-image:", "data:image/")):
+        return "image"
+    return "text"
+
+
+class PayloadIndex:
+    def __init__(self):
+        self.groups = {}  # sha1 -> {size, kind, key, locations: [(file, JSON path)], in_widget_type}
+
+    def add(self, path, value, widget_type=False):
+        for json_path, payload in iter_payloads(value):
+            data = payload.encode()
+            digest = hashlib.sha1(data).hexdigest()
+            group = self.groups.setdefault(digest, {"size": len(data), "kind": payload_kind(payload),
+                                                    "key": json_path.rsplit(".", 1)[-1], "locations": [],
+                                                    "in_widget_type": False})
+            if widget_type:
+                group["in_widget_type"] = True
+            else:
+                group["locations"].append((path, json_path))
+
+    def duplicates(self):
+        """Groups used by more than one dashboard widget, or copied from a widget type, most bytes first"""
+        found = [(digest, group) for digest, group in self.groups.items()
+                 if len(group["locations"]) > 1 or (group["locations"] and group["in_widget_type"])]
+        return sorted(found, key=lambda item: -item[1]["size"] * len(item[1]["locations"]))
+
+
+# Dashboard compaction
+
+def root_state(states):
+    for state_id, state in states.items():
+        if state.get("root"):
+            return state_id
+    return "default" if "default" in states else next(iter(states), None)
+
+
+def state_widgets(state):
+    widgets = set()
+    for layout in (state.get("layouts") or {}).values():
+        widgets.update((layout.get("widgets") or {}).keys())
+    return widgets
+
+
+def dynamic_targets(text):
+    """Whether widget actions pick their target state from a ${...} template"""
+    return '"targetDashboardStateId": "${' in text
+
+
+def compact_dashboard(entity, keep_states=False):
+    """Strip dead states, orphan widgets and unused aliases and filters in place; returns what was removed"""
+    configuration = entity["configuration"]
+    states = configuration.get("states") or {}
+    widgets = configuration.get("widgets") or {}
+    aliases = configuration.get("entityAliases") or {}
+    filters = configuration.get("filters") or {}
+    removed = {"states": 0, "widgets": 0, "aliases": 0, "filters": 0}
+
+    if states and not keep_states:
+        widget_text = {widget_id: as_text(widget) for widget_id, widget in widgets.items()}
+        placed = {state_id: state_widgets(state) for state_id, state in states.items()}
+        settings_text = as_text(configuration.get("settings"))
+        live = {root_state(states)} | {state_id for state_id in states if mentions(settings_text, state_id)}
+        queue = deque(live)
+        dynamic = False
+        while queue:
+            text = "".join(widget_text.get(widget_id, "") for widget_id in placed[queue.popleft()])
+            dynamic = dynamic or dynamic_targets(text)
+            for state_id in states:
+                if state_id not in live and mentions(text, state_id):
+                    live.add(state_id)
+                    queue.append(state_id)
+        templated = [state_id for state_id in states if state_id.startswith("${")]
+        if not (dynamic and not templated):  # An unresolvable template could open any state
+            for state_id in list(states):
+                if state_id not in live:
+                    del states[state_id]
+                    removed["states"] += 1
+        kept = set().union(*(placed[state_id] for state_id in states))
+        for widget_id in list(widgets):
+            if widget_id not in kept:
+                del widgets[widget_id]
+                removed["widgets"] += 1
+
+    text = as_text(widgets) + as_text(states) + as_text(configuration.get("settings"))
+    for filter_id in list(filters):
+        if not mentions(text, filter_id):
+            del filters[filter_id]
+            removed["filters"] += 1
+    text += as_text(filters)
+    for alias_id, alias in list(aliases.items()):
+        if not mentions(text, alias_id) and not (alias.get("alias") and mentions(text, alias["alias"])):
+            del aliases[alias_id]
+            removed["aliases"] += 1
+    return removed
+
+
+class ExportCompactor:
+    def __init__(self, root=EXPORT_ROOT, output=OUTPUT_DIR, keep_states=False):
+        self.root = os.path.abspath(root)
+        self.output = output
+        self.keep_states = keep_states
+        self.payloads = PayloadIndex()
+        self.results = []  # One dict per dashboard, see compact_file
+
+    def run(self, write=True):
+        for path, _ in iter_json_files(self.root):
+            top = path.split(os.sep, 1)[0]
+            if top in WIDGET_TYPE_DIRS:
+                with open(os.path.join(self.root, path), "rb") as f:
+                    document = json.loads(f.read())
+                entity = document.get("entity") if isinstance(document, dict) else None
+                if isinstance(entity, dict):
+                    self.payloads.add(path, entity.get("descriptor"), widget_type=True)
+            elif top in DASHBOARD_DIRS:
+                self.compact_file(path, write)
+        self.results.sort(key=lambda result: -result["before"])
+        return self.results
+
+    def compact_file(self, path, write):
+        with open(os.path.join(self.root, path), "rb") as f:
+            content = f.read()
+        try:
+            document = json.loads(content)
+        except ValueError:
+            return
+        entity = dashboard_entity(document)
+        if entity is None:
+            return
+        configuration = entity["configuration"]
+        for widget_id, widget in (configuration.get("widgets") or {}).items():
+            self.payloads.add(path, widget.get("config"))
+        self.payloads.add(path, configuration.get("settings"))
+        for state in (configuration.get("states") or {}).values():
+            self.payloads.add(path, state)
+
+        removed = compact_dashboard(entity, self.keep_states)
+        compacted = minified(document)
+        if write:
+            target = os.path.join(self.output, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(compacted)
+        self.results.append({
+            "path": path, "name": entity.get("title") or entity.get("name") or path,
+            "before": len(content), "after": len(compacted),
+            "parse_before": parse_time(content), "parse_after": parse_time(compacted), **removed
+        })
+
+
+def format_size(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size} B"
+
+
+def print_report(compactor, top=TOP_PAYLOADS):
+    results = compactor.results
+    print("\n" + "=" * 60)
+    print("DASHBOARD COMPACTION")
+    print("=" * 60)
+    print(f"{'dashboard':<32} {'before':>9} {'after':>9} {'saved':>6} {'parse ms':>13} "
+          f"{'states':>6} {'widgets':>7} {'aliases':>7} {'filters':>7}")
+    for result in results:
+        saved = 1 - result["after"] / result["before"] if result["before"] else 0
+        parse = f"{result['parse_before'] * 1000:.1f}→{result['parse_after'] * 1000:.1f}"
+        print(f"{result['name'][:32]:<32} {format_size(result['before']):>9} {format_size(result['after']):>9} "
+              f"{saved:>6.0%} {parse:>13} {result['states'] or '-':>6} {result['widgets'] or '-':>7} "
+              f"{result['aliases'] or '-':>7} {result['filters'] or '-':>7}")
+    before = sum(result["before"] for result in results)
+    after = sum(result["after"] for result in results)
+    parse_before = sum(result["parse_before"] for result in results)
+    parse_after = sum(result["parse_after"] for result in results)
+    print("-" * 60)
+    if before:
+        print(f"✓ {len(results)} dashboard(s): {format_size(before)} → {format_size(after)} "
+              f"({1 - after / before:.0%} saved), parse {parse_before * 1000:.1f} ms → {parse_after * 1000:.1f} ms")
+    print(f"  Removed {sum(r['states'] for r in results)} dead state(s), {sum(r['widgets'] for r in results)} "
+          f"orphan widget(s), {sum(r['aliases'] for r in results)} unused alias(es), "
+          f"{sum(r['filters'] for r in results)} unused filter(s)")
+
+    duplicates = compactor.payloads.duplicates()
+    if not duplicates:
+        return
+    redundant = sum(group["size"] * (len(group["locations"]) - (0 if group["in_widget_type"] else 1))
+                    for _, group in duplicates)
+    print("\n" + "=" * 60)
+    print("DUPLICATED WIDGET PAYLOADS")
+    print("=" * 60)
+    print(f"  {len(duplicates)} payload(s) of {MIN_PAYLOAD_BYTES}+ bytes repeated across dashboards, "
+          f"{format_size(redundant)} of redundant copies")
+    print(f"  {'sha1':<12} {'size':>9} {'copies':>6} {'kind':<6} {'key':<26} dashboards")
+    for digest, group in duplicates[:top]:
+        files = sorted({path for path, _ in group["locations"]})
+        origin = " (widget type)" if group["in_widget_type"] else ""
+        print(f"  {digest[:12]:<12} {format_size(group['size']):>9} {len(group['locations']):>6} "
+              f"{group['kind']:<6} {group['key'][:26]:<26} {len(files)}{origin}")
+    if len(duplicates) > top:
+        print(f"  ... and {len(duplicates) - top} more")
+    if any(group["in_widget_type"] for _, group in duplicates):
+        print("⚠ Payloads marked (widget type) are copies of a widget type's own code or default settings;")
+        print("  resetting those settings to the widget defaults in the UI removes them from the dashboard")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compact the dashboards of the ThingsBoard export tree")
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree to read (default: repository root)")
+    parser.add_argument("--output", default=OUTPUT_DIR, help=f"where compacted dashboards go (default: {OUTPUT_DIR})")
+    parser.add_argument("--keep-states", action="store_true",
+                        help="keep every dashboard state, e.g. when states are opened by direct links")
+    parser.add_argument("--dry-run", action="store_true", help="report only, write nothing")
+    parser.add_argument("--top", type=int, default=TOP_PAYLOADS, help="duplicate payloads to list")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    compactor = ExportCompactor(args.root, args.output, args.keep_states)
+    compactor.run(write=not args.dry_run)
+    print_report(compactor, args.top)
+    if not args.dry_run:
+        print(f"\n✓ Compacted dashboards written to {os.path.abspath(args.output)}")
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Export Tree Index
+Parses the ThingsBoard export in the repository root (dashboard/, device/,
+widget_type/, rule_chain/, ...) into SQLite tables of entities, dashboard
+widgets, datasources, data keys, entity aliases and relations, so questions
+like "which dashboards use avgMoisture" are one query instead of a grep
+through multi-hundred-KB JSON. Files are only re-parsed when their size or
+mtime changes and their content hash differs, so refreshing an unchanged
+tree costs one stat per file. Files of several MB are memory-mapped and
+read record by record through ExportReader, so a tenant export of any size
+indexes in bounded memory; smaller files are decoded whole, which is faster.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from export_stream import open_export
+
+EXPORT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)  # Repository root
+INDEX_FILE = ".export_index.db"  # Relative to EXPORT_ROOT
+SKIPPED_DIRS = {"entities", "__pycache__"}  # Plus hidden directories
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    sha1 TEXT
+);
+CREATE TABLE IF NOT EXISTS entities (
+    path TEXT NOT NULL,
+    entity_type TEXT,
+    id TEXT,
+    name TEXT,
+    type TEXT,
+    fqn TEXT
+);
+CREATE INDEX IF NOT EXISTS entities_id ON entities (id);
+CREATE INDEX IF NOT EXISTS entities_name ON entities (name);
+CREATE TABLE IF NOT EXISTS widgets (
+    path TEXT NOT NULL,
+    dashboard_id TEXT,
+    widget_id TEXT,
+    type_fqn TEXT,
+    title TEXT
+);
+CREATE INDEX IF NOT EXISTS widgets_fqn ON widgets (type_fqn);
+CREATE TABLE IF NOT EXISTS datasources (
+    path TEXT NOT NULL,
+    dashboard_id TEXT,
+    widget_id TEXT,
+    position INTEGER,
+    kind TEXT,
+    alias_id TEXT,
+    filter_id TEXT,
+    device_id TEXT
+);
+CREATE INDEX IF NOT EXISTS datasources_alias ON datasources (alias_id);
+CREATE TABLE IF NOT EXISTS data_keys (
+    path TEXT NOT NULL,
+    dashboard_id TEXT,
+    widget_id TEXT,
+    position INTEGER,
+    key TEXT,
+    key_type TEXT,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS data_keys_key ON data_keys (key);
+CREATE TABLE IF NOT EXISTS aliases (
+    path TEXT NOT NULL,
+    dashboard_id TEXT,
+    alias_id TEXT,
+    alias TEXT,
+    filter_type TEXT,
+    filter TEXT
+);
+CREATE INDEX IF NOT EXISTS aliases_alias ON aliases (alias);
+CREATE TABLE IF NOT EXISTS relations (
+    path TEXT NOT NULL,
+    from_type TEXT,
+    from_id TEXT,
+    to_type TEXT,
+    to_id TEXT,
+    relation_type TEXT
+);
+CREATE INDEX IF NOT EXISTS relations_from ON relations (from_id);
+CREATE INDEX IF NOT EXISTS relations_to ON relations (to_id);
+"""
+
+ROW_TABLES = ("entities", "widgets", "datasources", "data_keys", "aliases", "relations")
+
+
+def iter_json_files(root):
+    """Yield (relative path, os.stat_result) for every .json file under root.
+
+    Dotfiles are skipped along with dot directories: the push and pull
+    manifests live at the tree root but are not exports.
+    """
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        for name in sorted(files):
+            if name.endswith(".json") and not name.startswith("."):
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root), os.stat(path)
+
+
+def parse_export(path, reader):
+    """Rows for every table from one export file, as {table: [row tuples]}.
+
+    reader is an ExportReader or a DocumentReader (see export_stream.open_export).
+    With an ExportReader, records are decoded one at a time, so the largest
+    widget, not the largest file, bounds memory.
+    """
+    rows = {table: [] for table in ROW_TABLES}
+    entity_type = reader.entity_type()
+    if entity_type is None:
+        return rows
+
+    # Widgets before the header, so the header's scan reuses where they end
+    dashboard_rows = parse_dashboard(reader) if entity_type == "DASHBOARD" else {}
+    header = reader.header()
+    own_id = header.get("id")
+    rows["entities"].append((path, entity_type, own_id, header.get("name") or header.get("title"),
+                             header.get("type"), header.get("fqn")))
+    for table, table_rows in dashboard_rows.items():
+        rows[table] = [(path, own_id) + row for row in table_rows]
+    for relation in reader.iter_relations():
+        source, target = relation.get("from") or {}, relation.get("to") or {}
+        rows["relations"].append((path, source.get("entityType"), source.get("id"), target.get("entityType"),
+                                  target.get("id"), relation.get("type")))
+    return rows
+
+
+def parse_dashboard(reader):
+    """Alias, widget, datasource and data key rows of a dashboard, without the path and dashboard id columns"""
+    rows = {"aliases": [], "widgets": [], "datasources": [], "data_keys": []}
+    for alias_id, alias in reader.iter_aliases():
+        alias_filter = alias.get("filter") or {}
+        rows["aliases"].append((alias_id, alias.get("alias"), alias_filter.get("type"),
+                                json.dumps(alias_filter, sort_keys=True)))
+
+    for widget_id, widget in reader.iter_widgets():
+        config = widget.get("config") or {}
+        fqn = widget.get("typeFullFqn")
+        if not fqn and widget.get("bundleAlias"):
+            fqn = f"{widget['bundleAlias']}.{widget.get('typeAlias')}"  # Pre-3.6 exports
+        rows["widgets"].append((widget_id, fqn, config.get("title")))
+        sources = [(datasource.get("type"), datasource) for datasource in config.get("datasources") or []]
+        if isinstance(config.get("alarmSource"), dict):
+            sources.append(("alarmSource", config["alarmSource"]))
+        for position, (kind, datasource) in enumerate(sources):
+            rows["datasources"].append((widget_id, position, kind, datasource.get("entityAliasId"),
+                                        datasource.get("filterId"), datasource.get("deviceId")))
+            for data_key in (datasource.get("dataKeys") or []) + (datasource.get("latestDataKeys") or []):
+                rows["data_keys"].append((widget_id, position, data_key.get("name"), data_key.get("type"),
+                                          data_key.get("label")))
+    return rows
+
+
+class ExportIndex:
+    def __init__(self, root=EXPORT_ROOT, path=None):
+        self.root = os.path.abspath(root)
+        self.db = sqlite3.connect(path or os.path.join(self.root, INDEX_FILE))
+        self.db.executescript(SCHEMA)
+
+    def update(self):
+        """Re-index changed files and drop deleted ones; returns {parsed, touched, removed, unchanged}"""
+        known = {path: (mtime_ns, size, sha1) for path, mtime_ns, size, sha1
+                 in self.db.execute("SELECT path, mtime_ns, size, sha1 FROM files")}
+        stats = {"parsed": 0, "touched": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        with self.db:
+            for path, stat in iter_json_files(self.root):
+                seen.add(path)
+                previous = known.get(path)
+                if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                with open_export(os.path.join(self.root, path)) as reader:
+                    sha1 = hashlib.sha1(reader.buffer).hexdigest()
+                    self.db.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, sha1) VALUES (?, ?, ?, ?)",
+                                    (path, stat.st_mtime_ns, stat.st_size, sha1))
+                    if previous and previous[2] == sha1:
+                        stats["touched"] += 1  # Same content, new mtime
+                        continue
+                    self.remove_rows(path)
+                    try:
+                        parsed = parse_export(path, reader)
+                    except ValueError:
+                        parsed = {}
+                for table, table_rows in parsed.items():
+                    if table_rows:
+                        placeholders = ", ".join("?" * len(table_rows[0]))
+                        self.db.executemany(f"INSERT INTO {table} VALUES ({placeholders})", table_rows)
+                stats["parsed"] += 1
+            for path in set(known) - seen:
+                self.remove_rows(path)
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                stats["removed"] += 1
+        return stats
+
+    def remove_rows(self, path):
+        for table in ROW_TABLES:
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def query(self, sql, params=()):
+        """Run a query, returning (column names, rows)"""
+        cursor = self.db.execute(sql, params)
+        return [column[0] for column in cursor.description or []], cursor.fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+QUERIES = {
+    "key": (
+        "Dashboards and widgets that use a data key (SQL LIKE pattern)",
+        """SELECT DISTINCT e.name AS dashboard, w.title AS widget, k.key, k.key_type, k.path
+           FROM data_keys k
+           JOIN widgets w ON w.path = k.path AND w.widget_id = k.widget_id
+           LEFT JOIN entities e ON e.path = k.path
+           WHERE k.key LIKE ? ORDER BY dashboard, widget"""
+    ),
+    "alias": (
+        "Widgets whose datasources resolve through an entity alias (by alias name or id)",
+        """SELECT DISTINCT e.name AS dashboard, a.alias, a.filter_type, w.title AS widget, w.type_fqn
+           FROM aliases a
+           JOIN datasources d ON d.path = a.path AND d.alias_id = a.alias_id
+           JOIN widgets w ON w.path = d.path AND w.widget_id = d.widget_id
+           LEFT JOIN entities e ON e.path = a.path
+           WHERE a.alias LIKE ? OR a.alias_id = ? ORDER BY dashboard, widget"""
+    ),
+    "widget-type": (
+        "Dashboards using a widget type (fully qualified name, LIKE pattern)",
+        """SELECT e.name AS dashboard, w.type_fqn, COUNT(*) AS widgets, w.path
+           FROM widgets w LEFT JOIN entities e ON e.path = w.path
+           WHERE w.type_fqn LIKE ? GROUP BY w.path, w.type_fqn ORDER BY dashboard"""
+    ),
+    "entity": (
+        "Exported entities by name or id (LIKE pattern)",
+        """SELECT entity_type, name, type, id, path FROM entities
+           WHERE name LIKE ? OR id = ? ORDER BY entity_type, name"""
+    ),
+    "relations": (
+        "Relations from or to an entity id",
+        """SELECT r.from_type, COALESCE(f.name, r.from_id) AS from_name, r.relation_type,
+                  r.to_type, COALESCE(t.name, r.to_id) AS to_name, r.path
+           FROM relations r
+           LEFT JOIN entities f ON f.id = r.from_id
+           LEFT JOIN entities t ON t.id = r.to_id
+           WHERE r.from_id = ? OR r.to_id = ?"""
+    ),
+}
+
+
+def print_table(columns, rows):
+    if not rows:
+        print("(no rows)")
+        return
+    cells = [[("" if value is None else str(value)) for value in row] for row in rows]
+    widths = [min(60, max(len(column), *(len(row[i]) for row in cells))) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in cells:
+        print("  ".join(value[:width].ljust(width) for value, width in zip(row, widths)))
+    print(f"({len(rows)} row{'s' if len(rows) != 1 else ''})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index and query the ThingsBoard export tree")
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree to index (default: repository root)")
+    parser.add_argument("--db", help=f"index file (default: <root>/{INDEX_FILE})")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("index", help="refresh the index and print what changed")
+    for name, (description, _) in QUERIES.items():
+        command = commands.add_parser(name, help=description)
+        command.add_argument("value")
+    command = commands.add_parser("sql", help="run an SQL query against the index tables")
+    command.add_argument("statement")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    index = ExportIndex(args.root, args.db)
+    start = time.perf_counter()
+    stats = index.update()
+    elapsed = time.perf_counter() - start
+
+    if args.command in QUERIES:
+        sql = QUERIES[args.command][1]
+        print_table(*index.query(sql, (args.value,) * sql.count("?")))
+    elif args.command == "sql":
+        print_table(*index.query(args.statement))
+    else:
+        print(f"✓ Indexed in {elapsed * 1000:.1f} ms: {stats['parsed']} parsed, {stats['touched']} touched, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+        for table in ROW_TABLES:
+            print(f"  {table:<12} {index.query(f'SELECT COUNT(*) FROM {table}')[1][0][0]:>7}")
+    index.close()
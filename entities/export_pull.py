@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Export Tree Pull
+Refreshes the ThingsBoard version control export in the repository root
+(customer/, device/, rule_chain/, dashboard/, ...) from a live instance. Every
+entity type is listed concurrently, and each entity is written as
+<type>/<uuid>.json in the export's envelope format (entityType, entity,
+credentials/metaData/fqns, relations, attributes). An entity that already has
+a file elsewhere in the tree (hierarchy/) is written there.
+
+A manifest records each entity's version from the list endpoints, so only
+entities changed on the server are fetched again. Files are written with
+Jackson's pretty printer layout and in the key order of the file they
+replace. An entity that did not change therefore leaves its file
+byte-for-byte identical, and git shows only real edits.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from export_compactor import OUTPUT_DIR
+from export_index import EXPORT_ROOT, iter_json_files
+from tb_client import LIST_QUERIES, ThingsBoardClient
+
+# Configuration
+TB_URL = "http://localhost:8080"
+USERNAME = "tenant@thingsboard.org"
+PASSWORD = "tenant"
+
+MANIFEST_FILE = ".pull_manifest.json"  # Relative to EXPORT_ROOT
+PULL_WORKERS = 16  # Concurrent entity fetches
+ATTRIBUTE_SCOPES = {"DEVICE": ("SERVER_SCOPE", "SHARED_SCOPE")}  # Other types export SERVER_SCOPE only
+# Fields the server returns that the export leaves out
+SERVER_FIELDS = ("createdTime", "tenantId", "version")
+METADATA_SERVER_FIELDS = ("ruleChainId", "version")
+RELATION_FIELDS = ("additionalInfo", "from", "to", "type", "typeGroup", "version")
+CREDENTIAL_FIELDS = ("credentialsId", "credentialsType", "credentialsValue")
+ATTRIBUTE_FIELDS = ("booleanValue", "doubleValue", "jsonValue", "longValue", "strValue")
+
+
+class KeyOrder(dict):
+    """A JSON object that remembers its key order, repeats included: Jackson writes some type ids twice"""
+
+    def __init__(self, pairs):
+        super().__init__(pairs)
+        self.order = [key for key, _ in pairs]
+
+
+def java_number(value):
+    """A float as Jackson writes it (Double.toString): 1.5, 1.0E7, 1.6863063753097058E12"""
+    if value == 0 or 1e-3 <= abs(value) < 1e7:
+        return repr(value)
+    sign, digits, exponent = Decimal(repr(value)).as_tuple()
+    digits = "".join(map(str, digits))
+    exponent += len(digits) - 1
+    digits = digits.rstrip("0") or "0"
+    return f"{'-' if sign else ''}{digits[0]}.{digits[1:] or '0'}E{exponent}"
+
+
+def render(value, indent=""):
+    """JSON text in Jackson's default pretty printer layout, which the version control export uses"""
+    if isinstance(value, dict):
+        if not value:
+            return "{ }"
+        inner = indent + "  "
+        members = [f"{inner}{json.dumps(key, ensure_ascii=False)} : {render(value[key], inner)}"
+                   for key in getattr(value, "order", value)]
+        return "{\n" + ",\n".join(members) + f"\n{indent}}}"
+    if isinstance(value, list):
+        if not value:
+            return "[ ]"
+        return "[ " + ", ".join(render(item, indent) for item in value) + " ]"
+    if isinstance(value, float):
+        return java_number(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def ordered_like(value, template):
+    """value with its keys in template's order; keys the template lacks follow in their own order"""
+    if isinstance(value, dict) and isinstance(template, dict):
+        keys = [key for key in getattr(template, "order", template) if key in value]
+        keys += [key for key in value if key not in template]
+        return KeyOrder([(key, ordered_like(value[key], template.get(key))) for key in keys])
+    if isinstance(value, list) and isinstance(template, list):
+        return [ordered_like(item, template[i] if i < len(template) else None) for i, item in enumerate(value)]
+    return value
+
+
+def typed_attribute(attribute):
+    """A {key, value, lastUpdateTs} attribute in the export's one-field-per-type form"""
+    value = attribute.get("value")
+    typed = dict.fromkeys(ATTRIBUTE_FIELDS)
+    if isinstance(value, bool):
+        typed["booleanValue"] = value
+    elif isinstance(value, int):
+        typed["longValue"] = value
+    elif isinstance(value, float):
+        typed["doubleValue"] = value
+    elif isinstance(value, str):
+        typed["strValue"] = value
+    elif value is not None:
+        typed["jsonValue"] = json.dumps(value, separators=(",", ":"))
+    typed.update(key=attribute["key"], lastUpdateTs=attribute.get("lastUpdateTs"))
+    return {field: typed[field] for field in sorted(typed)}
+
+
+def relation_key(relation):
+    return (relation["from"]["id"], relation["to"]["id"], relation.get("type"), relation.get("typeGroup"))
+
+
+def stamp_of(record):
+    """What tells whether a listed entity changed: its version, or the record's hash on servers without one"""
+    if record.get("version") is not None:
+        return record["version"]
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+
+class PullManifest:
+    def __init__(self, path, url):
+        self.path = path
+        self.url = url
+        self.entities = {}  # entity id -> {type, stamp, paths}
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("url") == url:  # Versions on another server say nothing about these files
+            self.entities = data.get("entities", {})
+
+    def record(self, entity_id, entity_type, stamp, paths):
+        with self.lock:
+            self.entities[entity_id] = {"type": entity_type, "stamp": stamp, "paths": paths}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"url": self.url, "entities": self.entities}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class ExportPuller:
+    def __init__(self, client, root=EXPORT_ROOT, manifest_path=None, workers=PULL_WORKERS, force=False,
+                 types=tuple(LIST_QUERIES)):
+        self.client = client
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.force = force
+        self.types = types
+        self.manifest = PullManifest(manifest_path or os.path.join(self.root, MANIFEST_FILE), client.url)
+        self.stats = {entity_type: dict.fromkeys(("listed", "fetched", "written", "failed"), 0)
+                      for entity_type in types}
+        self.unavailable = {}  # entity type -> why it could not be listed
+        self.errors = []  # (entity type, entity id, message)
+        self.removed = []  # Manifest entries no longer on the server
+        self.lock = threading.Lock()
+
+    def run(self):
+        existing = self.existing_files()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            listings = dict(zip(self.types, pool.map(self.list_type, self.types)))
+            changed = []
+            for entity_type, records in listings.items():
+                for record in records or []:
+                    entity_id = record["id"]["id"]
+                    paths = existing.get(entity_id) or [os.path.join(entity_type.lower(), f"{entity_id}.json")]
+                    entry = self.manifest.entities.get(entity_id)
+                    if (self.force or entry is None or entry["stamp"] != stamp_of(record)
+                            or not all(os.path.exists(os.path.join(self.root, path)) for path in paths)):
+                        changed.append((entity_type, entity_id, stamp_of(record), paths))
+                self.stats[entity_type]["listed"] = len(records or [])
+            for _ in pool.map(lambda args: self.pull(*args), changed):
+                pass
+        listed = {record["id"]["id"] for records in listings.values() if records for record in records}
+        self.removed = [(entity_id, entry) for entity_id, entry in self.manifest.entities.items()
+                        if entity_id not in listed and listings.get(entry["type"]) is not None]
+        self.manifest.save()
+
+    def existing_files(self):
+        """entity id -> paths of the files named after it, wherever they are in the tree"""
+        existing = {}
+        for path, _ in iter_json_files(self.root):
+            if path.split(os.sep)[0] != OUTPUT_DIR:
+                existing.setdefault(os.path.basename(path)[:-len(".json")], []).append(path)
+        return existing
+
+    def list_type(self, entity_type):
+        try:
+            return list(self.client.iter_entities(entity_type))
+        except Exception as e:  # Professional Edition types on Community Edition, missing permissions
+            self.unavailable[entity_type] = str(e)
+            return None
+
+    def pull(self, entity_type, entity_id, stamp, paths):
+        try:
+            document = self.export_document(entity_type, entity_id)
+            written = sum(self.write(path, document) for path in paths)
+        except Exception as e:
+            with self.lock:
+                self.stats[entity_type]["failed"] += 1
+                self.errors.append((entity_type, entity_id, str(e)))
+            return
+        self.manifest.record(entity_id, entity_type, stamp, paths)
+        with self.lock:
+            self.stats[entity_type]["fetched"] += 1
+            self.stats[entity_type]["written"] += written > 0
+
+    def export_document(self, entity_type, entity_id):
+        """The entity and everything exported with it, in envelope order"""
+        entity = self.client.get_entity(entity_type, entity_id)
+        if entity is None:
+            raise Exception(f"Failed to get {entity_type} {entity_id}")
+        document = {"entityType": entity_type,
+                    "entity": {key: value for key, value in entity.items() if key not in SERVER_FIELDS}}
+        if entity_type == "DEVICE":
+            credentials = self.client.get_device_credentials(entity_id) or {}
+            document["credentials"] = {field: credentials.get(field) for field in CREDENTIAL_FIELDS}
+        elif entity_type == "RULE_CHAIN":
+            metadata = self.client.get_rule_chain_metadata(entity_id) or {}
+            document["metaData"] = {key: metadata[key] for key in sorted(metadata) if key not in METADATA_SERVER_FIELDS}
+        elif entity_type == "WIDGETS_BUNDLE":
+            document["fqns"] = self.client.get_widgets_bundle_fqns(entity_id) or []
+
+        relations = {}
+        for found in ((self.client.get_relations_info(entity_id, entity_type) or [])
+                      + (self.client.get_relations_info_to(entity_id, entity_type) or [])):
+            relation = {field: found[field] for field in RELATION_FIELDS if field in found}
+            relations.setdefault(relation_key(relation), relation)
+        document["relations"] = [relations[key] for key in sorted(relations)]
+
+        document["attributes"] = {}
+        for scope in ATTRIBUTE_SCOPES.get(entity_type, ("SERVER_SCOPE",)):
+            attributes = self.client.get_attributes(entity_type, entity_id, scope) or []
+            document["attributes"][scope] = sorted((typed_attribute(a) for a in attributes), key=lambda a: a["key"])
+        return document
+
+    def write(self, path, document):
+        """Write the document unless the file already holds exactly it; returns whether it wrote"""
+        full_path = os.path.join(self.root, path)
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                current_text = f.read()
+            current = json.loads(current_text, object_pairs_hook=KeyOrder)
+        except (OSError, ValueError):
+            current_text, current = None, None
+        if isinstance(current, dict) and current.get("entityType") not in (None, document["entityType"]):
+            raise Exception(f"{path} holds a {current['entityType']}, not a {document['entityType']}")
+        if isinstance(current, dict):
+            # Exported without relations (or attributes): keep leaving them out while there are none
+            document = {key: value for key, value in document.items() if key in current or value}
+            document = ordered_like(document, current)
+            positions = {relation_key(r): i for i, r in enumerate(current.get("relations") or []) if "from" in r}
+            document.get("relations", []).sort(key=lambda r: positions.get(relation_key(r), len(positions)))
+        text = render(document)
+        if text == current_text:
+            return False
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, full_path)
+        return True
+
+
+def print_summary(puller, elapsed):
+    print("\n" + "=" * 60)
+    print("EXPORT PULL SUMMARY")
+    print("=" * 60)
+    columns = ("listed", "fetched", "written", "failed")
+    print(f"  {'type':<22}" + "".join(f"{column:>9}" for column in columns))
+    for entity_type, stats in puller.stats.items():
+        if entity_type not in puller.unavailable:
+            print(f"  {entity_type:<22}" + "".join(f"{stats[column]:>9}" for column in columns))
+    print("-" * 60)
+    for entity_type, message in sorted(puller.unavailable.items()):
+        print(f"⚠ {entity_type} could not be listed: {message}")
+    for entity_type, entity_id, message in puller.errors[:20]:
+        print(f"✗ {entity_type} {entity_id}: {message}")
+    if len(puller.errors) > 20:
+        print(f"  ... and {len(puller.errors) - 20} more")
+    for entity_id, entry in puller.removed:
+        print(f"⚠ {entry['type']} {entity_id} is no longer on the server: {', '.join(entry['paths'])}")
+    stats = puller.stats.values()
+    print(f"✓ {sum(s['listed'] for s in stats)} entities listed, {sum(s['fetched'] for s in stats)} fetched, "
+          f"{sum(s['written'] for s in stats)} files changed in {elapsed:.2f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Refresh the export tree from a ThingsBoard instance")
+    parser.add_argument("--url", default=TB_URL)
+    parser.add_argument("--username", default=USERNAME)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree to refresh (default: repository root)")
+    parser.add_argument("--manifest", help=f"manifest file (default: <root>/{MANIFEST_FILE})")
+    parser.add_argument("--workers", type=int, default=PULL_WORKERS, help="concurrent fetches")
+    parser.add_argument("--force", action="store_true", help="fetch every entity, not only those whose version changed")
+    parser.add_argument("--types", default=",".join(LIST_QUERIES),
+                        type=lambda value: [t for t in value.upper().split(",") if t],
+                        help="entity types to pull (default: all)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    client = ThingsBoardClient(args.url, args.username, args.password, pool_size=args.workers)
+    puller = ExportPuller(client, args.root, args.manifest, args.workers, args.force, args.types)
+    puller.run()
+    client.close()
+    print_summary(puller, time.perf_counter() - start)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Export Tree Push
+Loads the ThingsBoard version control export in the repository root
+(customer/, device_profile/, rule_chain/, widget_type/, dashboard/, ...) into
+a ThingsBoard instance through the REST API. The dependency order comes from
+the export itself: an entity waits for every other exported entity whose id
+it mentions (a device for its profile, a profile for its default rule chain
+and dashboard) and a dashboard or bundle waits for the widget types it uses.
+Independent entities are pushed concurrently, exported ids are rewritten to
+the ids the instance assigned, and relations follow once both ends exist.
+
+A manifest records, per exported entity, the instance id and a hash of what
+was pushed, so a re-sync only sends entities whose content (or whose
+dependencies' instance ids) changed. An unchanged tree re-syncs without a
+single entity request.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from export_index import EXPORT_ROOT, iter_json_files
+from tb_client import ENTITY_PATHS, ThingsBoardClient
+
+# Configuration
+TB_URL = "http://localhost:8080"
+USERNAME = "tenant@thingsboard.org"
+PASSWORD = "tenant"
+
+MANIFEST_FILE = ".push_manifest.json"  # Relative to EXPORT_ROOT
+PUSH_WORKERS = 16  # Concurrent entity pushes
+ATTRIBUTE_SCOPES = ("SERVER_SCOPE", "SHARED_SCOPE")  # Client attributes belong to the device
+NULL_ID = "13814000-1dd2-11b2-8080-808080808080"  # ThingsBoard's "no entity" id
+# When dependencies form a cycle, the entity of the earliest type here is pushed first
+TYPE_ORDER = ["CUSTOMER", "NOTIFICATION_TARGET", "NOTIFICATION_TEMPLATE", "WIDGET_TYPE", "WIDGETS_BUNDLE",
+              "CONVERTER", "INTEGRATION", "RULE_CHAIN", "DEVICE_PROFILE", "ASSET_PROFILE", "ASSET", "DEVICE",
+              "ENTITY_VIEW", "DASHBOARD", "NOTIFICATION_RULE"]
+# Fields the instance assigns; never sent
+ASSIGNED_FIELDS = ("id", "createdTime", "tenantId", "externalId", "version", "firstRuleNodeId", "assignedCustomers")
+
+
+def iter_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_strings(item)
+
+
+def rewrite_ids(value, ids):
+    """Copy of value with every string that is a mapped exported id replaced by the instance id"""
+    if isinstance(value, str):
+        return ids.get(value, value)
+    if isinstance(value, dict):
+        return {key: rewrite_ids(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rewrite_ids(item, ids) for item in value]
+    return value
+
+
+def attribute_value(attribute):
+    """The value of an exported attribute, whichever typed field holds it"""
+    for field in ("booleanValue", "longValue", "doubleValue", "strValue"):
+        if attribute.get(field) is not None:
+            return attribute[field]
+    value = attribute.get("jsonValue")
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def digest(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class ExportEntity:
+    def __init__(self, path, document):
+        self.path = path
+        self.entity_type = document["entityType"]
+        self.entity = document["entity"]
+        self.document = document
+        ref = self.entity.get("id")
+        self.export_id = ref.get("id") if isinstance(ref, dict) else None
+        self.key = self.export_id or path  # Entities exported without an id are tracked by file
+        self.name = self.entity.get("name") or self.entity.get("title") or self.entity.get("fqn") or path
+        self.depends_on = set()
+        self.dependents = []
+
+    def references(self):
+        """Every string in the parts of the document that are pushed"""
+        for part in ("entity", "metaData", "fqns"):
+            yield from iter_strings(self.document.get(part))
+
+    def widget_fqns(self):
+        if self.entity_type == "WIDGETS_BUNDLE":
+            return list(self.document.get("fqns") or [])
+        if self.entity_type == "DASHBOARD":
+            widgets = (self.entity.get("configuration") or {}).get("widgets") or {}
+            return [widget.get("typeFullFqn") for widget in widgets.values() if widget.get("typeFullFqn")]
+        return []
+
+    def payload(self, ids):
+        """Everything pushed for this entity, with exported ids rewritten"""
+        entity = {key: value for key, value in self.entity.items() if key not in ASSIGNED_FIELDS}
+        payload = {"entity": rewrite_ids(entity, ids)}
+        if self.entity_type == "RULE_CHAIN" and self.document.get("metaData"):
+            metadata = dict(self.document["metaData"])
+            metadata["nodes"] = [{key: value for key, value in node.items() if key not in ("id", "ruleChainId",
+                                                                                        "createdTime")}
+                                 for node in metadata.get("nodes") or []]
+            payload["metaData"] = rewrite_ids(metadata, ids)
+        if self.entity_type == "WIDGETS_BUNDLE" and self.document.get("fqns"):
+            payload["fqns"] = self.document["fqns"]
+        if self.entity_type == "DEVICE" and self.document.get("credentials"):
+            payload["credentials"] = {key: value for key, value in self.document["credentials"].items()
+                                      if key not in ASSIGNED_FIELDS and key != "deviceId"}
+        attributes = {scope: {a["key"]: attribute_value(a) for a in (self.document.get("attributes") or {})
+                              .get(scope) or []} for scope in ATTRIBUTE_SCOPES}
+        attributes = {scope: values for scope, values in attributes.items() if values}
+        if attributes:
+            payload["attributes"] = rewrite_ids(attributes, ids)
+        return payload
+
+
+class PushManifest:
+    def __init__(self, path, url):
+        self.path = path
+        self.url = url
+        self.entities = {}  # entity key -> {type, path, instance_id, hash}
+        self.relations = set()  # Pushed relations, as "from|type|to" keys
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("url") == url:  # Ids on another server mean nothing here
+            self.entities = data.get("entities", {})
+            self.relations = set(data.get("relations", []))
+
+    def record(self, item, instance_id, payload_hash):
+        with self.lock:
+            self.entities[item.key] = {"type": item.entity_type, "path": item.path, "instance_id": instance_id,
+                                       "hash": payload_hash}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"url": self.url, "entities": self.entities, "relations": sorted(self.relations)}, f,
+                      indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def load_export(root, exclude=()):
+    """ExportEntity for every version control envelope of a type the REST API can save; plus skipped paths"""
+    items, skipped = [], []
+    for path, _ in iter_json_files(root):
+        try:
+            with open(os.path.join(root, path), "rb") as f:
+                document = json.load(f)
+        except ValueError:
+            skipped.append(path)
+            continue
+        if (isinstance(document, dict) and document.get("entityType") in ENTITY_PATHS
+                and document["entityType"] not in exclude and isinstance(document.get("entity"), dict)):
+            items.append(ExportEntity(path, document))
+        else:
+            skipped.append(path)
+    return items, skipped
+
+
+def link_dependencies(items):
+    """Fill depends_on/dependents from the ids and widget type fqns each entity mentions"""
+    by_id = {item.export_id: item for item in items if item.export_id}
+    by_fqn = {item.entity.get("fqn"): item for item in items if item.entity_type == "WIDGET_TYPE"}
+    for item in items:
+        for value in set(item.references()):
+            other = by_id.get(value)
+            if other is not None and other is not item:
+                item.depends_on.add(other)
+        for fqn in item.widget_fqns():
+            if fqn in by_fqn:
+                item.depends_on.add(by_fqn[fqn])
+        for other in item.depends_on:
+            other.dependents.append(item)
+
+
+class ExportPusher:
+    def __init__(self, client, root=EXPORT_ROOT, manifest_path=None, workers=PUSH_WORKERS, force=False, exclude=()):
+        self.client = client
+        self.root = os.path.abspath(root)
+        self.exclude = exclude
+        self.workers = workers
+        self.force = force
+        self.manifest = PushManifest(manifest_path or os.path.join(self.root, MANIFEST_FILE), client.url)
+        # Exported id -> instance id; starts from the manifest so unchanged entities hash the same
+        self.ids = {key: entry["instance_id"] for key, entry in self.manifest.entities.items()}
+        self.results = {}  # entity key -> created | updated | adopted | unchanged | failed | skipped
+        self.errors = []  # (entity, message)
+        self.deferred = []  # Pushed before a dependency in a cycle; pushed again at the end
+
+    def run(self):
+        items, skipped = load_export(self.root, self.exclude)
+        link_dependencies(items)
+        self.push_all(items)
+        for item in self.deferred:
+            if self.results.get(item.key) not in ("failed", "skipped"):
+                self.push(item)  # Every dependency now has its instance id
+        relations = self.push_relations(items)
+        self.manifest.save()
+        return items, skipped, relations
+
+    def push_all(self, items):
+        """Push each entity once everything it depends on is pushed; independent entities concurrently"""
+        waiting = {item: len(item.depends_on) for item in items}
+        ready = [item for item, count in waiting.items() if count == 0]
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while waiting or running:
+                if not ready and not running:
+                    # Cycle: push the entity that usually comes first with its remaining references unresolved
+                    item = min(waiting, key=lambda i: (TYPE_ORDER.index(i.entity_type), i.path))
+                    self.deferred.append(item)
+                    ready.append(item)
+                for item in ready:
+                    waiting.pop(item, None)
+                    running[pool.submit(self.push, item)] = item
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = running.pop(future)
+                    for dependent in item.dependents:
+                        if dependent in waiting:
+                            waiting[dependent] -= 1
+                            if waiting[dependent] == 0:
+                                ready.append(dependent)
+
+    def push(self, item):
+        failed = [other for other in item.depends_on if self.results.get(other.key) in ("failed", "skipped")]
+        if failed:
+            self.results[item.key] = "skipped"
+            self.errors.append((item, f"depends on {failed[0].entity_type} {failed[0].name}, which was not pushed"))
+            return
+        payload = self.payload_of(item)
+        payload_hash = digest(payload)
+        entry = self.manifest.entities.get(item.key)
+        if entry and entry["hash"] == payload_hash and not self.force and item not in self.deferred:
+            self.results[item.key] = "unchanged"
+            return
+        try:
+            instance_id, result = self.save(item, payload, entry)
+        except Exception as e:
+            self.results[item.key] = "failed"
+            self.errors.append((item, str(e)))
+            return
+        self.ids[item.key] = instance_id
+        self.manifest.record(item, instance_id, payload_hash)
+        self.results[item.key] = result
+        if result == "created" and item.export_id in item.references():
+            self.push(item)  # Mentions its own id (a dashboard action opening one of its states): save it mapped
+            self.results[item.key] = result
+
+    def payload_of(self, item):
+        ids = dict(self.ids)  # Snapshot: other workers add ids concurrently
+        ids.pop(NULL_ID, None)
+        return item.payload(ids)
+
+    def save(self, item, payload, entry):
+        """Create or update one entity and everything stored with it; returns (instance id, result)"""
+        entity_type, entity = item.entity_type, dict(payload["entity"])
+        instance_id, result = (entry or {}).get("instance_id"), "updated"
+        if instance_id is None and item.export_id and self.client.get_entity(entity_type, item.export_id):
+            instance_id, result = item.export_id, "adopted"  # Pushing back to the server it was exported from
+        if instance_id:
+            entity["id"] = {"entityType": entity_type, "id": instance_id}
+            saved = self.client.save_entity(entity_type, entity)
+        elif entity_type == "DEVICE" and payload.get("credentials"):
+            saved, result = self.client.save_device_with_credentials(entity, payload["credentials"]), "created"
+        else:
+            saved, result = self.client.save_entity(entity_type, entity), "created"
+        instance_id = saved["id"]["id"]
+
+        if "metaData" in payload:
+            metadata = dict(payload["metaData"], ruleChainId={"entityType": "RULE_CHAIN", "id": instance_id})
+            self.client.save_rule_chain_metadata(metadata)
+            if item.entity.get("root") and item.entity.get("type", "CORE") == "CORE":  # Edge roots are per edge
+                self.client.set_root_rule_chain(instance_id)
+        if "fqns" in payload:
+            self.client.update_widgets_bundle_fqns(instance_id, payload["fqns"])
+        for scope, values in payload.get("attributes", {}).items():
+            if not self.client.save_attributes(entity_type, instance_id, values, scope, verbose=False):
+                raise Exception(f"Failed to save {scope} attributes")
+        return instance_id, result
+
+    def push_relations(self, items):
+        """Create the exported relations whose ends both exist; returns {pushed, unchanged, failed}"""
+        relations = {}
+        for item in items:
+            for relation in item.document.get("relations") or []:
+                source, target = relation.get("from") or {}, relation.get("to") or {}
+                if not source.get("id") or not target.get("id"):
+                    continue
+                source_id = self.ids.get(source["id"], source["id"])
+                target_id = self.ids.get(target["id"], target["id"])
+                key = f"{source_id}|{relation.get('type')}|{target_id}"
+                relations[key] = (source_id, source.get("entityType"), target_id, target.get("entityType"),
+                                  relation.get("type") or "Contains")
+        missing = [(key, relation) for key, relation in relations.items()
+                   if key not in self.manifest.relations or self.force]
+        stats = {"pushed": 0, "unchanged": len(relations) - len(missing), "failed": 0}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = pool.map(lambda relation: self.client.create_relation(*relation, verbose=False),
+                               [relation for _, relation in missing])
+            for (key, _), ok in zip(missing, results):
+                if ok:
+                    self.manifest.relations.add(key)
+                    stats["pushed"] += 1
+                else:
+                    stats["failed"] += 1
+        return stats
+
+
+def print_summary(pusher, items, skipped, relations, elapsed):
+    print("\n" + "=" * 60)
+    print("EXPORT PUSH SUMMARY")
+    print("=" * 60)
+    outcomes = ("created", "updated", "adopted", "unchanged", "failed", "skipped")
+    print(f"  {'type':<22}" + "".join(f"{outcome:>10}" for outcome in outcomes))
+    for entity_type in TYPE_ORDER:
+        counts = [sum(1 for item in items if item.entity_type == entity_type and pusher.results.get(item.key) == o)
+                  for o in outcomes]
+        if any(counts):
+            print(f"  {entity_type:<22}" + "".join(f"{count:>10}" for count in counts))
+    print(f"  {'relations':<22}{relations['pushed']:>10}{'':>10}{'':>10}{relations['unchanged']:>10}"
+          f"{relations['failed']:>10}")
+    print("-" * 60)
+    for item, message in pusher.errors[:20]:
+        print(f"✗ {item.entity_type} {item.name} ({item.path}): {message}")
+    if len(pusher.errors) > 20:
+        print(f"  ... and {len(pusher.errors) - 20} more")
+    if pusher.deferred:
+        print(f"⚠ {len(pusher.deferred)} entity(ies) in dependency cycles were pushed twice: "
+              + ", ".join(item.name for item in pusher.deferred[:5]))
+    if skipped:
+        print(f"⚠ {len(skipped)} file(s) are not version control exports and were not pushed")
+    print(f"✓ {len(items)} entities in {elapsed:.2f}s "
+          f"({sum(1 for r in pusher.results.values() if r in ('created', 'updated', 'adopted'))} pushed)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Push the export tree into a ThingsBoard instance")
+    parser.add_argument("--url", default=TB_URL)
+    parser.add_argument("--username", default=USERNAME)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree to push (default: repository root)")
+    parser.add_argument("--manifest", help=f"manifest file (default: <root>/{MANIFEST_FILE})")
+    parser.add_argument("--workers", type=int, default=PUSH_WORKERS, help="concurrent pushes")
+    parser.add_argument("--force", action="store_true", help="push every entity even if the manifest says unchanged")
+    parser.add_argument("--exclude", default="", type=lambda value: [t for t in value.upper().split(",") if t],
+                        help="entity types not to push, e.g. CONVERTER,INTEGRATION on Community Edition")
+    parser.add_argument("--list-skipped", action="store_true", help="print the files that were not pushed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    client = ThingsBoardClient(args.url, args.username, args.password, pool_size=args.workers)
+    pusher = ExportPusher(client, args.root, args.manifest, args.workers, args.force, args.exclude)
+    items, skipped, relations = pusher.run()
+    client.close()
+    print_summary(pusher, items, skipped, relations, time.perf_counter() - start)
+    if args.list_skipped:
+        for path in skipped:
+            print(f"  {path}")
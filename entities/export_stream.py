@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Streaming Export Reader
+Reads ThingsBoard export documents ({entityType, entity, metaData, relations,
+attributes}) without decoding the whole file. A byte scanner walks the
+document structure over a memory-mapped file. It hands json.loads only the
+one record asked for: a widget, a rule node, a relation or an attribute.
+Memory therefore stays bounded by the largest single record, not by the file,
+and parts nobody asks for (an embedded background image, a 1000-node rule
+chain's connections) are skipped without being decoded.
+
+Scanning the envelope in Python costs more CPU than json.loads on small
+files, so open_export only streams files of STREAM_THRESHOLD bytes or more.
+Smaller files are decoded whole by DocumentReader, which has the same
+record interface.
+"""
+
+import json
+import mmap
+import os
+import re
+
+MIN_WINDOW = 4096  # Smallest first guess at a record's size, see load
+STREAM_THRESHOLD = 4 * 1024 * 1024  # Files at least this big are streamed; smaller ones are decoded whole
+DECODER = json.JSONDecoder()
+
+WHITESPACE = re.compile(rb"[ \t\r\n]*")
+STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+SCALAR = re.compile(rb"[^,\]}\s]*")
+# Finds the next bracket outside a string; group 1 is set for opening brackets.
+# The regex engine skips strings and scalars in C. Possessive quantifiers also
+# keep it from backtracking through a malformed file.
+try:
+    BRACKET = re.compile(rb'(?:[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+")*+(?:([\[{])|[\]}])', re.DOTALL)
+except re.error:  # Possessive quantifiers need Python 3.11
+    BRACKET = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*(?:([\[{])|[\]}])', re.DOTALL)
+
+
+class ExportReader:
+    def __init__(self, path, use_mmap=True):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = None
+        if use_mmap:
+            try:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                pass  # Empty files cannot be mapped
+        self.buffer = self.map if self.map is not None else self.file.read()
+        self.last_end = (None, None)  # (start, end) of the last value measured or loaded
+        self.ends = {}  # start -> end of containers whose members were iterated to the end
+        self.window = MIN_WINDOW  # Bytes load() decodes on its first try
+        self.objects = {}  # object offset -> ({key: value offset} seen so far, member iterator), see member
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.buffer = b""
+        self.objects = {}
+        self.ends = {}
+        self.file.close()
+
+    # Scanning
+
+    def skip_whitespace(self, pos):
+        return WHITESPACE.match(self.buffer, pos).end()
+
+    def string_end(self, pos):
+        match = STRING.match(self.buffer, pos)
+        if match is None:
+            raise ValueError(f"{self.path}: unterminated string at offset {pos}")
+        return match.end()
+
+    def value_end(self, pos):
+        """Offset just past the value starting at pos"""
+        if self.last_end[0] == pos:
+            return self.last_end[1]
+        if pos in self.objects:
+            self.members(pos)  # Finish the member scan already under way instead of starting over
+        if pos in self.ends:
+            return self.ends[pos]
+        first = self.buffer[pos:pos + 1]
+        if first == b'"':
+            end = self.string_end(pos)
+        elif first in (b"{", b"["):
+            depth = 0
+            for match in BRACKET.finditer(self.buffer, pos):
+                if match.lastindex:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        end = match.end()
+                        break
+            else:
+                raise ValueError(f"{self.path}: unterminated value at offset {pos}")
+        else:
+            end = SCALAR.match(self.buffer, pos).end()
+        self.last_end = (pos, end)
+        return end
+
+    def load(self, pos):
+        """Decode only the value starting at pos.
+
+        The decoder finds the end of the value itself: a window of bytes,
+        sized from the previous record, is decoded and grown until it holds
+        the whole value, rather than scanning for the end and then decoding.
+        """
+        if self.last_end[0] == pos or pos in self.ends:
+            return json.loads(self.buffer[pos:self.value_end(pos)])
+        size = self.window
+        while True:
+            window = self.buffer[pos:pos + size]
+            try:
+                text = window.decode("utf-8")
+            except UnicodeDecodeError as e:
+                if e.end != len(window) or pos + size >= len(self.buffer):
+                    raise  # Invalid UTF-8 inside the record, as json.loads would report it
+                text = window[:e.start].decode("utf-8")  # A character cut at the window's edge
+            try:
+                value, end = DECODER.raw_decode(text)
+            except ValueError:
+                if pos + size >= len(self.buffer):
+                    raise
+                size *= 4
+                continue
+            end = end if window.isascii() else len(text[:end].encode())
+            self.last_end = (pos, pos + end)
+            self.window = max(MIN_WINDOW, 2 * end)  # Records of one kind tend to be alike in size
+            return value
+
+    def iter_members(self, pos):
+        """Yield (key, value offset) for each member of the object at pos"""
+        if self.buffer[pos:pos + 1] != b"{":
+            return
+        start, pos = pos, self.skip_whitespace(pos + 1)
+        while self.buffer[pos:pos + 1] == b'"':
+            key_end = self.string_end(pos)
+            raw = self.buffer[pos + 1:key_end - 1]
+            key = json.loads(self.buffer[pos:key_end]) if b"\\" in raw else raw.decode()
+            pos = self.skip_whitespace(key_end)
+            value = self.skip_whitespace(pos + 1)  # Past the colon
+            yield key, value
+            pos = self.skip_whitespace(self.value_end(value))
+            if self.buffer[pos:pos + 1] == b",":
+                pos = self.skip_whitespace(pos + 1)
+        self.ends[start] = pos + 1
+
+    def iter_items(self, pos):
+        """Yield the offset of each item of the array at pos"""
+        if self.buffer[pos:pos + 1] != b"[":
+            return
+        start, pos = pos, self.skip_whitespace(pos + 1)
+        while pos < len(self.buffer) and self.buffer[pos:pos + 1] != b"]":
+            yield pos
+            pos = self.skip_whitespace(self.value_end(pos))
+            if self.buffer[pos:pos + 1] == b",":
+                pos = self.skip_whitespace(pos + 1)
+        self.ends[start] = pos + 1
+
+    def find(self, *keys, pos=None):
+        """Offset of the value at a path of object keys, or None.
+
+        The member offsets of each object on the way are remembered, so
+        finding relations after widgets does not scan the entity again.
+        """
+        pos = self.skip_whitespace(0) if pos is None else pos
+        for key in keys:
+            pos = self.member(pos, key)
+            if pos is None:
+                return None
+        return pos
+
+    def member(self, pos, key):
+        """Offset of one member of the object at pos, scanning no further than needed"""
+        if pos not in self.objects:
+            self.objects[pos] = ({}, self.iter_members(pos))
+        seen, members = self.objects[pos]
+        if key in seen:
+            return seen[key]
+        for member, value in members:
+            seen[member] = value
+            if member == key:
+                return value
+        return None
+
+    def members(self, pos):
+        """{key: value offset} for the whole object at pos, remembered like member()"""
+        self.member(pos, None)
+        return self.objects[pos][0]
+
+    # Export documents
+
+    def entity(self):
+        """Offset of the exported entity; bare dashboards saved from the UI are their own entity"""
+        root = self.skip_whitespace(0)
+        found = self.member(root, "entity")
+        return found if found is not None and self.buffer[found:found + 1] == b"{" else root
+
+    def entity_type(self):
+        """The envelope's entityType, "DASHBOARD" for a bare dashboard, or None for anything else"""
+        root = self.skip_whitespace(0)
+        if self.entity() != root:
+            entity_type = self.member(root, "entityType")
+            return self.load(entity_type) if entity_type is not None else None
+        if self.find("configuration", "widgets") is not None:
+            return "DASHBOARD"
+        return None
+
+    def header(self):
+        """entityType plus the entity's scalar fields and id, without decoding anything larger.
+
+        Returns None for documents that are neither an export envelope nor a bare dashboard.
+        """
+        entity_type = self.entity_type()
+        if entity_type is None:
+            return None
+        header = {"entityType": entity_type}
+        for key, value in self.members(self.entity()).items():
+            first = self.buffer[value:value + 1]
+            if first not in (b"{", b"["):
+                header[key] = self.load(value)
+            elif key == "id":
+                header["id"] = (self.load(value) or {}).get("id")
+        return header
+
+    def iter_widgets(self):
+        """Yield (widget id, widget) for each dashboard widget"""
+        widgets = self.find("configuration", "widgets", pos=self.entity())
+        if widgets is None:
+            return
+        for widget_id, value in self.iter_members(widgets):
+            widget = self.load(value)
+            yield widget.get("id", widget_id), widget
+
+    def iter_datasources(self):
+        """Yield (widget id, position, kind, datasource), the alarm source counted as a datasource"""
+        for widget_id, widget in self.iter_widgets():
+            config = widget.get("config") or {}
+            sources = [(datasource.get("type"), datasource) for datasource in config.get("datasources") or []]
+            if isinstance(config.get("alarmSource"), dict):
+                sources.append(("alarmSource", config["alarmSource"]))
+            for position, (kind, datasource) in enumerate(sources):
+                yield widget_id, position, kind, datasource
+
+    def iter_aliases(self):
+        """Yield (alias id, alias) for each dashboard entity alias"""
+        aliases = self.find("configuration", "entityAliases", pos=self.entity())
+        if aliases is None:
+            return
+        for alias_id, value in self.iter_members(aliases):
+            alias = self.load(value)
+            yield alias.get("id", alias_id), alias
+
+    def iter_rule_nodes(self):
+        """Yield (index, rule node) for each node of an exported rule chain"""
+        nodes = self.find("metaData", "nodes")
+        if nodes is None:
+            return
+        for index, value in enumerate(self.iter_items(nodes)):
+            yield index, self.load(value)
+
+    def iter_connections(self):
+        """Yield each rule chain connection ({fromIndex, toIndex, type})"""
+        connections = self.find("metaData", "connections")
+        if connections is None:
+            return
+        for value in self.iter_items(connections):
+            yield self.load(value)
+
+    def iter_relations(self):
+        relations = self.find("relations")
+        if relations is None:
+            return
+        for value in self.iter_items(relations):
+            yield self.load(value)
+
+    def iter_attributes(self):
+        """Yield (scope, attribute) for each exported attribute"""
+        attributes = self.find("attributes")
+        if attributes is None:
+            return
+        for scope, value in self.iter_members(attributes):
+            for item in self.iter_items(value):
+                yield scope, self.load(item)
+
+
+class DocumentReader:
+    """ExportReader's record interface over a document decoded whole with json.loads"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = f.read()
+        self.decoded = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.buffer = b""
+        self.decoded = None
+
+    def document(self):
+        """The decoded document; raises ValueError like ExportReader does for a malformed file"""
+        if self.decoded is None:
+            self.decoded = json.loads(self.buffer)
+        return self.decoded
+
+    def entity(self):
+        document = self.document()
+        if isinstance(document, dict) and isinstance(document.get("entity"), dict):
+            return document["entity"]
+        return document
+
+    def find(self, *keys, entity=False):
+        """The value at a path of object keys, or None"""
+        value = self.entity() if entity else self.document()
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        return value
+
+    def entity_type(self):
+        document = self.document()
+        if not isinstance(document, dict):
+            return None
+        if self.entity() is not document:
+            return document.get("entityType")
+        configuration = document.get("configuration")
+        if isinstance(configuration, dict) and "widgets" in configuration:
+            return "DASHBOARD"
+        return None
+
+    def header(self):
+        entity_type = self.entity_type()
+        if entity_type is None:
+            return None
+        header = {"entityType": entity_type}
+        for key, value in self.entity().items():
+            if not isinstance(value, (dict, list)):
+                header[key] = value
+            elif key == "id":
+                header["id"] = (value or {}).get("id")
+        return header
+
+    def iter_widgets(self):
+        widgets = self.find("configuration", "widgets", entity=True)
+        for widget_id, widget in (widgets.items() if isinstance(widgets, dict) else ()):
+            yield widget.get("id", widget_id), widget
+
+    def iter_datasources(self):
+        return ExportReader.iter_datasources(self)
+
+    def iter_aliases(self):
+        aliases = self.find("configuration", "entityAliases", entity=True)
+        for alias_id, alias in (aliases.items() if isinstance(aliases, dict) else ()):
+            yield alias.get("id", alias_id), alias
+
+    def iter_rule_nodes(self):
+        nodes = self.find("metaData", "nodes")
+        yield from enumerate(nodes if isinstance(nodes, list) else ())
+
+    def iter_connections(self):
+        connections = self.find("metaData", "connections")
+        yield from connections if isinstance(connections, list) else ()
+
+    def iter_relations(self):
+        relations = self.find("relations")
+        yield from relations if isinstance(relations, list) else ()
+
+    def iter_attributes(self):
+        attributes = self.find("attributes")
+        for scope, items in (attributes.items() if isinstance(attributes, dict) else ()):
+            for attribute in items if isinstance(items, list) else ():
+                yield scope, attribute
+
+
+def open_export(path, stream_threshold=STREAM_THRESHOLD):
+    """ExportReader for a file of stream_threshold bytes or more, DocumentReader for a smaller one"""
+    if os.path.getsize(path) >= stream_threshold:
+        return ExportReader(path)
+    return DocumentReader(path)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Synthetic Farm Generator
+Builds fleet-scale farms from the sample asset and device definitions: N
+fields laid out on a grid, each with an irregular perimeter polygon, M
+moisture sensors placed inside it, and a water meter and smart valve.
+Fields and devices are generated lazily (a field's geometry is re-derived
+from the seed when its devices are generated), so a 100k-device farm can be
+streamed into setup or to a JSON lines file without holding it in memory.
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+
+SENSORS_PER_FIELD = 8
+METERS_PER_FIELD = 1
+VALVES_PER_FIELD = 1
+FIELD_SPACING_M = 1000  # Grid pitch between field centres
+MIN_RADIUS_M = 150
+MAX_RADIUS_M = 400  # Keeps neighbouring fields from overlapping at FIELD_SPACING_M
+METERS_PER_DEGREE = 111320
+
+MOISTURE_SENSOR = "SI Soil Moisture Sensor"
+WATER_METER = "SI Water Meter"
+SMART_VALVE = "SI Smart Valve"
+
+
+def point_in_polygon(lon, lat, ring):
+    """Ray casting test against a closed [lon, lat] ring"""
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def ring_centre(ring):
+    """Centre of a ring's bounding box"""
+    lons = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    return (min(lons) + max(lons)) / 2, (min(lats) + max(lats)) / 2
+
+
+class FarmGenerator:
+    def __init__(self, asset_templates, device_templates, fields, sensors_per_field=SENSORS_PER_FIELD,
+                 meters_per_field=METERS_PER_FIELD, valves_per_field=VALVES_PER_FIELD, seed=0):
+        self.asset_templates = asset_templates
+        self.device_templates = {}  # type -> first template of that type
+        for template in device_templates:
+            self.device_templates.setdefault(template["type"], template)
+        self.fields = fields
+        self.sensors_per_field = sensors_per_field
+        self.meters_per_field = meters_per_field
+        self.valves_per_field = valves_per_field
+        self.seed = seed
+        self.columns = max(1, math.ceil(math.sqrt(fields)))
+        self.width = len(str(fields))
+
+        perimeter = asset_templates[0].get("attributes", {}).get("server", {}).get("perimeter")
+        if perimeter:
+            self.origin = ring_centre(perimeter["coordinates"][0])
+        else:
+            self.origin = (-122.0835, 37.4214)
+
+    @classmethod
+    def from_files(cls, assets_path, devices_path, fields, **kwargs):
+        with open(assets_path, "r") as f:
+            asset_templates = json.load(f)
+        with open(devices_path, "r") as f:
+            device_templates = json.load(f)
+        return cls(asset_templates, device_templates, fields, **kwargs)
+
+    def __len__(self):
+        """Devices in the farm"""
+        return self.fields * (self.sensors_per_field + self.meters_per_field + self.valves_per_field)
+
+    def to_degrees(self, east_m, north_m, lat):
+        return east_m / (METERS_PER_DEGREE * math.cos(math.radians(lat))), north_m / METERS_PER_DEGREE
+
+    def field_geometry(self, index):
+        """Perimeter ring of one field, always the same for a given seed and index"""
+        rng = random.Random(f"{self.seed}:field:{index}")
+        row, column = divmod(index, self.columns)
+        origin_lon, origin_lat = self.origin
+        d_lon, d_lat = self.to_degrees(column * FIELD_SPACING_M, -row * FIELD_SPACING_M, origin_lat)
+        centre_lon, centre_lat = origin_lon + d_lon, origin_lat + d_lat
+
+        # Star-shaped polygon: sorted angles with jittered radii never self-intersect
+        vertices = rng.randint(5, 9)
+        base_radius = rng.uniform(MIN_RADIUS_M, MAX_RADIUS_M)
+        step = 2 * math.pi / vertices
+        ring = []
+        for k in range(vertices):
+            angle = k * step + rng.uniform(-0.3, 0.3) * step
+            radius = base_radius * rng.uniform(0.7, 1.0)
+            d_lon, d_lat = self.to_degrees(radius * math.cos(angle), radius * math.sin(angle), centre_lat)
+            ring.append([round(centre_lon + d_lon, 6), round(centre_lat + d_lat, 6)])
+        ring.append(ring[0])
+        return ring
+
+    def field_name(self, index):
+        template = self.asset_templates[index % len(self.asset_templates)]
+        crop = template.get("attributes", {}).get("server", {}).get("cropType", "Field")
+        return f"Field {index + 1:0{self.width}d} - {crop}"
+
+    def make_field(self, index):
+        template = self.asset_templates[index % len(self.asset_templates)]
+        field = copy.deepcopy(template)
+        field["name"] = self.field_name(index)
+        field["label"] = f"Field {index + 1:0{self.width}d}"
+        field.setdefault("additionalInfo", {})["description"] = f"Synthetic field {index + 1}"
+        server = field.setdefault("attributes", {}).setdefault("server", {})
+        server["perimeter"] = {"type": "Polygon", "coordinates": [self.field_geometry(index)]}
+        return field
+
+    def make_device(self, device_type, name, label, field_name, position=None, thresholds=None):
+        template = self.device_templates.get(device_type)
+        if template is None:
+            device = {"type": device_type, "deviceProfileName": device_type, "attributes": {"server": {}}}
+        else:
+            device = copy.deepcopy(template)
+        device["name"] = name
+        device["label"] = label
+        device["fieldAssociation"] = field_name
+        device.setdefault("additionalInfo", {})["description"] = f"{device_type} in {field_name}"
+        server = device.setdefault("attributes", {}).setdefault("server", {})
+        if position:
+            server["longitude"], server["latitude"] = position
+        if thresholds:
+            server.update(thresholds)
+        return device
+
+    def iter_fields(self):
+        """Yield asset definitions in the 04_sample_assets.json format"""
+        for index in range(self.fields):
+            yield self.make_field(index)
+
+    def iter_field_devices(self, index):
+        field_name = self.field_name(index)
+        ring = self.field_geometry(index)
+        rng = random.Random(f"{self.seed}:devices:{index}")
+        server = self.asset_templates[index % len(self.asset_templates)].get("attributes", {}).get("server", {})
+        thresholds = {key: server[key] for key in ("minMoistureThreshold", "maxMoistureThreshold") if key in server}
+        number = f"{index + 1:0{self.width}d}"
+
+        lons = [point[0] for point in ring]
+        lats = [point[1] for point in ring]
+        for j in range(self.sensors_per_field):
+            while True:
+                lon = rng.uniform(min(lons), max(lons))
+                lat = rng.uniform(min(lats), max(lats))
+                if point_in_polygon(lon, lat, ring):
+                    break
+            yield self.make_device(MOISTURE_SENSOR, f"Moisture Sensor {number}-{j + 1:03d}",
+                                   f"Sensor {number}-{j + 1}", field_name, (round(lon, 6), round(lat, 6)), thresholds)
+        for device_type, count, prefix, label in ((WATER_METER, self.meters_per_field, "Water Meter", "Meter"),
+                                                  (SMART_VALVE, self.valves_per_field, "Smart Valve", "Valve")):
+            for j in range(count):
+                suffix = f"-{j + 1}" if count > 1 else ""
+                yield self.make_device(device_type, f"{prefix} {number}{suffix}", f"{label} {number}{suffix}",
+                                       field_name)
+
+    def iter_devices(self):
+        """Yield device definitions in the 05_sample_devices.json format"""
+        for index in range(self.fields):
+            yield from self.iter_field_devices(index)
+
+    def write_jsonl(self, path):
+        """Write all fields, then all devices, one {"kind", "data"} record per line"""
+        count = 0
+        with open(path, "w") as f:
+            for kind, items in (("asset", self.iter_fields()), ("device", self.iter_devices())):
+                for item in items:
+                    f.write(json.dumps({"kind": kind, "data": item}, separators=(",", ":")))
+                    f.write("\n")
+                    count += 1
+        return count
+
+
+def iter_jsonl(path, kind):
+    """Stream the definitions of one kind ("asset" or "device") from a farm file"""
+    with open(path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["kind"] == kind:
+                yield record["data"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic irrigation farm")
+    parser.add_argument("--fields", type=int, default=100)
+    parser.add_argument("--sensors", type=int, default=SENSORS_PER_FIELD, help="moisture sensors per field")
+    parser.add_argument("--meters", type=int, default=METERS_PER_FIELD, help="water meters per field")
+    parser.add_argument("--valves", type=int, default=VALVES_PER_FIELD, help="smart valves per field")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="PATH", help="write the farm to a JSON lines file")
+    parser.add_argument("--input", metavar="PATH", help="provision a farm file written with --output")
+    parser.add_argument("--provision", action="store_true",
+                        help="stream the farm into setup_irrigation_system (uses its TB_URL and credentials)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generator = FarmGenerator.from_files("04_sample_assets.json", "05_sample_devices.json", args.fields,
+                                         sensors_per_field=args.sensors, meters_per_field=args.meters,
+                                         valves_per_field=args.valves, seed=args.seed)
+    if args.output:
+        count = generator.write_jsonl(args.output)
+        print(f"✓ Wrote {count} entities ({args.fields} fields, {len(generator)} devices) to {args.output}")
+    if args.provision:
+        from setup_irrigation_entities import setup_irrigation_system
+
+        if args.input:
+            setup_irrigation_system(iter_jsonl(args.input, "asset"), iter_jsonl(args.input, "device"))
+        else:
+            setup_irrigation_system(generator.iter_fields(), generator.iter_devices())
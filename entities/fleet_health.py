@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fleet Health
+Streaming freshness and battery statistics for the whole device fleet.
+Last-telemetry ages go into a LatencyHistogram and battery levels into fixed
+1% bins, so a report over hundreds of thousands of devices holds one
+fixed-size sketch, a few counters per device type and the worst few fields,
+never a list of devices. Offending devices are written out as they are seen.
+"""
+
+import csv
+import heapq
+import time
+from datetime import datetime, timezone
+
+from latency_histogram import LatencyHistogram
+from scheduler import DEVICE_PERIODS, INTERVAL_SECONDS
+
+SILENT_INTERVALS = 3  # Devices quiet for more than this many reporting periods count as silent
+LOW_BATTERY = 20  # Percent
+MAX_AGE_SECONDS = 365 * 24 * 3600  # Older readings are clamped into the top age bucket
+WORST_FIELDS = 10  # Fields listed in the per-field breakdown
+AGE_PERCENTILES = (50, 90, 99)
+BATTERY_PERCENTILES = (1, 5, 50)
+TELEMETRY_KEYS = ("moisture", "pulseCounter", "battery")
+OFFENDER_COLUMNS = ["field", "device", "type", "last_seen", "age_seconds", "battery", "problems"]
+
+
+def format_age(seconds):
+    """Short human-readable duration"""
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    if seconds < 172800:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+class FieldHealth:
+    __slots__ = ("name", "devices", "silent", "never", "low_battery", "oldest")
+
+    def __init__(self, name):
+        self.name = name
+        self.devices = 0
+        self.silent = 0
+        self.never = 0
+        self.low_battery = 0
+        self.oldest = 0.0  # Seconds since the stalest device in the field last reported
+
+    def score(self):
+        """Sort key for the worst-fields list: share of quiet devices, then staleness"""
+        return ((self.silent + self.never) / self.devices if self.devices else 0.0, self.oldest)
+
+
+class FleetHealth:
+    def __init__(self, silent_intervals=SILENT_INTERVALS, low_battery=LOW_BATTERY, periods=DEVICE_PERIODS,
+                 default_period=INTERVAL_SECONDS, offenders=None, now=None):
+        """offenders is an optional file object that receives one CSV row per offending device"""
+        self.silent_intervals = silent_intervals
+        self.low_battery = low_battery
+        self.periods = periods
+        self.default_period = default_period
+        self.now = now if now is not None else time.time()
+        self.ages = LatencyHistogram(highest_seconds=MAX_AGE_SECONDS)
+        self.battery = [0] * 101  # Devices per whole battery percent
+        self.devices = 0
+        self.silent = 0
+        self.never = 0
+        self.low = 0
+        self.offender_count = 0
+        self.by_type = {}  # device type -> [devices, silent, never]
+        self.fields = 0
+        self.worst = []  # Min-heap of (score, field number, FieldHealth), at most WORST_FIELDS long
+        self.writer = None
+        if offenders is not None:
+            self.writer = csv.writer(offenders)
+            self.writer.writerow(OFFENDER_COLUMNS)
+
+    def start_field(self, name):
+        return FieldHealth(name)
+
+    def end_field(self, field):
+        self.fields += 1
+        entry = (field.score(), self.fields, field)
+        if len(self.worst) < WORST_FIELDS:
+            heapq.heappush(self.worst, entry)
+        elif entry > self.worst[0]:
+            heapq.heapreplace(self.worst, entry)
+
+    def add(self, field, device_name, device_type, last_ts_ms, battery):
+        """Account for one device; last_ts_ms and battery are None when never reported"""
+        self.devices += 1
+        field.devices += 1
+        type_counts = self.by_type.setdefault(device_type, [0, 0, 0])
+        type_counts[0] += 1
+        problems = []
+
+        age = None
+        if last_ts_ms:
+            age = max(0.0, self.now - last_ts_ms / 1000)
+            self.ages.record(age)
+            field.oldest = max(field.oldest, age)
+            if age > self.silent_intervals * self.periods.get(device_type, self.default_period):
+                self.silent += 1
+                field.silent += 1
+                type_counts[1] += 1
+                problems.append("silent")
+        else:
+            self.never += 1
+            field.never += 1
+            type_counts[2] += 1
+            problems.append("never reported")
+
+        if battery is not None:
+            level = min(100, max(0, int(battery)))
+            self.battery[level] += 1
+            if level < self.low_battery:
+                self.low += 1
+                field.low_battery += 1
+                problems.append("low battery")
+
+        if problems:
+            self.offender_count += 1
+            if self.writer:
+                last_seen = datetime.fromtimestamp(last_ts_ms / 1000, timezone.utc).isoformat() if last_ts_ms else ""
+                self.writer.writerow([field.name, device_name, device_type, last_seen,
+                                      "" if age is None else round(age), "" if battery is None else f"{battery:g}",
+                                      ";".join(problems)])
+
+    def battery_percentile(self, percent):
+        total = sum(self.battery)
+        if not total:
+            return None
+        target = max(1, -(-total * percent // 100))
+        seen = 0
+        for level, count in enumerate(self.battery):
+            seen += count
+            if seen >= target:
+                return level
+        return 100
+
+    def print_report(self):
+        print(f"  Devices: {self.devices} in {self.fields} field(s)")
+        if self.ages.count:
+            ages = "  ".join(f"p{p} {format_age(self.ages.percentile(p))}" for p in AGE_PERCENTILES)
+            print(f"  Last telemetry age: {ages}  max {format_age(self.ages.max / 1_000_000)}")
+        share = f" ({self.silent / self.devices:.1%})" if self.devices else ""
+        print(f"  Silent for > {self.silent_intervals} intervals: {self.silent}{share}"
+              f"   Never reported: {self.never}")
+        for device_type, (devices, silent, never) in sorted(self.by_type.items()):
+            print(f"    {device_type:<25} {devices:>7} device(s) {silent:>6} silent {never:>6} never")
+
+        if sum(self.battery):
+            levels = "  ".join(f"p{p} {self.battery_percentile(p)}%" for p in BATTERY_PERCENTILES)
+            print(f"  Battery: {levels}   below {self.low_battery}%: {self.low}")
+            bands = [sum(self.battery[start:start + 10]) for start in range(0, 100, 10)]
+            bands[-1] += self.battery[100]
+            print("    " + "  ".join(f"{start * 10}-{start * 10 + 9 if start < 9 else 100}%: {count}"
+                                     for start, count in enumerate(bands) if count))
+
+        worst = [field for _, _, field in sorted(self.worst, reverse=True) if field.silent or field.never
+                 or field.low_battery]
+        if worst:
+            print("  Worst fields:")
+            print(f"    {'field':<30} {'devices':>7} {'silent':>6} {'never':>6} {'low bat':>7} {'oldest':>7}")
+            for field in worst:
+                print(f"    {field.name:<30} {field.devices:>7} {field.silent:>6} {field.never:>6} "
+                      f"{field.low_battery:>7} {format_age(field.oldest):>7}")
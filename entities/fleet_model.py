@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Vectorized Fleet Model
+Struct-of-arrays state for the simulated sensors. One NumPy update per tick
+replaces the per-device random calls in TelemetrySimulator; payload dicts
+are only built when a device's telemetry is actually sent.
+"""
+
+import numpy as np
+
+MOISTURE_SENSOR = 0
+WATER_METER = 1
+SMART_VALVE = 2
+UNKNOWN = -1
+
+TYPE_CODES = {
+    'SI Soil Moisture Sensor': MOISTURE_SENSOR,
+    'SI Water Meter': WATER_METER,
+    'SI Smart Valve': SMART_VALVE,
+}
+
+
+class FleetState:
+    def __init__(self, names, types, moisture=None, seed=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.rng = np.random.default_rng(seed)
+
+        size = len(self.names)
+        self.type_codes = np.array([TYPE_CODES.get(t, UNKNOWN) for t in types], dtype=np.int8)
+        self.is_moisture = self.type_codes == MOISTURE_SENSOR
+        self.is_meter = self.type_codes == WATER_METER
+        if moisture is None:
+            moisture = self.rng.integers(50, 71, size)
+        self.moisture = np.asarray(moisture, dtype=np.float64)
+        self.battery = np.zeros(size, dtype=np.int16)
+        self.pulses = np.zeros(size, dtype=np.int32)
+
+    @classmethod
+    def from_device_tokens(cls, device_tokens, moisture_trends, seed=None):
+        """Build the arrays from TelemetrySimulator's per-device dicts"""
+        names = list(device_tokens)
+        return cls(
+            names,
+            [device_tokens[name]['type'] for name in names],
+            moisture=[moisture_trends.get(name, 60) for name in names],
+            seed=seed
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def indices_of(self, names):
+        """Array positions of the named devices"""
+        return np.fromiter((self.index[name] for name in names), dtype=np.intp, count=len(names))
+
+    def step(self, indices=None):
+        """Advance every device (or only those at `indices`) by one tick"""
+        if indices is None:
+            indices = slice(None)
+            size = len(self.names)
+        else:
+            size = len(indices)
+        rng = self.rng
+
+        # Random walk with bounds, moisture sensors only
+        walked = np.clip(self.moisture[indices] + rng.uniform(-2, 2, size), 30, 90)
+
+        # Occasional irrigation events below 45%
+        bump = (walked < 45) & (rng.random(size) > 0.7)
+        walked += np.where(bump, rng.uniform(5, 15, size), 0.0)
+        self.moisture[indices] = np.where(self.is_moisture[indices], walked, self.moisture[indices])
+
+        self.battery[indices] = rng.integers(75, 101, size)
+        self.pulses[indices] = rng.integers(0, 101, size)
+
+    def iter_payloads(self, indices=None):
+        """Yield (name, payload) for every known device type, building dicts lazily"""
+        if indices is None:
+            positions, indices = range(len(self.names)), slice(None)
+        else:
+            positions = indices.tolist()
+        moisture = np.round(self.moisture[indices], 1).tolist()
+        battery = self.battery[indices].tolist()
+        pulses = self.pulses[indices].tolist()
+        type_codes = self.type_codes[indices].tolist()
+        for j, i in enumerate(positions):
+            name = self.names[i]
+            code = type_codes[j]
+            if code == MOISTURE_SENSOR:
+                payload = {"moisture": moisture[j], "battery": battery[j]}
+            elif code == WATER_METER:
+                payload = {"pulseCounter": pulses[j], "battery": battery[j]}
+            elif code == SMART_VALVE:
+                payload = {"battery": battery[j]}
+            else:
+                continue
+            yield name, payload
+
+    def moisture_of(self, name):
+        """Current moisture of one device, or None if it is not a moisture sensor"""
+        i = self.index.get(name)
+        if i is None or not self.is_moisture[i]:
+            return None
+        return round(float(self.moisture[i]), 1)
+
+    def nbytes(self):
+        """Bytes held by the NumPy arrays"""
+        return sum(a.nbytes for a in (self.type_codes, self.is_moisture, self.is_meter,
+                                      self.moisture, self.battery, self.pulses))
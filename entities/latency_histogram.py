@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram
+HDR-style log-linear histogram of request latencies. Values are bucketed in
+microseconds with a fixed number of significant digits, so recording is
+O(1), memory stays constant however many samples are taken, and
+histograms from different ticks or processes can be merged exactly.
+"""
+
+import math
+
+DEFAULT_HIGHEST_SECONDS = 3600  # Larger samples are clamped to this
+DEFAULT_SIGNIFICANT_DIGITS = 2
+REPORTED_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, highest_seconds=DEFAULT_HIGHEST_SECONDS, significant_digits=DEFAULT_SIGNIFICANT_DIGITS):
+        self.significant_digits = significant_digits
+        self.highest = int(highest_seconds * 1_000_000)
+        # Each power-of-two range is split into sub-buckets fine enough for the requested precision
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.half_count = 1 << (self.sub_bucket_bits - 1)
+        self.counts = [0] * (self.index_of(self.highest) + 1)
+        self.count = 0
+        self.total = 0  # Sum of recorded microseconds
+        self.min = None
+        self.max = 0
+
+    def index_of(self, value):
+        bucket = max(0, value.bit_length() - self.sub_bucket_bits)
+        return bucket * self.half_count + (value >> bucket)
+
+    def value_at(self, index):
+        """Highest microsecond value that maps to a bucket index"""
+        bucket = max(0, index // self.half_count - 1)
+        sub_bucket = index - bucket * self.half_count
+        return ((sub_bucket + 1) << bucket) - 1
+
+    def record(self, seconds):
+        """Record one latency sample given in seconds"""
+        value = min(max(0, int(seconds * 1_000_000)), self.highest)
+        self.counts[self.index_of(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add another histogram with the same settings into this one"""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, percent):
+        """Latency in seconds at or below which `percent` of samples fall"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * percent / 100.0))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.value_at(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def mean(self):
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def to_dict(self):
+        """Summary in milliseconds plus the raw non-empty buckets ({upper bound µs: count})"""
+        summary = {
+            "count": self.count,
+            "min_ms": round((self.min or 0) / 1000, 3),
+            "mean_ms": round(self.mean() * 1000, 3),
+            "max_ms": round(self.max / 1000, 3),
+            "significant_digits": self.significant_digits
+        }
+        for percent in REPORTED_PERCENTILES:
+            summary[f"p{percent:g}_ms".replace(".", "_")] = round(self.percentile(percent) * 1000, 3)
+        summary["buckets"] = {
+            str(self.value_at(index)): count for index, count in enumerate(self.counts) if count
+        }
+        return summary
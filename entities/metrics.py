@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics
+Process-wide counters and histograms for ThingsBoard requests and simulator
+ticks, exposed in the Prometheus text format on a local HTTP endpoint so
+ingest pressure can be charted next to ThingsBoard's own metrics.
+"""
+
+import bisect
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9108  # Default port for the /metrics endpoint
+METRICS_HOST = "127.0.0.1"  # Local only; pass "0.0.0.0" to let a remote Prometheus scrape it
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TICK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Request paths are reduced to templates so ids and tokens don't explode label cardinality
+UUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+DEVICE_TOKEN_PATTERN = re.compile(r"^/api/v1/[^/]+/")
+
+
+def endpoint_of(path):
+    """Label-safe template of a request path"""
+    path = path.split("?", 1)[0]
+    path = DEVICE_TOKEN_PATTERN.sub("/api/v1/{token}/", path)
+    return UUID_PATTERN.sub("{id}", path)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value):
+    return f"{value:.17g}" if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, list(series)) for key, series in self.values.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter(
+    "thingsboard_requests_total", "Requests sent to ThingsBoard", ("method", "endpoint", "status"))
+REQUEST_BYTES = REGISTRY.counter(
+    "thingsboard_request_bytes_total", "Request body bytes sent to ThingsBoard", ("method", "endpoint"))
+REQUEST_LATENCY = REGISTRY.histogram(
+    "thingsboard_request_duration_seconds", "Request round-trip time", ("method", "endpoint"))
+TICK_DURATION = REGISTRY.histogram(
+    "simulator_tick_duration_seconds", "Time to send one tick of telemetry", buckets=TICK_BUCKETS)
+TICK_LAG = REGISTRY.histogram(
+    "simulator_tick_lag_seconds", "How late each tick started against its schedule", buckets=TICK_BUCKETS)
+
+
+def observe_request(method, endpoint, status, nbytes, seconds):
+    """Record one request against an endpoint template (status is an HTTP code or "error")"""
+    REQUESTS.inc(method, endpoint, str(status))
+    REQUEST_BYTES.inc(method, endpoint, amount=nbytes)
+    REQUEST_LATENCY.observe(seconds, method, endpoint)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would drown the script's own output
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics from a daemon thread, returning the server"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"✓ Prometheus metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Bulk Provisioning
+Creates device profiles, assets, devices, attributes, relations and initial
+telemetry as a dependency graph of phases. A phase starts as soon as the
+phases it depends on have finished, and the HTTP calls inside every phase
+share one bounded worker pool. Existing entities are looked up by name first,
+so re-running against a provisioned tenant only fills in what is missing.
+Large inputs are provisioned in batches; the name indexes are kept between
+batches so each kind of entity is scanned only once.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROVISION_WORKERS = 16  # Concurrent ThingsBoard calls across all phases
+PROVISION_BATCH_SIZE = 1000  # Assets or devices provisioned per run of the phase graph
+ATTRIBUTE_SCOPE = "SERVER_SCOPE"
+
+
+class Phase:
+    def __init__(self, name, run, depends_on=()):
+        self.name = name
+        self.run = run  # Returns a stats dict, e.g. {"created": n, "existing": m}
+        self.depends_on = depends_on
+        self.done = threading.Event()
+        self.started = None
+        self.elapsed = None
+        self.stats = {}
+        self.error = None
+
+
+def run_phases(phases, started_at):
+    """Run phases in dependency order, independent phases concurrently"""
+    by_name = {phase.name: phase for phase in phases}
+
+    def run(phase):
+        for dependency in phase.depends_on:
+            by_name[dependency].done.wait()
+            if by_name[dependency].error:
+                phase.error = f"skipped: {dependency} failed"
+                phase.done.set()
+                return
+        phase.started = time.perf_counter() - started_at
+        try:
+            phase.stats = phase.run() or {}
+        except Exception as e:
+            phase.error = str(e)
+        phase.elapsed = time.perf_counter() - started_at - phase.started
+        phase.done.set()
+
+    with ThreadPoolExecutor(max_workers=len(phases)) as coordinators:
+        list(coordinators.map(run, phases))
+    return phases
+
+
+class Provisioner:
+    def __init__(self, client, workers=PROVISION_WORKERS):
+        self.client = client
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.profiles = None  # name -> profile, loaded on first use
+        self.checked_profiles = set()  # Names provisioned by an earlier batch, not counted again
+        self.assets = None  # name -> {id, name, type}, loaded on first use
+        self.devices = None  # name -> {id, name, type}, loaded on first use
+        self.new_assets = set()  # Created in the current batch
+        self.new_devices = set()
+        self.device_tokens = {}  # device name -> access token, current batch
+        self.batches = []  # Finished phases of every batch
+
+    def map(self, func, items):
+        """Run func over items on the shared worker pool, returning the results in order"""
+        return list(self.pool.map(func, items))
+
+    def close(self):
+        self.pool.shutdown()
+
+    @staticmethod
+    def summary(entity):
+        """The fields provisioning needs, so indexes of 100k entities stay small"""
+        return {"id": entity["id"], "name": entity["name"], "type": entity.get("type")}
+
+    def index_existing(self, iterate):
+        """One paged scan instead of a lookup per name"""
+        return {entity["name"]: self.summary(entity) for entity in iterate()}
+
+    # Phases
+
+    def provision_profiles(self, profiles):
+        """Every batch passes the same profiles; only the first batch that sees one counts it"""
+        if self.profiles is None:
+            self.profiles = self.index_existing(self.client.iter_device_profiles)
+        existing = self.profiles
+        profiles = [p for p in profiles if p["name"] not in self.checked_profiles]
+        missing = [p for p in profiles if p["name"] not in existing]
+        for profile in self.map(self.client.create_device_profile, missing):
+            if profile:
+                existing[profile["name"]] = self.summary(profile)
+        self.checked_profiles.update(p["name"] for p in profiles if p["name"] in existing)
+        failed = sum(1 for p in missing if p["name"] not in existing)
+        return {"created": len(missing) - failed, "existing": len(profiles) - len(missing), "failed": failed}
+
+    def provision_entities(self, specs, existing, create, created_names):
+        """Create the specs whose names are not in `existing` (updated in place)"""
+        missing = [spec for spec in specs if spec["data"]["name"] not in existing]
+        for spec, entity in zip(missing, self.map(lambda s: create(s["data"]), missing)):
+            if entity:
+                existing[entity["name"]] = self.summary(entity)
+                created_names.add(entity["name"])
+        failed = sum(1 for spec in missing if spec["data"]["name"] not in created_names)
+        return {"created": len(missing) - failed, "existing": len(specs) - len(missing), "failed": failed}
+
+    def provision_assets(self, asset_specs):
+        if self.assets is None:
+            self.assets = self.index_existing(lambda: self.client.iter_tenant_assets())
+        return self.provision_entities(asset_specs, self.assets, self.client.create_asset, self.new_assets)
+
+    def provision_devices(self, device_specs):
+        for spec in device_specs:
+            profile_name = spec["profile"]
+            if profile_name and profile_name in self.profiles:
+                spec["data"]["deviceProfileId"] = {
+                    "id": self.profiles[profile_name]["id"]["id"],
+                    "entityType": "DEVICE_PROFILE"
+                }
+        if self.devices is None:
+            self.devices = self.index_existing(lambda: self.client.iter_tenant_devices())
+        return self.provision_entities(device_specs, self.devices, self.client.create_device, self.new_devices)
+
+    def provision_attributes(self, entity_type, specs, entities, new_names):
+        """Save attributes on new entities, and on existing ones that lack any of the keys"""
+        def save(spec):
+            entity = entities.get(spec["data"]["name"])
+            attributes = spec["attributes"]
+            if entity is None or not attributes:
+                return "skipped"
+            entity_id = entity["id"]["id"]
+            if entity["name"] not in new_names:
+                stored = self.client.get_attributes(entity_type, entity_id, ATTRIBUTE_SCOPE) or []
+                if set(attributes) <= {attr["key"] for attr in stored}:
+                    return "existing"
+            saved = self.client.save_attributes(entity_type, entity_id, attributes, ATTRIBUTE_SCOPE)
+            return "saved" if saved else "failed"
+
+        results = self.map(save, specs)
+        return {status: results.count(status) for status in ("saved", "existing", "failed") if status in results}
+
+    def provision_relations(self, device_specs):
+        """Relate each device to its field unless the relation already exists"""
+        wanted = {}  # asset id -> device ids
+        for spec in device_specs:
+            asset = self.assets.get(spec["field"])
+            device = self.devices.get(spec["data"]["name"])
+            if asset and device:
+                wanted.setdefault(asset["id"]["id"], []).append(device["id"]["id"])
+
+        asset_ids = list(wanted)
+        existing = {
+            asset_id: {rel["to"]["id"] for rel in relations or []}
+            for asset_id, relations in zip(asset_ids, self.map(
+                lambda asset_id: self.client.get_relations_info(asset_id, "ASSET"), asset_ids))
+        }
+        missing = [(asset_id, device_id) for asset_id, device_ids in wanted.items()
+                   for device_id in device_ids if device_id not in existing[asset_id]]
+        created = self.map(
+            lambda pair: self.client.create_relation(pair[0], "ASSET", pair[1], "DEVICE", "Contains"), missing)
+        return {
+            "created": sum(created),
+            "existing": sum(len(device_ids) for device_ids in wanted.values()) - len(missing),
+            "failed": len(created) - sum(created)
+        }
+
+    def provision_credentials(self):
+        """Fetch access tokens for the devices created in this run"""
+        names = sorted(self.new_devices)
+        for name, credentials in zip(names, self.map(
+                lambda n: self.client.get_device_credentials(self.devices[n]["id"]["id"]), names)):
+            if credentials:
+                self.device_tokens[name] = credentials["credentialsId"]
+        return {"fetched": len(self.device_tokens), "failed": len(names) - len(self.device_tokens)}
+
+    def send_device_telemetry(self, make_telemetry):
+        """Initial telemetry for new devices only, so reruns leave history untouched"""
+        def send(item):
+            name, token = item
+            telemetry = make_telemetry(self.devices[name]["type"])
+            if telemetry is None:
+                return "skipped"
+            if self.client.send_telemetry(token, telemetry):
+                print(f"✓ Sent telemetry to {name}: {telemetry}")
+                return "sent"
+            print(f"✗ Failed to send telemetry to {name}")
+            return "failed"
+
+        results = self.map(send, list(self.device_tokens.items()))
+        return {status: results.count(status) for status in ("sent", "failed") if status in results}
+
+    def send_asset_telemetry(self, make_telemetry):
+        def send(name):
+            telemetry = make_telemetry()
+            if self.client.send_asset_telemetry(self.assets[name]["id"]["id"], telemetry):
+                print(f"✓ Sent telemetry to {name}: avgMoisture={telemetry['avgMoisture']}")
+                return "sent"
+            print(f"✗ Failed to send asset telemetry to {name}")
+            return "failed"
+
+        results = self.map(send, sorted(self.new_assets))
+        return {status: results.count(status) for status in ("sent", "failed") if status in results}
+
+    def run(self, profiles, asset_specs, device_specs, device_telemetry, asset_telemetry):
+        """Provision one batch, returning its finished phases.
+
+        asset_specs and device_specs are lists of {"data", "attributes"} dicts;
+        device specs also carry "profile" (device profile name) and "field"
+        (asset name to relate the device to, from this or an earlier batch).
+        """
+        self.new_assets = set()
+        self.new_devices = set()
+        self.device_tokens = {}
+        phases = [
+            Phase("profiles", lambda: self.provision_profiles(profiles)),
+            Phase("assets", lambda: self.provision_assets(asset_specs)),
+            Phase("devices", lambda: self.provision_devices(device_specs), ("profiles",)),
+            Phase("asset attributes",
+                  lambda: self.provision_attributes("ASSET", asset_specs, self.assets, self.new_assets), ("assets",)),
+            Phase("device attributes",
+                  lambda: self.provision_attributes("DEVICE", device_specs, self.devices, self.new_devices),
+                  ("devices",)),
+            Phase("relations", lambda: self.provision_relations(device_specs), ("assets", "devices")),
+            Phase("credentials", self.provision_credentials, ("devices",)),
+            Phase("device telemetry", lambda: self.send_device_telemetry(device_telemetry), ("credentials",)),
+            Phase("asset telemetry", lambda: self.send_asset_telemetry(asset_telemetry), ("assets",)),
+        ]
+        self.batches.append(run_phases(phases, time.perf_counter()))
+        return self.batches[-1]
+
+    def errors(self):
+        """Names of phases that failed in any batch"""
+        return sorted({phase.name for phases in self.batches for phase in phases if phase.error})
+
+
+def print_phase_report(batches, elapsed):
+    """Per-phase time and results, summed over batches"""
+    print("\n" + "="*60)
+    print(f"Provisioning finished in {elapsed:.1f}s ({len(batches)} batch{'es' if len(batches) != 1 else ''})")
+    print("="*60)
+    print(f"{'phase':<20} {'time':>8}  result")
+    names = [phase.name for phase in batches[0]] if batches else []
+    for position, name in enumerate(names):
+        runs = [phases[position] for phases in batches]
+        errors = [phase.error for phase in runs if phase.error]
+        totals = {}
+        for phase in runs:
+            for status, count in phase.stats.items():
+                totals[status] = totals.get(status, 0) + count
+        result = ", ".join(f"{count} {status}" for status, count in totals.items() if count) or "nothing to do"
+        if errors:
+            result += f" ✗ {len(errors)} batch(es) failed: {errors[0]}"
+        print(f"{name:<20} {sum(phase.elapsed or 0 for phase in runs):>7.1f}s  {result}")
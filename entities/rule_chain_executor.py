@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Offline Rule Chain Executor
+Routes simulated device messages through an exported rule chain
+(rule_chain/*.json: metaData.nodes and connections) without a ThingsBoard
+server. It reports how many messages reach each node, their rate at the
+simulated reporting interval and each node's fan-out. Chain changes can then
+be capacity-planned before they are deployed.
+
+Nodes are modelled by what decides their output relation: a message type
+switch or filter looks at the message type, an originator type filter at
+the originator, an alarm node at whether the alarm is already active, and
+a single-expression JS/TBEL filter ("return msg.battery < 20;") is
+evaluated. Other nodes (save, log, RPC, push to cloud) pass the message on
+as Success. Identical messages (same type, originator type and the values
+the chain's scripts read) are routed once per tick and counted with their
+multiplicity. A fleet of thousands of devices therefore costs a handful of
+walks per tick, not one per message.
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from operator import attrgetter
+
+from export_index import EXPORT_ROOT
+from farm_generator import METERS_PER_FIELD, MOISTURE_SENSOR, SENSORS_PER_FIELD, SMART_VALVE, VALVES_PER_FIELD, \
+    WATER_METER
+from telemetry_recorder import iter_recording
+
+DEVICES = 10000  # Simulated fleet size, in the farm generator's per-field mix
+TICKS = 60  # Reporting rounds to simulate
+INTERVAL_SECONDS = 10  # Seconds between reports, as in simulate_telemetry.py
+UNEVALUATED_FILTER = "True"  # Relation taken by filter scripts the executor cannot evaluate (an upper bound)
+
+# TbMsgTypeSwitchNode output relation per message type; other types go to "Other"
+MSG_TYPE_RELATIONS = {
+    "POST_TELEMETRY_REQUEST": "Post telemetry",
+    "POST_ATTRIBUTES_REQUEST": "Post attributes",
+    "TO_SERVER_RPC_REQUEST": "RPC Request from Device",
+    "RPC_CALL_FROM_SERVER_TO_DEVICE": "RPC Request to Device",
+    "ATTRIBUTES_UPDATED": "Attributes Updated",
+    "ATTRIBUTES_DELETED": "Attributes Deleted",
+    "ACTIVITY_EVENT": "Activity Event",
+    "INACTIVITY_EVENT": "Inactivity Event",
+    "CONNECT_EVENT": "Connect Event",
+    "DISCONNECT_EVENT": "Disconnect Event",
+    "ENTITY_CREATED": "Entity Created",
+    "ENTITY_UPDATED": "Entity Updated",
+    "ENTITY_DELETED": "Entity Deleted",
+    "ALARM": "Alarm",
+    "TIMESERIES_UPDATED": "Timeseries Updated",
+}
+SCRIPT_FILTERS = ("TbJsFilterNode",)
+SCRIPT_KEYS = {"JS": "jsScript", "TBEL": "tbelScript"}  # Configuration key of the script, by scriptLang
+# What a filter script may do once translated to Python: compare, combine and do arithmetic on msg/metadata fields
+SCRIPT_NODES = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.Compare, ast.Eq,
+                ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod,
+                ast.Constant, ast.Subscript, ast.Name, ast.Load)
+SCRIPT_REWRITES = [
+    (re.compile(r"\b(msg|metadata)\.(\w+)"), r"\1['\2']"),
+    (re.compile(r"==="), "=="),
+    (re.compile(r"!=="), "!="),
+    (re.compile(r"&&"), " and "),
+    (re.compile(r"\|\|"), " or "),
+    (re.compile(r"!(?!=)"), " not "),
+    (re.compile(r"\b(undefined|null)\b"), "None"),
+    (re.compile(r"\btrue\b"), "True"),
+    (re.compile(r"\bfalse\b"), "False"),
+]
+
+
+class Fields(dict):
+    """msg/metadata as a filter script sees them: a missing field is undefined, not an error"""
+
+    def __missing__(self, key):
+        return None
+
+
+def compile_filter(script):
+    """(code, msg fields, metadata fields) for a "return <expression>;" script, or None if it is anything else"""
+    match = re.fullmatch(r"\s*return\s+(.+?);?\s*", script or "", re.DOTALL)
+    if match is None or ";" in match.group(1):
+        return None
+    expression = match.group(1)
+    for pattern, replacement in SCRIPT_REWRITES:
+        expression = pattern.sub(replacement, expression)
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        return None
+    fields = {"msg": set(), "metadata": set()}
+    for node in ast.walk(tree):
+        if not isinstance(node, SCRIPT_NODES):
+            return None
+        if isinstance(node, ast.Name) and node.id not in fields:
+            return None
+        if isinstance(node, ast.Subscript):
+            if not (isinstance(node.value, ast.Name) and isinstance(node.slice, ast.Constant)):
+                return None
+            fields[node.value.id].add(node.slice.value)
+    return compile(tree, "<filter>", "eval"), sorted(fields["msg"]), sorted(fields["metadata"])
+
+
+class Message:
+    __slots__ = ("type", "originator_type", "originator", "data", "metadata")
+
+    def __init__(self, msg_type, originator_type, originator, data, metadata):
+        self.type = msg_type
+        self.originator_type = originator_type
+        self.originator = originator
+        self.data = data
+        self.metadata = metadata
+
+
+class RuleNode:
+    def __init__(self, chain, index, node):
+        self.chain = chain
+        self.index = index
+        self.name = node.get("name") or f"node {index}"
+        self.kind = (node.get("type") or "").rsplit(".", 1)[-1]
+        self.configuration = node.get("configuration") or {}
+        self.targets = defaultdict(list)  # relation -> global indices of the nodes it leads to
+        if self.kind in SCRIPT_FILTERS:
+            script_key = SCRIPT_KEYS.get(self.configuration.get("scriptLang") or "JS")
+            self.filter = compile_filter(self.configuration.get(script_key)) if script_key else None
+        else:
+            self.filter = None
+        self.evaluated = self.kind not in SCRIPT_FILTERS or self.filter is not None
+        self.by_originator = self.kind in ("TbCreateAlarmNode", "TbClearAlarmNode")
+
+    def relations(self, message, weight, alarms):
+        """[(relation, messages)] for `weight` identical messages"""
+        kind = self.kind
+        if kind == "TbMsgTypeSwitchNode":
+            relation = MSG_TYPE_RELATIONS.get(message.type)
+            if relation is None:
+                relation = message.type if message.type in self.targets else "Other"  # Custom types route by name
+            return [(relation, weight)]
+        if kind == "TbMsgTypeFilterNode":
+            return [(str(message.type in self.configuration.get("messageTypes", [])), weight)]
+        if kind == "TbOriginatorTypeFilterNode":
+            return [(str(message.originator_type in self.configuration.get("originatorTypes", [])), weight)]
+        if kind in SCRIPT_FILTERS:
+            if self.filter is None:
+                return [(UNEVALUATED_FILTER, weight)]
+            try:
+                result = eval(self.filter[0], {"__builtins__": {}},
+                              {"msg": Fields(message.data), "metadata": Fields(message.metadata)})
+            except (TypeError, ZeroDivisionError):  # undefined < 20 is false in JS, not an error
+                result = False
+            return [(str(bool(result)), weight)]
+        if kind == "TbCreateAlarmNode":
+            key = (message.originator, self.configuration.get("alarmType"))
+            if key in alarms:
+                return [("Updated", weight)]
+            alarms.add(key)
+            return [("Created", 1), ("Updated", weight - 1)]
+        if kind == "TbClearAlarmNode":
+            key = (message.originator, self.configuration.get("alarmType"))
+            if key not in alarms:
+                return [("False", weight)]
+            alarms.discard(key)
+            return [("Cleared", 1), ("False", weight - 1)]
+        return [("Success", weight)]
+
+
+class RuleChainModel:
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        entity = document.get("entity") or {}
+        # Hand-written chains keep nodes under entity.configuration instead of metaData
+        metadata = document.get("metaData") or entity.get("configuration") or {}
+        self.path = path
+        self.id = (entity.get("id") or {}).get("id")
+        self.name = entity.get("name") or os.path.basename(path)
+        self.chain_type = entity.get("type", "CORE")
+        self.root = bool(entity.get("root"))
+        self.nodes = metadata.get("nodes") or []
+        self.connections = metadata.get("connections") or []
+        self.first = metadata.get("firstNodeIndex")
+        if self.first is None and self.nodes:
+            targets = {connection["toIndex"] for connection in self.connections}
+            self.first = next((i for i in range(len(self.nodes)) if i not in targets), 0)
+
+
+def load_chains(root):
+    """RuleChainModel of every exported rule chain with nodes, by chain id (or path)"""
+    directory = os.path.join(root, "rule_chain")
+    chains = {}
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if name.endswith(".json"):
+            chain = RuleChainModel(os.path.join(directory, name))
+            if chain.nodes:
+                chains[chain.id or chain.path] = chain
+    return chains
+
+
+def describe(chain):
+    return f"{chain.name} ({chain.id or 'no id'}, {os.path.relpath(chain.path)})"
+
+
+def pick_chain(chains, wanted=None):
+    """The chain named, or whose id or path is, `wanted`; by default the root CORE chain"""
+    if wanted is None:
+        matches = [chain for chain in chains.values() if chain.root and chain.chain_type == "CORE"]
+    else:
+        matches = [chain for chain in chains.values()
+                   if wanted in (chain.name, chain.id, chain.path, os.path.basename(chain.path))]
+    if len(matches) > 1:
+        candidates = ", ".join(describe(chain) for chain in matches)
+        if wanted is not None:
+            raise Exception(f"{len(matches)} rule chains match {wanted!r}, pass an id or file instead: {candidates}")
+        print(f"⚠ {len(matches)} rule chains are marked as root: {candidates}")
+        print(f"⚠ Using {describe(matches[0])}; pass --chain <id> to pick another")
+    if matches:
+        return matches[0]
+    if wanted is not None and os.path.exists(wanted):
+        return RuleChainModel(wanted)
+    raise Exception(f"No rule chain {wanted or 'marked as root'} with nodes")
+
+
+class ChainExecutor:
+    def __init__(self, entry, chains=None):
+        """Route messages into `entry`; rule chain input nodes follow into the other `chains`"""
+        self.nodes = []
+        self.starts = {}  # chain key -> global index of its first node
+        self.missing_chains = set()
+        self.entry = self.add_chain(entry, chains or {})
+        self.visits = [0] * len(self.nodes)
+        self.outputs = [Counter() for _ in self.nodes]  # relation -> messages
+        self.alarms = set()  # (originator, alarm type) currently active
+        # Messages are grouped by what the nodes look at, so each group is routed once
+        self.msg_fields = sorted({field for node in self.nodes if node.filter for field in node.filter[1]})
+        self.metadata_fields = sorted({field for node in self.nodes if node.filter for field in node.filter[2]})
+        self.by_originator = any(node.by_originator for node in self.nodes)
+        if not (self.msg_fields or self.metadata_fields or self.by_originator):
+            self.signature = attrgetter("type", "originator_type")  # Nothing else matters: skip building tuples
+        self.messages = 0
+        self.walks = 0
+
+    def add_chain(self, chain, chains):
+        key = chain.id or chain.path
+        if key in self.starts:
+            return self.starts[key]
+        offset = len(self.nodes)
+        self.starts[key] = offset + chain.first
+        self.nodes.extend(RuleNode(chain, index, node) for index, node in enumerate(chain.nodes))
+        for connection in chain.connections:
+            source = self.nodes[offset + connection["fromIndex"]]
+            source.targets[connection["type"]].append(offset + connection["toIndex"])
+        for node in self.nodes[offset:]:
+            if node.kind == "TbRuleChainInputNode":
+                target_id = node.configuration.get("ruleChainId")
+                if target_id in chains:
+                    node.targets["Success"].append(self.add_chain(chains[target_id], chains))
+                else:
+                    self.missing_chains.add((node.name, target_id))
+        return self.starts[key]
+
+    def signature(self, message):
+        data, metadata = message.data, message.metadata
+        return (message.type, message.originator_type, message.originator if self.by_originator else None,
+                tuple(data.get(field) for field in self.msg_fields),
+                tuple(metadata.get(field) for field in self.metadata_fields))
+
+    def run(self, messages):
+        """Route one batch (a reporting tick) of messages"""
+        keys = list(map(self.signature, messages))
+        counts = Counter(keys)
+        for key, message in dict(zip(keys, messages)).items():  # One message stands for its whole group
+            self.walk(message, counts[key])
+        self.messages += len(keys)
+
+    def walk(self, message, weight):
+        self.walks += 1
+        stack = [(self.entry, weight)]
+        while stack:
+            index, weight = stack.pop()
+            node = self.nodes[index]
+            self.visits[index] += weight
+            for relation, count in node.relations(message, weight, self.alarms):
+                if count <= 0:
+                    continue
+                self.outputs[index][relation] += count
+                for target in node.targets.get(relation, ()):
+                    stack.append((target, count))
+
+
+def fleet_messages(devices, ticks, interval=INTERVAL_SECONDS, seed=None):
+    """Yield one list of telemetry messages per tick from the simulator's vectorized fleet model"""
+    from fleet_model import FleetState
+
+    field_size = SENSORS_PER_FIELD + METERS_PER_FIELD + VALVES_PER_FIELD
+    mix = [MOISTURE_SENSOR] * SENSORS_PER_FIELD + [WATER_METER] * METERS_PER_FIELD + [SMART_VALVE] * VALVES_PER_FIELD
+    names = [f"Device {i}" for i in range(devices)]
+    types = [mix[i % field_size] for i in range(devices)]
+    fleet = FleetState(names, types, seed=seed)
+    device_types = dict(zip(names, types))
+    for tick in range(ticks):
+        fleet.step()
+        ts = int(tick * interval * 1000)
+        yield [Message("POST_TELEMETRY_REQUEST", "DEVICE", name, payload,
+                       {"deviceName": name, "deviceType": device_types[name], "ts": ts})
+               for name, payload in fleet.iter_payloads()]
+
+
+def recorded_messages(path, interval=INTERVAL_SECONDS):
+    """Yield lists of telemetry messages from a telemetry_recorder recording, one list per interval"""
+    batch, batch_end = [], None
+    for record in iter_recording(path):
+        if batch_end is None:
+            batch_end = record["t"] + interval * 1000
+        if record["t"] >= batch_end:
+            yield batch
+            batch, batch_end = [], batch_end + interval * 1000
+        originator_type = record.get("e", "DEVICE")
+        metadata = {"ts": record["t"]}
+        if originator_type == "DEVICE":
+            metadata["deviceName"] = record["d"]
+        batch.append(Message("POST_TELEMETRY_REQUEST", originator_type, record["d"], record["v"], metadata))
+    if batch:
+        yield batch
+
+
+def print_report(executor, simulated_seconds, routing_seconds, total_seconds):
+    print("\n" + "=" * 92)
+    print(f"RULE CHAIN LOAD: {executor.messages:,} messages over {simulated_seconds:,.0f}s simulated")
+    print(f"Entry chain: {describe(executor.nodes[executor.entry].chain)}")
+    print("=" * 92)
+    print(f"  {'node':<34} {'type':<26} {'messages':>12} {'msg/s':>9} {'fan-out':>8}")
+    chain = None
+    for index, node in enumerate(executor.nodes):
+        if node.chain is not chain:
+            chain = node.chain
+            print(f"  [{describe(chain)}]")
+        visits = executor.visits[index]
+        forwarded = sum(count * len(node.targets.get(relation, ())) for relation, count in
+                        executor.outputs[index].items())
+        fan_out = f"{forwarded / visits:.2f}" if visits else "-"
+        marker = "" if node.evaluated else " ?"
+        print(f"  {node.name[:34]:<34} {node.kind[:26]:<26} {visits:>12,} {visits / simulated_seconds:>9,.1f} "
+              f"{fan_out:>8}{marker}")
+        for relation, count in sorted(executor.outputs[index].items()):
+            dropped = "" if node.targets.get(relation) else "  (no connection)"
+            print(f"      {relation:<30} {count:>12,}{dropped}")
+    print("-" * 92)
+    for node in executor.nodes:
+        if not node.evaluated:
+            print(f"⚠ {node.name}: script not evaluated, messages take \"{UNEVALUATED_FILTER}\" (marked ?)")
+    for name, chain_id in sorted(executor.missing_chains):
+        print(f"⚠ {name}: rule chain {chain_id} is not in the export, its messages stop here")
+    rate = executor.messages / routing_seconds * 60 if routing_seconds else float("inf")
+    print(f"✓ Routed {executor.messages:,} messages in {executor.walks:,} walks: {routing_seconds:.2f}s routing, "
+          f"{total_seconds:.2f}s with generation ({rate:,.0f} messages/min)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Route simulated telemetry through an exported rule chain")
+    parser.add_argument("--root", default=EXPORT_ROOT, help="export tree (default: repository root)")
+    parser.add_argument("--chain", help="rule chain name, id or file (default: the root CORE chain)")
+    parser.add_argument("--devices", type=int, default=DEVICES)
+    parser.add_argument("--ticks", type=int, default=TICKS)
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS, help="seconds between reports")
+    parser.add_argument("--recording", help="route a telemetry_recorder recording instead of a simulated fleet")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    chains = load_chains(args.root)
+    executor = ChainExecutor(pick_chain(chains, args.chain), chains)
+    batches = (recorded_messages(args.recording, args.interval) if args.recording
+               else fleet_messages(args.devices, args.ticks, args.interval, args.seed))
+    start = time.perf_counter()
+    routing = 0.0
+    ticks = 0
+    for batch in batches:
+        routed = time.perf_counter()
+        executor.run(batch)
+        routing += time.perf_counter() - routed
+        ticks += 1
+    print_report(executor, ticks * args.interval, routing, time.perf_counter() - start)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tick Scheduler
+Keeps the simulator on an absolute-deadline cadence (slot n is due at
+start + n * slot_seconds, so work time never accumulates as drift) and
+spreads devices across their period by a stable phase offset instead of
+sending the whole fleet in one burst. Each device type can have its own
+period. When the sender falls behind, the "skip" policy drops the missed
+slots and "catch-up" runs them back to back.
+"""
+
+import asyncio
+import time
+import zlib
+
+SKIP = "skip"
+CATCH_UP = "catch-up"
+POLICIES = (SKIP, CATCH_UP)
+INTERVAL_SECONDS = 10  # Default reporting period
+DEVICE_PERIODS = {"SI Smart Valve": 60}  # Per-type reporting periods overriding INTERVAL_SECONDS
+SLOT_SECONDS = 1.0  # Devices are spread across their period in slots this long
+
+
+class PhaseSchedule:
+    def __init__(self, devices, default_period, periods=None, slot_seconds=1.0):
+        """devices is an iterable of (device name, device type)"""
+        self.slot_seconds = slot_seconds
+        self.phases = {}  # period in slots -> [device names per phase]
+        for device_name, device_type in devices:
+            period = (periods or {}).get(device_type, default_period)
+            period_slots = max(1, round(period / slot_seconds)) if slot_seconds > 0 else 1
+            phases = self.phases.setdefault(period_slots, [[] for _ in range(period_slots)])
+            phases[zlib.crc32(device_name.encode("utf-8")) % period_slots].append(device_name)
+
+    def due(self, slot):
+        """Names of the devices due in a slot"""
+        names = []
+        for period_slots, phases in self.phases.items():
+            names.extend(phases[slot % period_slots])
+        return names
+
+    def busiest_slot(self):
+        """Most devices due in any one slot, for sizing the burst ThingsBoard sees"""
+        return max((sum(len(phases[slot % p]) for p, phases in self.phases.items())
+                    for slot in range(max(self.phases, default=1))), default=0)
+
+
+class DeadlineTicker:
+    def __init__(self, slot_seconds, policy=SKIP, clock=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overrun policy: {policy}")
+        self.slot_seconds = slot_seconds
+        self.policy = policy
+        self.clock = clock
+        self.start = None
+        self.next_slot = 0
+        self.skipped = 0  # Total slots dropped by the skip policy
+        self.late = 0  # Slots that started a full slot or more behind schedule
+
+    def due_in(self):
+        """Seconds until the next slot is due (zero or less when late)"""
+        now = self.clock()
+        if self.start is None:
+            self.start = now
+        return self.start + self.next_slot * self.slot_seconds - now
+
+    def advance(self):
+        """Claim the next slot, returning (slot, lag seconds, slots skipped)"""
+        lag = max(0.0, self.clock() - (self.start + self.next_slot * self.slot_seconds))
+        skipped = 0
+        if self.slot_seconds > 0 and lag >= self.slot_seconds:  # Zero-length slots run back to back
+            self.late += 1
+            if self.policy == SKIP:
+                skipped = int(lag // self.slot_seconds)
+                self.next_slot += skipped
+                self.skipped += skipped
+                lag -= skipped * self.slot_seconds
+        slot = self.next_slot
+        self.next_slot += 1
+        return slot, lag, skipped
+
+    def wait(self):
+        """Sleep until the next slot is due, then claim it"""
+        delay = self.due_in()
+        if delay > 0:
+            time.sleep(delay)
+        return self.advance()
+
+    async def wait_async(self):
+        delay = self.due_in()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.advance()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Sharded Telemetry Simulator
+Splits the fleet across worker processes, each running its own
+AsyncSimulationEngine with its own login and connection pool. Devices are
+assigned by a stable hash of their field (or their own name when they have
+no field), so field averages stay inside one shard. A coordinator prints
+one live summary line and restarts shards that die.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import sys
+import time
+import zlib
+
+from async_engine import DEFAULT_CONCURRENCY, DEFAULT_INTERVAL, AsyncSimulationEngine
+from scheduler import DEVICE_PERIODS, SLOT_SECONDS
+
+MAX_RESTARTS = 5  # Per shard, before the coordinator gives up on it
+
+
+def shard_of(key, shards):
+    """Stable shard index for a device or field name"""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def run_shard(shard_id, url, username, password, partition, concurrency, interval, slot_seconds, periods, ticks,
+              fleet_model, seed, stats_queue):
+    """Worker process entry point"""
+    from simulate_telemetry import TelemetrySimulator
+
+    simulator = TelemetrySimulator(url, username, password)
+    simulator.device_tokens = partition["devices"]
+    simulator.moisture_trends = partition["moisture_trends"]
+    simulator.asset_ids = partition["assets"]
+    simulator.device_names_by_id = {info['id']: name for name, info in simulator.device_tokens.items()}
+    simulator.token_owners = {info['token']: name for name, info in simulator.device_tokens.items()}
+    simulator.field_devices = partition["field_devices"]
+    simulator.device_fields = partition["device_fields"]
+    simulator.topology_loaded_at = time.monotonic()
+    if fleet_model == "numpy":
+        simulator.use_vectorized_fleet(seed=None if seed is None else seed + shard_id)
+
+    def report(stats):
+        stats_queue.put((shard_id, stats))
+
+    engine = AsyncSimulationEngine(simulator, concurrency=concurrency, interval=interval, slot_seconds=slot_seconds,
+                                   periods=periods, tick_callback=report, verbose=False)
+    try:
+        asyncio.run(engine.run_async(ticks))
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardCoordinator:
+    def __init__(self, simulator, username, password, shards, concurrency=DEFAULT_CONCURRENCY,
+                 interval=DEFAULT_INTERVAL, ticks=None, fleet_model="dict", seed=None, max_restarts=MAX_RESTARTS,
+                 slot_seconds=SLOT_SECONDS, periods=DEVICE_PERIODS):
+        self.simulator = simulator
+        self.username = username
+        self.password = password
+        self.shards = shards
+        self.concurrency = concurrency
+        self.interval = interval
+        self.slot_seconds = slot_seconds
+        self.periods = periods
+        self.ticks = ticks
+        self.fleet_model = fleet_model
+        self.seed = seed
+        self.max_restarts = max_restarts
+        self.context = multiprocessing.get_context("spawn")
+        self.stats_queue = self.context.Queue()
+        self.processes = [None] * shards
+        self.restarts = [0] * shards
+        self.latest = [None] * shards  # Last tick stats per shard
+        self.totals = [{"sent": 0, "failed": 0, "ticks": 0} for _ in range(shards)]
+        self.partitions = self.partition()
+
+    def partition(self):
+        """Split devices and fields into per-shard state"""
+        sim = self.simulator
+        partitions = [
+            {"devices": {}, "moisture_trends": {}, "assets": {}, "field_devices": {}, "device_fields": {}}
+            for _ in range(self.shards)
+        ]
+        for device_name, device_info in sim.device_tokens.items():
+            field_name = sim.device_fields.get(device_name)
+            part = partitions[shard_of(field_name or device_name, self.shards)]
+            part["devices"][device_name] = device_info
+            if device_name in sim.moisture_trends:
+                part["moisture_trends"][device_name] = sim.moisture_trends[device_name]
+            if field_name:
+                part["device_fields"][device_name] = field_name
+        for asset_name, asset_id in sim.asset_ids.items():
+            part = partitions[shard_of(asset_name, self.shards)]
+            part["assets"][asset_name] = asset_id
+            part["field_devices"][asset_id] = sim.field_devices.get(asset_id, [])
+        return partitions
+
+    def start_shard(self, shard_id):
+        process = self.context.Process(
+            target=run_shard,
+            args=(shard_id, self.simulator.url, self.username, self.password, self.partitions[shard_id],
+                  self.concurrency, self.interval, self.slot_seconds, self.periods, self.ticks, self.fleet_model, self.seed, self.stats_queue),
+            name=f"shard-{shard_id}",
+            daemon=True
+        )
+        process.start()
+        self.processes[shard_id] = process
+
+    def restart_shard(self, shard_id):
+        """Restart one shard, leaving the others running"""
+        process = self.processes[shard_id]
+        if process and process.is_alive():
+            process.terminate()
+            process.join()
+        self.restarts[shard_id] += 1
+        self.latest[shard_id] = None
+        self.start_shard(shard_id)
+
+    def drain_stats(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                shard_id, stats = self.stats_queue.get(timeout=remaining)
+            except queue.Empty:
+                return
+            self.latest[shard_id] = stats
+            totals = self.totals[shard_id]
+            totals["sent"] += stats["sent"]
+            totals["failed"] += stats["failed"]
+            totals["ticks"] += 1
+
+    def supervise(self):
+        """Restart crashed shards; return how many are still running"""
+        running = 0
+        for shard_id, process in enumerate(self.processes):
+            if process.is_alive():
+                running += 1
+            elif process.exitcode not in (0, None) and self.restarts[shard_id] < self.max_restarts:
+                print(f"\n⚠ Shard {shard_id} exited with code {process.exitcode}, restarting")
+                self.restart_shard(shard_id)
+                running += 1
+        return running
+
+    def summary_line(self, running):
+        latest = [s for s in self.latest if s]
+        rate = sum(s["requests_per_second"] for s in latest)
+        errors = sum(t["failed"] for t in self.totals)
+        sent = sum(t["sent"] for t in self.totals)
+        tick = max((s["elapsed"] for s in latest), default=0.0)
+        overrun = max((s["overrun"] for s in latest), default=0.0)
+        return (f"shards {running}/{self.shards} | {rate:,.0f} req/s | sent {sent:,} | errors {errors:,} "
+                f"| slowest tick {tick:.2f}s | overrun {overrun:.2f}s | restarts {sum(self.restarts)}")
+
+    def run(self):
+        print("\n" + "="*60)
+        print(f"Starting Sharded Simulation: {self.shards} shards")
+        print("="*60)
+        for shard_id, part in enumerate(self.partitions):
+            print(f"  shard {shard_id}: {len(part['devices'])} devices, {len(part['assets'])} fields")
+        print("Press Ctrl+C to stop\n")
+
+        for shard_id in range(self.shards):
+            self.start_shard(shard_id)
+        try:
+            while True:
+                self.drain_stats(1.0)
+                running = self.supervise()
+                sys.stdout.write("\r" + self.summary_line(running) + "   ")
+                sys.stdout.flush()
+                if running == 0:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in self.processes:
+                if process and process.is_alive():
+                    process.terminate()
+                    process.join()
+            self.drain_stats(0.1)
+
+        print("\n\n" + "="*60)
+        for shard_id, totals in enumerate(self.totals):
+            print(f"  shard {shard_id}: {totals['sent']:,} sent, {totals['failed']:,} failed "
+                  f"in {totals['ticks']} ticks, {self.restarts[shard_id]} restarts")
+        print("="*60 + "\n")
+        return self.totals
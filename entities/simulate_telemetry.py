@@ -4,121 +4,214 @@ ThingsBoard Smart Irrigation Telemetry Simulator
 Continuously sends telemetry data to simulate a real irrigation system
 """
 
-import requests
+import argparse
 import json
 import time
 import random
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from backfill import BACKFILL_WORKERS, run_backfill
+from credential_cache import CredentialCache
+from metrics import METRICS_HOST, METRICS_PORT, TICK_DURATION, TICK_LAG, observe_request, start_metrics_server
+from scheduler import DEVICE_PERIODS, INTERVAL_SECONDS, POLICIES, SLOT_SECONDS, DeadlineTicker, PhaseSchedule
+from tb_client import ThingsBoardClient
+from telemetry_recorder import TelemetryRecorder, replay
 
 # Configuration
 TB_URL = "http://localhost:8080"  # Change to your ThingsBoard URL
 USERNAME = "tenant@thingsboard.org"  # Change to your username
 PASSWORD = "tenant"  # Change to your password
-INTERVAL_SECONDS = 10  # Send telemetry every 10 seconds
+POOL_SIZE = 20  # Keep-alive connections kept open to ThingsBoard
+ENGINE = "sync"  # "sync" or "async" (concurrent posts via aiohttp)
+CONCURRENCY = 200  # Max in-flight requests for the async engine
+TRANSPORT = "http"  # "http" (one POST per device) or "gateway" (batched MQTT gateway API)
+GATEWAY_PROFILE = "Gateway"  # Device profile/type of the gateway device to publish as
+MQTT_PORT = 1883
+GATEWAY_BATCH_SIZE = 100  # Devices per gateway message; 0 sends one message per field
+TOPOLOGY_TTL_SECONDS = 300  # How long the field -> sensor relations are cached
+VERIFY_FIELD_TELEMETRY = False  # Read sensor values back from the server for avgMoisture
+CREDENTIAL_CACHE_FILE = ".credential_cache.json"  # Device id -> access token, reused on restart
+CREDENTIAL_WORKERS = 16  # Concurrent credential lookups on a cold start
+SI_DEVICE_TYPES = ["SI Soil Moisture Sensor", "SI Water Meter", "SI Smart Valve"]
+OVERRUN_POLICY = "skip"  # "skip" drops slots missed while behind, "catch-up" runs them back to back
+FLEET_MODEL = "dict"  # "dict" (per-device state) or "numpy" (vectorized, for 100k+ devices)
+
+
+class GatewayTransport:
+    """Publishes telemetry for many devices per message via the ThingsBoard gateway API"""
+
+    TOPIC = "v1/gateway/telemetry"
+
+    def __init__(self, host, access_token, port=MQTT_PORT, batch_size=GATEWAY_BATCH_SIZE, qos=1, latency=None,
+                 on_sent=None):
+        import paho.mqtt.client as mqtt
+
+        self.batch_size = batch_size
+        self.qos = qos
+        self.latency = latency  # Optional LatencyHistogram fed with publish -> acknowledgement times
+        self.on_sent = on_sent  # Optional callback(device name, telemetry, "DEVICE", ts) per acknowledged update
+        self.publish_started = []  # (mid, perf_counter, bytes) for this tick's publishes
+        self.acked_at = {}  # mid -> perf_counter when acknowledged
+        self.published = {}  # mid -> batch, kept for on_sent until acknowledged
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.on_publish = self.on_publish
+        self.client.username_pw_set(access_token)
+        self.client.max_inflight_messages_set(100)
+        self.client.connect(host, port)
+        self.client.loop_start()
+
+    def publish(self, batch):
+        """Publish one gateway message ({device name: [{ts, values}]})"""
+        payload = json.dumps(batch)
+        started = time.perf_counter()
+        info = self.client.publish(self.TOPIC, payload, qos=self.qos)
+        self.publish_started.append((info.mid, started, len(payload)))
+        if self.on_sent:
+            self.published[info.mid] = batch
+        return info
+
+    def on_publish(self, client, userdata, mid, reason_code, properties):
+        # Runs on paho's network thread while it holds its own locks, so only a dict store here
+        self.acked_at[mid] = time.perf_counter()
+
+    def record_latencies(self):
+        """Match this tick's publishes to their acknowledgements"""
+        for mid, started, nbytes in self.publish_started:
+            acked = self.acked_at.pop(mid, None)
+            if acked is None:
+                observe_request("PUBLISH", self.TOPIC, "error", nbytes, 0.0)
+                continue
+            observe_request("PUBLISH", self.TOPIC, "ok", nbytes, acked - started)
+            if self.latency is not None:
+                self.latency.record(acked - started)
+        self.publish_started = []
+
+    def send_tick(self, items):
+        """Pack (device name, field name, telemetry) items into gateway messages.
+
+        Returns (device updates, messages published).
+        """
+        ts = int(time.time() * 1000)
+        pending = []
+        updates = 0
+        batch = {}
+        field_batches = {}
+
+        for device_name, field_name, telemetry in items:
+            updates += 1
+            record = [{"ts": ts, "values": telemetry}]
+            if self.batch_size:
+                batch[device_name] = record
+                if len(batch) >= self.batch_size:
+                    pending.append(self.publish(batch))
+                    batch = {}
+            else:
+                field_batches.setdefault(field_name, {})[device_name] = record
+
+        if batch:
+            pending.append(self.publish(batch))
+        for field_batch in field_batches.values():
+            pending.append(self.publish(field_batch))
+
+        for info in pending:
+            info.wait_for_publish()
+        if self.on_sent:
+            self.report_sent()
+        self.record_latencies()
+        return updates, len(pending)
+
+    def report_sent(self):
+        """Pass each update of this tick's acknowledged messages to on_sent"""
+        for mid, _, _ in self.publish_started:
+            if mid in self.acked_at:
+                for device_name, records in self.published.pop(mid).items():
+                    for record in records:
+                        self.on_sent(device_name, record["values"], "DEVICE", record["ts"])
+        self.published = {}
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
 
 class TelemetrySimulator:
-    def __init__(self, url, username, password):
+    def __init__(self, url, username, password, pool_size=POOL_SIZE):
         self.url = url
-        self.token = None
-        self.login(username, password)
+        self.client = ThingsBoardClient(url, username, password, pool_size=pool_size)
         self.device_tokens = {}
         self.asset_ids = {}
         self.moisture_trends = {}  # Track moisture trends for realistic data
-
-    def login(self, username, password):
-        """Login to ThingsBoard and get JWT token"""
-        response = requests.post(
-            f"{self.url}/api/auth/login",
-            json={"username": username, "password": password}
-        )
-        if response.status_code == 200:
-            self.token = response.json()["token"]
-            print("✓ Successfully logged in to ThingsBoard")
-        else:
-            raise Exception(f"Login failed: {response.text}")
-
-    def get_headers(self):
-        """Get authorization headers"""
-        return {
-            "Content-Type": "application/json",
-            "X-Authorization": f"Bearer {self.token}"
-        }
-
-    def get_all_devices(self):
-        """Get all devices"""
-        response = requests.get(
-            f"{self.url}/api/tenant/devices",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0}
-        )
-        if response.status_code == 200:
-            return response.json()["data"]
-        return []
+        self.device_fields = {}  # Device name -> field (asset) name
+        self.device_names_by_id = {}  # Device id -> device name
+        self.field_devices = {}  # Asset id -> names of the devices it contains
+        self.topology_loaded_at = None
+        self.verify_field_telemetry = VERIFY_FIELD_TELEMETRY
+        self.gateway = None  # GatewayTransport when publishing through the gateway API
+        self.fleet = None  # FleetState when using the vectorized fleet model
+        self.recorder = None  # TelemetryRecorder capturing everything sent
+        self.credential_cache = None  # CredentialCache shared across runs
+        self.token_owners = {}  # Access token -> device name
+        self.token_lock = threading.Lock()
+
+    def get_all_devices(self, device_type=None):
+        """Iterate all devices (every page), optionally of one type"""
+        return self.client.iter_tenant_devices(device_type=device_type)
 
     def get_all_assets(self):
-        """Get all assets"""
-        response = requests.get(
-            f"{self.url}/api/tenant/assets",
-            headers=self.get_headers(),
-            params={"pageSize": 1000, "page": 0, "type": "SI Field"}
-        )
-        if response.status_code == 200:
-            return response.json()["data"]
-        return []
+        """Iterate all SI Field assets (every page)"""
+        return self.client.iter_tenant_assets(asset_type="SI Field")
 
     def get_device_credentials(self, device_id):
         """Get device credentials (access token)"""
-        response = requests.get(
-            f"{self.url}/api/device/{device_id}/credentials",
-            headers=self.get_headers()
-        )
-        if response.status_code == 200:
-            return response.json()["credentialsId"]
-        return None
+        credentials = self.client.get_device_credentials(device_id)
+        return credentials["credentialsId"] if credentials else None
 
     def send_telemetry(self, access_token, telemetry_data):
         """Send telemetry data using device access token"""
-        response = requests.post(
-            f"{self.url}/api/v1/{access_token}/telemetry",
-            json=telemetry_data
-        )
-        return response.status_code == 200
+        status = self.client.post_device_telemetry(access_token, telemetry_data)
+        if status == 401:
+            self.refresh_device_token(access_token)
+        return status == 200
+
+    def refresh_device_token(self, access_token):
+        """Drop a rejected token and fetch the device's current credentials"""
+        with self.token_lock:
+            device_name = self.token_owners.pop(access_token, None)
+            if device_name is None:
+                return None
+            device_info = self.device_tokens[device_name]
+            if self.credential_cache:
+                self.credential_cache.invalidate(device_info['id'])
+
+            token = self.get_device_credentials(device_info['id'])
+            if token:
+                device_info['token'] = token
+                self.token_owners[token] = device_name
+                if self.credential_cache:
+                    self.credential_cache.set(device_info['id'], token)
+                    self.credential_cache.save()
+                print(f"⚠ Credentials for {device_name} changed, token refreshed")
+            return token
 
     def send_asset_telemetry(self, asset_id, telemetry_data):
         """Send telemetry data to asset"""
-        response = requests.post(
-            f"{self.url}/api/plugins/telemetry/ASSET/{asset_id}/timeseries/ANY",
-            headers=self.get_headers(),
-            json=telemetry_data
-        )
-        return response.status_code == 200
+        return self.client.send_asset_telemetry(asset_id, telemetry_data)
 
     def get_asset_devices(self, asset_id):
         """Get all devices related to an asset"""
-        response = requests.get(
-            f"{self.url}/api/relations/info",
-            headers=self.get_headers(),
-            params={
-                "fromId": asset_id,
-                "fromType": "ASSET"
-            }
-        )
-        if response.status_code == 200:
-            relations = response.json()
+        relations = self.client.get_relations_info(asset_id, "ASSET")
+        if relations is not None:
             device_ids = [rel["to"]["id"] for rel in relations if rel["to"]["entityType"] == "DEVICE"]
             return device_ids
         return []
 
     def get_device_telemetry(self, device_id, keys):
         """Get latest telemetry from device"""
-        keys_param = ",".join(keys)
-        response = requests.get(
-            f"{self.url}/api/plugins/telemetry/DEVICE/{device_id}/values/timeseries",
-            headers=self.get_headers(),
-            params={"keys": keys_param}
-        )
-        if response.status_code == 200:
-            data = response.json()
+        data = self.client.get_latest_timeseries("DEVICE", device_id, keys)
+        if data is not None:
             result = {}
             for key, values in data.items():
                 if values and len(values) > 0:
@@ -126,24 +219,48 @@ class TelemetrySimulator:
             return result
         return {}
 
-    def initialize_devices(self):
+    def initialize_devices(self, workers=CREDENTIAL_WORKERS):
         """Get all devices and their access tokens"""
-        devices = self.get_all_devices()
-        for device in devices:
-            if device['type'].startswith('SI '):
-                device_id = device['id']['id']
-                token = self.get_device_credentials(device_id)
-                if token:
-                    self.device_tokens[device['name']] = {
-                        'token': token,
-                        'type': device['type'],
-                        'id': device_id
-                    }
-                    # Initialize moisture trends
-                    if device['type'] == 'SI Soil Moisture Sensor':
-                        self.moisture_trends[device['name']] = random.randint(50, 70)
-
-        print(f"✓ Initialized {len(self.device_tokens)} devices")
+        start = time.perf_counter()
+        cache = self.credential_cache
+
+        # Cached tokens first; everything else is looked up concurrently
+        devices = []
+        for device_type in SI_DEVICE_TYPES:
+            for device in self.get_all_devices(device_type):
+                token = cache.get(device['id']['id']) if cache else None
+                devices.append((device, token))
+
+        missing = [device for device, token in devices if token is None]
+        fetched = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                tokens = pool.map(lambda d: self.get_device_credentials(d['id']['id']), missing)
+                for device, token in zip(missing, tokens):
+                    fetched[device['id']['id']] = token
+                    if token and cache:
+                        cache.set(device['id']['id'], token)
+            if cache:
+                cache.save()
+
+        for device, token in devices:
+            device_id = device['id']['id']
+            token = token or fetched.get(device_id)
+            if token:
+                self.device_tokens[device['name']] = {
+                    'token': token,
+                    'type': device['type'],
+                    'id': device_id
+                }
+                self.device_names_by_id[device_id] = device['name']
+                self.token_owners[token] = device['name']
+                # Initialize moisture trends
+                if device['type'] == 'SI Soil Moisture Sensor':
+                    self.moisture_trends[device['name']] = random.randint(50, 70)
+
+        elapsed = time.perf_counter() - start
+        print(f"✓ Initialized {len(self.device_tokens)} devices in {elapsed:.2f}s "
+              f"({len(devices) - len(missing)} cached, {len(missing)} fetched)")
 
     def initialize_assets(self):
         """Get all assets"""
@@ -152,6 +269,82 @@ class TelemetrySimulator:
             self.asset_ids[asset['name']] = asset['id']['id']
         print(f"✓ Initialized {len(self.asset_ids)} assets")
 
+    def refresh_topology(self, force=False):
+        """Load field -> device relations once, then again after TOPOLOGY_TTL_SECONDS"""
+        if self.topology_loaded_at is not None and not force:
+            if time.monotonic() - self.topology_loaded_at < TOPOLOGY_TTL_SECONDS:
+                return
+
+        field_devices = {}
+        device_fields = {}
+        for asset_name, asset_id in self.asset_ids.items():
+            names = []
+            for device_id in self.get_asset_devices(asset_id):
+                device_name = self.device_names_by_id.get(device_id)
+                if device_name:
+                    names.append(device_name)
+                    device_fields[device_name] = asset_name
+            field_devices[asset_id] = names
+
+        self.field_devices = field_devices
+        self.device_fields = device_fields
+        self.topology_loaded_at = time.monotonic()
+
+    def initialize_gateway(self, port=MQTT_PORT, batch_size=GATEWAY_BATCH_SIZE):
+        """Find the gateway device and connect to its MQTT gateway API"""
+        for device in self.get_all_devices(GATEWAY_PROFILE):
+            token = self.get_device_credentials(device['id']['id'])
+            if token:
+                host = urlsplit(self.url).hostname
+                self.gateway = GatewayTransport(host, token, port=port, batch_size=batch_size,
+                                                on_sent=self.record_sent)
+                if batch_size == 0:
+                    self.refresh_topology()
+                print(f"✓ Publishing through gateway '{device['name']}' ({host}:{port})")
+                return self.gateway
+        raise Exception(f"No device with the '{GATEWAY_PROFILE}' profile found")
+
+    def use_vectorized_fleet(self, seed=None):
+        """Move fleet state into NumPy arrays (see fleet_model.FleetState)"""
+        from fleet_model import FleetState
+
+        self.fleet = FleetState.from_device_tokens(self.device_tokens, self.moisture_trends, seed=seed)
+        print(f"✓ Vectorized fleet model: {len(self.fleet)} devices, {self.fleet.nbytes()} bytes of state")
+        return self.fleet
+
+    def current_moisture(self, device_name):
+        """Latest simulated moisture of a sensor, or None if unknown"""
+        if self.fleet is not None:
+            return self.fleet.moisture_of(device_name)
+        if device_name in self.moisture_trends:
+            return round(self.moisture_trends[device_name], 1)
+        return None
+
+    def iter_device_telemetry(self, device_names=None):
+        """Iterate (device name, field name, telemetry) for every simulated device, or only the named ones"""
+        return self.generate_device_telemetry(device_names)
+
+    def record_sent(self, name, telemetry, entity_type="DEVICE", ts=None):
+        """Append telemetry that was accepted by ThingsBoard to the recording, if one is open"""
+        if self.recorder is not None:
+            self.recorder.write(int(time.time() * 1000) if ts is None else ts, name, telemetry, entity_type)
+
+    def generate_device_telemetry(self, device_names=None):
+        """Yield (device name, field name, telemetry) for every simulated device, or only the named ones"""
+        if self.fleet is not None:
+            indices = None if device_names is None else self.fleet.indices_of(device_names)
+            self.fleet.step(indices)
+            for device_name, telemetry in self.fleet.iter_payloads(indices):
+                yield device_name, self.device_fields.get(device_name), telemetry
+            return
+
+        if device_names is None:
+            device_names = self.device_tokens
+        for device_name in device_names:
+            telemetry = self.simulate_device(device_name, self.device_tokens[device_name]['type'])
+            if telemetry is not None:
+                yield device_name, self.device_fields.get(device_name), telemetry
+
     def simulate_moisture_sensor(self, device_name):
         """Simulate realistic moisture sensor data"""
         # Get current trend
@@ -189,27 +382,39 @@ class TelemetrySimulator:
             "battery": random.randint(75, 100)
         }
 
+    def simulate_device(self, device_name, device_type):
+        """Generate one telemetry payload for a device, or None for unknown types"""
+        if device_type == 'SI Soil Moisture Sensor':
+            return self.simulate_moisture_sensor(device_name)
+        elif device_type == 'SI Water Meter':
+            return self.simulate_water_meter()
+        elif device_type == 'SI Smart Valve':
+            return self.simulate_smart_valve()
+        return None
+
     def calculate_field_telemetry(self, asset_id):
         """Calculate field telemetry based on connected sensors"""
-        # Get all devices connected to this field
-        device_ids = self.get_asset_devices(asset_id)
+        self.refresh_topology()
 
         moisture_values = []
-        for device_id in device_ids:
-            # Get device type
-            device_type = None
-            for name, info in self.device_tokens.items():
-                if info['id'] == device_id:
-                    device_type = info['type']
-                    break
-
-            if device_type == 'SI Soil Moisture Sensor':
-                telemetry = self.get_device_telemetry(device_id, ['moisture'])
+        for device_name in self.field_devices.get(asset_id, []):
+            device_info = self.device_tokens[device_name]
+            if device_info['type'] != 'SI Soil Moisture Sensor':
+                continue
+
+            if self.verify_field_telemetry:
+                # Read back what the server actually stored
+                telemetry = self.get_device_telemetry(device_info['id'], ['moisture'])
                 if 'moisture' in telemetry:
                     try:
                         moisture_values.append(float(telemetry['moisture']))
                     except (ValueError, TypeError):
                         pass
+            else:
+                # Use the value this simulator just generated
+                moisture = self.current_moisture(device_name)
+                if moisture is not None:
+                    moisture_values.append(moisture)
 
         # Calculate average moisture
         avg_moisture = round(sum(moisture_values) / len(moisture_values), 1) if moisture_values else 60.0
@@ -236,64 +441,209 @@ class TelemetrySimulator:
             "waterConsumption": water_consumption
         }
 
-    def run_simulation(self):
-        """Run continuous telemetry simulation"""
+    def send_field_telemetry(self, verbose=True):
+        """Calculate and send telemetry for every field asset"""
+        for asset_name, asset_id in self.asset_ids.items():
+            telemetry = self.calculate_field_telemetry(asset_id)
+            if self.send_asset_telemetry(asset_id, telemetry):
+                self.record_sent(asset_name, telemetry, "ASSET")
+                if verbose:
+                    print(f"✓ {asset_name}: avgMoisture={telemetry['avgMoisture']}, "
+                          f"state={telemetry['irrigationState']}")
+
+    def build_schedule(self, slot_seconds=SLOT_SECONDS, periods=DEVICE_PERIODS):
+        """Spread devices across their reporting period (see scheduler.PhaseSchedule)"""
+        return PhaseSchedule(
+            ((name, info['type']) for name, info in self.device_tokens.items()),
+            INTERVAL_SECONDS, periods, slot_seconds
+        )
+
+    def run_simulation(self, slot_seconds=SLOT_SECONDS, periods=DEVICE_PERIODS, policy=OVERRUN_POLICY):
+        """Run continuous telemetry simulation, one slot of phase-spread devices at a time"""
+        schedule = self.build_schedule(slot_seconds, periods)
+        ticker = DeadlineTicker(slot_seconds, policy)
+        slots_per_interval = max(1, round(INTERVAL_SECONDS / slot_seconds))
+
         print("\n" + "="*60)
         print("Starting Telemetry Simulation")
         print("="*60)
-        print(f"Sending telemetry every {INTERVAL_SECONDS} seconds")
+        print(f"Sending telemetry every {INTERVAL_SECONDS} seconds"
+              + (f" ({', '.join(f'{t}: {p}s' for t, p in periods.items())})" if periods else ""))
+        print(f"Devices spread over {slot_seconds:g}s slots, at most {schedule.busiest_slot()} per slot; "
+              f"overrun policy: {policy}")
         print("Press Ctrl+C to stop\n")
 
         iteration = 0
         while True:
             try:
-                iteration += 1
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                print(f"\n[{timestamp}] Iteration {iteration}")
-                print("-" * 60)
-
-                # Send device telemetry
-                for device_name, device_info in self.device_tokens.items():
-                    device_type = device_info['type']
-                    token = device_info['token']
-
-                    if device_type == 'SI Soil Moisture Sensor':
-                        telemetry = self.simulate_moisture_sensor(device_name)
-                    elif device_type == 'SI Water Meter':
-                        telemetry = self.simulate_water_meter()
-                    elif device_type == 'SI Smart Valve':
-                        telemetry = self.simulate_smart_valve()
-                    else:
-                        continue
-
-                    if self.send_telemetry(token, telemetry):
-                        print(f"✓ {device_name}: {telemetry}")
-
-                # Send asset telemetry
-                for asset_name, asset_id in self.asset_ids.items():
-                    telemetry = self.calculate_field_telemetry(asset_id)
-                    if self.send_asset_telemetry(asset_id, telemetry):
-                        print(f"✓ {asset_name}: avgMoisture={telemetry['avgMoisture']}, state={telemetry['irrigationState']}")
-
-                time.sleep(INTERVAL_SECONDS)
+                slot, lag, skipped = ticker.wait()
+                TICK_LAG.observe(lag)
+                if skipped:
+                    print(f"⚠ Fell {skipped * slot_seconds + lag:.1f}s behind schedule, skipped {skipped} slot(s)")
+                elif lag >= slot_seconds:
+                    print(f"⚠ Running {lag:.1f}s behind schedule, catching up")
+                tick_start = time.perf_counter()
+
+                if slot // slots_per_interval >= iteration:
+                    iteration = slot // slots_per_interval + 1
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    print(f"\n[{timestamp}] Iteration {iteration}")
+                    print("-" * 60)
+                    self.send_field_telemetry()
+
+                # Send telemetry for the devices whose phase falls in this slot
+                device_names = schedule.due(slot)
+                if self.gateway and device_names:
+                    updates, messages = self.gateway.send_tick(self.iter_device_telemetry(device_names))
+                    print(f"✓ Published {updates} device updates in {messages} gateway message(s)")
+                else:
+                    for device_name, _, telemetry in self.iter_device_telemetry(device_names):
+                        if self.send_telemetry(self.device_tokens[device_name]['token'], telemetry):
+                            self.record_sent(device_name, telemetry)
+                            print(f"✓ {device_name}: {telemetry}")
+
+                TICK_DURATION.observe(time.perf_counter() - tick_start)
 
             except KeyboardInterrupt:
                 print("\n\n" + "="*60)
                 print("✓ Simulation stopped by user")
+                if ticker.late:
+                    print(f"⚠ {ticker.late} slot(s) started late, {ticker.skipped} skipped")
                 print("="*60 + "\n")
                 break
             except Exception as e:
                 print(f"✗ Error: {e}")
-                time.sleep(INTERVAL_SECONDS)
+
+
+def parse_device_period(value):
+    """TYPE=SECONDS as a (type, seconds) pair; an empty value as None"""
+    if not value:
+        return None
+    device_type, separator, seconds = value.rpartition("=")
+    try:
+        if not separator or not device_type or float(seconds) <= 0:
+            raise ValueError
+        return device_type, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected TYPE=SECONDS, got {value!r}")
+
+
+def device_periods(values):
+    """The per-type periods from --device-period values: the defaults, overridden or cleared"""
+    periods = dict(DEVICE_PERIODS)
+    for value in values or []:
+        if value is None:
+            periods.clear()
+        else:
+            periods[value[0]] = value[1]
+    return periods
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ThingsBoard Smart Irrigation Telemetry Simulator")
+    parser.add_argument("--engine", choices=["sync", "async"], default=ENGINE,
+                        help="sync posts one device at a time; async posts concurrently (http transport)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="max in-flight requests for the async engine")
+    parser.add_argument("--verify", action="store_true", default=VERIFY_FIELD_TELEMETRY,
+                        help="compute field avgMoisture from values read back from ThingsBoard")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the fleet across this many worker processes (async engine per shard)")
+    parser.add_argument("--fleet-model", choices=["dict", "numpy"], default=FLEET_MODEL,
+                        help="numpy keeps sensor state in arrays updated once per tick")
+    parser.add_argument("--backfill", action="store_true",
+                        help="upload historical telemetry between --start and --end, then exit")
+    parser.add_argument("--start", type=datetime.fromisoformat,
+                        help="backfill start (ISO date/time, default: 30 days before --end)")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="backfill end (ISO date/time, default: now)")
+    parser.add_argument("--period", type=float, default=INTERVAL_SECONDS,
+                        help="seconds between backfilled samples")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS,
+                        help="devices backfilled in parallel")
+    parser.add_argument("--no-credential-cache", action="store_true",
+                        help=f"always fetch device credentials instead of using {CREDENTIAL_CACHE_FILE}")
+    parser.add_argument("--seed", type=int,
+                        help="seed the sensor models for repeatable runs")
+    parser.add_argument("--record", metavar="PATH",
+                        help="append all sent device telemetry to a compressed recording")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="re-send a recording instead of simulating, then exit")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument("--seek", type=float, default=0,
+                        help="start the replay this many seconds into the recording")
+    parser.add_argument("--preserve-timestamps", action="store_true",
+                        help="replay with the recorded timestamps instead of the time of sending")
+    parser.add_argument("--transport", choices=["http", "gateway"], default=TRANSPORT,
+                        help="http posts per device; gateway batches devices per MQTT message")
+    parser.add_argument("--batch-size", type=int, default=GATEWAY_BATCH_SIZE,
+                        help="devices per gateway message (0 = one message per field)")
+    parser.add_argument("--metrics-port", type=int, nargs="?", const=METRICS_PORT,
+                        help=f"serve Prometheus metrics on this port (default {METRICS_PORT}; "
+                             "not collected from --shards workers)")
+    parser.add_argument("--metrics-host", default=METRICS_HOST,
+                        help=f"interface the metrics endpoint listens on (default {METRICS_HOST})")
+    parser.add_argument("--slot-seconds", type=float, default=SLOT_SECONDS,
+                        help="spread devices across the interval in slots this long "
+                             f"(use {INTERVAL_SECONDS} to send the whole fleet at once)")
+    parser.add_argument("--device-period", action="append", type=parse_device_period, metavar="TYPE=SECONDS",
+                        help="reporting period of one device type, repeatable (default: "
+                             + (", ".join(f"{t}={p:g}" for t, p in DEVICE_PERIODS.items()) or "none")
+                             + f"); an empty value reports every type each {INTERVAL_SECONDS}s")
+    parser.add_argument("--overrun-policy", choices=POLICIES, default=OVERRUN_POLICY,
+                        help="when behind schedule, skip missed slots or catch up by running them back to back")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    periods = device_periods(args.device_period)
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port, args.metrics_host)
+    simulator = None
     try:
-        simulator = TelemetrySimulator(TB_URL, USERNAME, PASSWORD)
+        simulator = TelemetrySimulator(TB_URL, USERNAME, PASSWORD, pool_size=max(POOL_SIZE, args.workers))
+        simulator.verify_field_telemetry = args.verify
+        if not args.no_credential_cache:
+            simulator.credential_cache = CredentialCache(CREDENTIAL_CACHE_FILE, TB_URL)
         simulator.initialize_devices()
         simulator.initialize_assets()
-        simulator.run_simulation()
+        if args.record:
+            simulator.recorder = TelemetryRecorder(args.record)
+
+        if args.replay:
+            replay(simulator, args.replay, speed=args.speed, seek_seconds=args.seek,
+                   preserve_timestamps=args.preserve_timestamps)
+        elif args.backfill:
+            end = args.end or datetime.now()
+            start = args.start or end - timedelta(days=30)
+            run_backfill(simulator, start, end, args.period, workers=args.workers)
+        elif args.shards > 1:
+            from sharded_simulator import ShardCoordinator
+            simulator.refresh_topology()
+            ShardCoordinator(simulator, USERNAME, PASSWORD, args.shards, concurrency=args.concurrency,
+                             interval=INTERVAL_SECONDS, fleet_model=args.fleet_model, seed=args.seed,
+                             slot_seconds=args.slot_seconds, periods=periods).run()
+        else:
+            if args.fleet_model == "numpy":
+                simulator.use_vectorized_fleet(seed=args.seed)
+            if args.transport == "gateway":
+                simulator.initialize_gateway(batch_size=args.batch_size)
+            if args.engine == "async" and args.transport == "http":
+                from async_engine import AsyncSimulationEngine
+                AsyncSimulationEngine(simulator, concurrency=args.concurrency, interval=INTERVAL_SECONDS,
+                                      policy=args.overrun_policy, slot_seconds=args.slot_seconds,
+                                      periods=periods).run()
+            else:
+                simulator.run_simulation(slot_seconds=args.slot_seconds, periods=periods, policy=args.overrun_policy)
     except Exception as e:
         print(f"\n✗ Fatal Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if simulator and simulator.recorder:
+            simulator.recorder.close()
+            print(f"✓ Recorded {simulator.recorder.records} messages to {args.record}")
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+ThingsBoard REST Client
+Shared client used by the setup, simulation and diagnostic scripts.
+All requests go through one keep-alive connection pool instead of opening
+a new TCP connection per call.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import endpoint_of, observe_request
+
+DEFAULT_POOL_SIZE = 20  # Max pooled keep-alive connections per host
+DEFAULT_TIMEOUT = 30  # Seconds
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_PREFETCH = 4  # Pages fetched concurrently once the page count is known
+
+# Save (POST) and get-by-id (GET <path>/<id>) endpoints of the entity types in a version control export
+ENTITY_PATHS = {
+    "CUSTOMER": "/api/customer",
+    "DEVICE_PROFILE": "/api/deviceProfile",
+    "ASSET_PROFILE": "/api/assetProfile",
+    "ASSET": "/api/asset",
+    "DEVICE": "/api/device",
+    "ENTITY_VIEW": "/api/entityView",
+    "RULE_CHAIN": "/api/ruleChain",
+    "DASHBOARD": "/api/dashboard",
+    "WIDGET_TYPE": "/api/widgetType",
+    "WIDGETS_BUNDLE": "/api/widgetsBundle",
+    "NOTIFICATION_TARGET": "/api/notification/target",
+    "NOTIFICATION_TEMPLATE": "/api/notification/template",
+    "NOTIFICATION_RULE": "/api/notification/rule",
+    "CONVERTER": "/api/converter",  # Professional Edition
+    "INTEGRATION": "/api/integration",  # Professional Edition
+}
+
+# Paged list endpoints of the same types, with the query each needs to list everything the tenant owns
+LIST_QUERIES = {
+    "CUSTOMER": [("/api/customers", {})],
+    "DEVICE_PROFILE": [("/api/deviceProfiles", {})],
+    "ASSET_PROFILE": [("/api/assetProfiles", {})],
+    "ASSET": [("/api/tenant/assets", {})],
+    "DEVICE": [("/api/tenant/devices", {})],
+    "ENTITY_VIEW": [("/api/tenant/entityViews", {})],
+    "RULE_CHAIN": [("/api/ruleChains", {"type": "CORE"}), ("/api/ruleChains", {"type": "EDGE"})],
+    "DASHBOARD": [("/api/tenant/dashboards", {})],
+    "WIDGET_TYPE": [("/api/widgetTypes", {"tenantOnly": "true"})],
+    "WIDGETS_BUNDLE": [("/api/widgetsBundles", {"tenantOnly": "true"})],
+    "NOTIFICATION_TARGET": [("/api/notification/targets", {})],
+    "NOTIFICATION_TEMPLATE": [("/api/notification/templates", {})],
+    "NOTIFICATION_RULE": [("/api/notification/rules", {})],
+    "CONVERTER": [("/api/converters", {})],
+    "INTEGRATION": [("/api/integrations", {})],
+}
+
+
+def iter_chunks(records, chunk_size):
+    """Group a record stream into lists of at most chunk_size"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ThingsBoardClient:
+    def __init__(self, url, username, password, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.token = None
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.login(username, password)
+
+    def login(self, username, password):
+        """Login to ThingsBoard and get JWT token"""
+        response = self.request(
+            "POST",
+            "/api/auth/login",
+            authorized=False,
+            json={"username": username, "password": password}
+        )
+        if response.status_code == 200:
+            self.token = response.json()["token"]
+            print("✓ Successfully logged in to ThingsBoard")
+        else:
+            raise Exception(f"Login failed: {response.text}")
+
+    def get_headers(self):
+        """Get authorization headers"""
+        return {
+            "Content-Type": "application/json",
+            "X-Authorization": f"Bearer {self.token}"
+        }
+
+    def request(self, method, path, authorized=True, **kwargs):
+        """Send a request through the pooled session"""
+        if authorized:
+            kwargs.setdefault("headers", self.get_headers())
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.url}{path}", **kwargs)
+        except requests.RequestException:
+            observe_request(method, endpoint_of(path), "error", 0, time.perf_counter() - start)
+            raise
+        body = response.request.body
+        observe_request(method, endpoint_of(path), response.status_code, len(body) if body else 0,
+                        time.perf_counter() - start)
+        return response
+
+    def get_json(self, path, params=None):
+        """GET a JSON document, returning None on a non-200 response"""
+        response = self.request("GET", path, params=params)
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def close(self):
+        """Release all pooled connections"""
+        self.session.close()
+
+    def iter_pages(self, fetch_page, page_size=DEFAULT_PAGE_SIZE, prefetch=DEFAULT_PREFETCH):
+        """Yield every entity of a paged endpoint, in order, one page in memory at a time.
+
+        fetch_page(page, page_size) returns a ThingsBoard page document. Once the
+        first page reports totalPages, up to `prefetch` later pages are fetched
+        concurrently.
+        """
+        first = fetch_page(0, page_size)
+        if first is None:
+            raise Exception("Failed to fetch page 0")
+        yield from first["data"]
+        if not first.get("hasNext"):
+            return
+
+        total_pages = first.get("totalPages")
+        if prefetch <= 1 or not total_pages:
+            page_number = 1
+            while True:
+                page = fetch_page(page_number, page_size)
+                if page is None:
+                    raise Exception(f"Failed to fetch page {page_number}")
+                yield from page["data"]
+                if not page.get("hasNext"):
+                    return
+                page_number += 1
+
+        with ThreadPoolExecutor(max_workers=prefetch) as pool:
+            window = deque()
+            next_page = 1
+            while next_page < total_pages or window:
+                while next_page < total_pages and len(window) < prefetch:
+                    window.append((next_page, pool.submit(fetch_page, next_page, page_size)))
+                    next_page += 1
+                page_number, future = window.popleft()
+                page = future.result()
+                if page is None:
+                    raise Exception(f"Failed to fetch page {page_number}")
+                yield from page["data"]
+
+    # Device profiles
+
+    def get_device_profiles(self, page=0, page_size=1000, text_search=None):
+        """Get one page of device profiles"""
+        params = {"pageSize": page_size, "page": page}
+        if text_search:
+            params["textSearch"] = text_search
+        return self.get_json("/api/deviceProfiles", params)
+
+    def iter_device_profiles(self, text_search=None, page_size=DEFAULT_PAGE_SIZE):
+        """Iterate all device profiles"""
+        return self.iter_pages(
+            lambda page, size: self.get_device_profiles(page, size, text_search),
+            page_size
+        )
+
+    def get_device_profile_by_name(self, name):
+        """Get device profile by name"""
+        for profile in self.iter_device_profiles(text_search=name):
+            if profile["name"] == name:
+                return profile
+        return None
+
+    def create_device_profile(self, profile_data):
+        """Create device profile"""
+        response = self.request("POST", "/api/deviceProfile", json=profile_data)
+        if response.status_code == 200:
+            profile = response.json()
+            print(f"✓ Created device profile: {profile_data['name']}")
+            return profile
+        else:
+            print(f"✗ Failed to create device profile {profile_data['name']}: {response.text}")
+            return None
+
+    # Devices
+
+    def get_tenant_devices(self, page=0, page_size=1000, device_type=None, text_search=None):
+        """Get one page of tenant devices"""
+        params = {"pageSize": page_size, "page": page}
+        if device_type:
+            params["type"] = device_type
+        if text_search:
+            params["textSearch"] = text_search
+        return self.get_json("/api/tenant/devices", params)
+
+    def iter_tenant_devices(self, device_type=None, text_search=None, page_size=DEFAULT_PAGE_SIZE):
+        """Iterate all tenant devices, optionally filtered by type and text search"""
+        return self.iter_pages(
+            lambda page, size: self.get_tenant_devices(page, size, device_type, text_search),
+            page_size
+        )
+
+    def create_device(self, device_data):
+        """Create device"""
+        response = self.request("POST", "/api/device", json=device_data)
+        if response.status_code == 200:
+            device = response.json()
+            print(f"✓ Created device: {device_data['name']}")
+            return device
+        else:
+            print(f"✗ Failed to create device {device_data['name']}: {response.text}")
+            return None
+
+    def get_device_credentials(self, device_id):
+        """Get device credentials (access token)"""
+        return self.get_json(f"/api/device/{device_id}/credentials")
+
+    # Assets
+
+    def get_tenant_assets(self, page=0, page_size=1000, asset_type=None, text_search=None):
+        """Get one page of tenant assets"""
+        params = {"pageSize": page_size, "page": page}
+        if asset_type:
+            params["type"] = asset_type
+        if text_search:
+            params["textSearch"] = text_search
+        return self.get_json("/api/tenant/assets", params)
+
+    def iter_tenant_assets(self, asset_type=None, text_search=None, page_size=DEFAULT_PAGE_SIZE):
+        """Iterate all tenant assets, optionally filtered by type and text search"""
+        return self.iter_pages(
+            lambda page, size: self.get_tenant_assets(page, size, asset_type, text_search),
+            page_size
+        )
+
+    def create_asset(self, asset_data):
+        """Create asset"""
+        response = self.request("POST", "/api/asset", json=asset_data)
+        if response.status_code == 200:
+            asset = response.json()
+            print(f"✓ Created asset: {asset_data['name']}")
+            return asset
+        else:
+            print(f"✗ Failed to create asset {asset_data['name']}: {response.text}")
+            return None
+
+    # Relations
+
+    def create_relation(self, from_id, from_type, to_id, to_type, relation_type="Contains", verbose=True):
+        """Create relation between entities"""
+        relation_data = {
+            "from": {
+                "entityType": from_type,
+                "id": from_id
+            },
+            "to": {
+                "entityType": to_type,
+                "id": to_id
+            },
+            "type": relation_type,
+            "typeGroup": "COMMON"
+        }
+        response = self.request("POST", "/api/relation", json=relation_data)
+        if response.status_code == 200:
+            if verbose:
+                print(f"✓ Created relation from {from_type} to {to_type}")
+            return True
+        else:
+            if verbose:
+                print(f"✗ Failed to create relation: {response.text}")
+            return False
+
+    def get_relations_info(self, from_id, from_type):
+        """Get relations (with target entity names) originating from an entity"""
+        return self.get_json("/api/relations/info", {"fromId": from_id, "fromType": from_type})
+
+    def get_relations_info_to(self, to_id, to_type):
+        """Get relations (with source entity names) pointing at an entity"""
+        return self.get_json("/api/relations/info", {"toId": to_id, "toType": to_type})
+
+    # Attributes
+
+    def save_attributes(self, entity_type, entity_id, attributes, scope="SERVER_SCOPE", verbose=True):
+        """Save entity attributes"""
+        response = self.request(
+            "POST",
+            f"/api/plugins/telemetry/{entity_type}/{entity_id}/attributes/{scope}",
+            json=attributes
+        )
+        if response.status_code == 200:
+            if verbose:
+                print(f"✓ Saved attributes for {entity_type} {entity_id}")
+            return True
+        else:
+            if verbose:
+                print(f"✗ Failed to save attributes: {response.text}")
+            return False
+
+    def get_attributes(self, entity_type, entity_id, scope="SERVER_SCOPE"):
+        """Get entity attributes as a list of {key, value, lastUpdateTs}"""
+        return self.get_json(f"/api/plugins/telemetry/{entity_type}/{entity_id}/values/attributes/{scope}")
+
+    # Timeseries
+
+    def post_device_telemetry(self, access_token, telemetry_data):
+        """Send telemetry data using device access token, returning the HTTP status"""
+        response = self.request(
+            "POST",
+            f"/api/v1/{access_token}/telemetry",
+            authorized=False,
+            json=telemetry_data
+        )
+        return response.status_code
+
+    def send_telemetry(self, access_token, telemetry_data):
+        """Send telemetry data using device access token"""
+        return self.post_device_telemetry(access_token, telemetry_data) == 200
+
+    def save_timeseries(self, entity_type, entity_id, telemetry_data):
+        """Save telemetry data to any entity using the tenant token"""
+        response = self.request(
+            "POST",
+            f"/api/plugins/telemetry/{entity_type}/{entity_id}/timeseries/ANY",
+            json=telemetry_data
+        )
+        return response.status_code == 200
+
+    def send_asset_telemetry(self, asset_id, telemetry_data):
+        """Send telemetry data to asset"""
+        return self.save_timeseries("ASSET", asset_id, telemetry_data)
+
+    def get_latest_timeseries(self, entity_type, entity_id, keys):
+        """Get latest telemetry as {key: [{ts, value}]}"""
+        return self.get_json(
+            f"/api/plugins/telemetry/{entity_type}/{entity_id}/values/timeseries",
+            {"keys": ",".join(keys)}
+        )
+
+    # Entity data queries
+
+    def find_entity_data(self, query):
+        """Run one page of an entity data query"""
+        response = self.request("POST", "/api/entitiesQuery/find", json=query)
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def iter_entity_data(self, entity_filter, entity_fields=("name",), timeseries=(), attributes=(),
+                         attribute_type="SERVER_ATTRIBUTE", page_size=DEFAULT_PAGE_SIZE):
+        """Iterate entities matching a filter together with their latest telemetry and attributes.
+
+        Each item is {entityId, latest: {key type: {key: {ts, value}}}}; values
+        are strings and missing keys have ts 0 and an empty value.
+        """
+        latest_values = [{"type": "TIME_SERIES", "key": key} for key in timeseries]
+        latest_values += [{"type": attribute_type, "key": key} for key in attributes]
+
+        def fetch_page(page, size):
+            return self.find_entity_data({
+                "entityFilter": entity_filter,
+                "entityFields": [{"type": "ENTITY_FIELD", "key": key} for key in entity_fields],
+                "latestValues": latest_values,
+                "pageLink": {
+                    "page": page,
+                    "pageSize": size,
+                    "sortOrder": {"key": {"type": "ENTITY_FIELD", "key": "createdTime"}, "direction": "ASC"}
+                }
+            })
+
+        return self.iter_pages(fetch_page, page_size)
+
+    # Dashboards
+
+    def get_tenant_dashboards(self, page=0, page_size=1000, text_search=None):
+        """Get one page of tenant dashboards"""
+        params = {"pageSize": page_size, "page": page}
+        if text_search:
+            params["textSearch"] = text_search
+        return self.get_json("/api/tenant/dashboards", params)
+
+    def iter_tenant_dashboards(self, text_search=None, page_size=DEFAULT_PAGE_SIZE):
+        """Iterate all tenant dashboards"""
+        return self.iter_pages(
+            lambda page, size: self.get_tenant_dashboards(page, size, text_search),
+            page_size
+        )
+
+    # Any exported entity type (see ENTITY_PATHS)
+
+    def iter_entities(self, entity_type, page_size=DEFAULT_PAGE_SIZE):
+        """Iterate every entity of a type the tenant owns, as the list endpoints return them"""
+        for path, query in LIST_QUERIES[entity_type]:
+            yield from self.iter_pages(
+                lambda page, size: self.get_json(path, dict(query, pageSize=size, page=page)),
+                page_size
+            )
+
+    def get_entity(self, entity_type, entity_id):
+        """Get an entity by id, or None if it does not exist"""
+        return self.get_json(f"{ENTITY_PATHS[entity_type]}/{entity_id}")
+
+    def get_rule_chain_metadata(self, rule_chain_id):
+        """Get a rule chain's nodes and connections"""
+        return self.get_json(f"/api/ruleChain/{rule_chain_id}/metadata")
+
+    def get_widgets_bundle_fqns(self, bundle_id):
+        """Get the fully qualified names of a widgets bundle's widget types"""
+        return self.get_json(f"/api/widgetsBundle/{bundle_id}/widgetTypeFqns")
+
+    def save_entity(self, entity_type, data):
+        """Create an entity, or update it when data carries the id of an existing one"""
+        name = data.get("name") or data.get("title") or data.get("fqn")
+        return self.post_entity(ENTITY_PATHS[entity_type], data, f"{entity_type} {name}")
+
+    def save_device_with_credentials(self, device, credentials):
+        """Create a device together with its exported credentials"""
+        return self.post_entity("/api/device-with-credentials", {"device": device, "credentials": credentials},
+                                f"DEVICE {device.get('name')}")
+
+    def save_rule_chain_metadata(self, metadata):
+        """Replace a rule chain's nodes and connections"""
+        return self.post_entity("/api/ruleChain/metadata", metadata, "rule chain metadata")
+
+    def set_root_rule_chain(self, rule_chain_id):
+        return self.post_entity(f"/api/ruleChain/{rule_chain_id}/root", None, "root rule chain")
+
+    def update_widgets_bundle_fqns(self, bundle_id, fqns):
+        """Set the widget types (by fully qualified name) of a widgets bundle"""
+        return self.post_entity(f"/api/widgetsBundle/{bundle_id}/widgetTypeFqns", fqns, "widgets bundle types")
+
+    def post_entity(self, path, data, what):
+        """POST and return the JSON response, raising with the server's message on failure"""
+        response = self.request("POST", path, json=data)
+        if response.status_code != 200:
+            raise Exception(f"Failed to save {what}: {response.status_code} {response.text[:200]}")
+        return response.json() if response.content else None
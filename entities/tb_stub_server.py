@@ -0,0 +1,673 @@
+#!/usr/bin/env python3
+"""
+ThingsBoard Stub Server
+Local, in-memory stand-in for the subset of the ThingsBoard REST API used by
+the scripts in this directory (login, tenant device/asset/dashboard paging,
+device profiles, credentials, relations, attributes, timeseries, entity data
+queries, v1 device telemetry, and listing, saving and getting the entity
+types of a version control export), so they can be benchmarked and exercised without a
+live server.
+Runs an asyncio server in a background thread with keep-alive support, and
+optionally an MQTT listener that accepts gateway API publishes. Latency and
+error rates can be injected to model a loaded server.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STUB_TOKEN = "stub-jwt-token"
+
+GATEWAY_TELEMETRY_TOPIC = "v1/gateway/telemetry"
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 500: "Internal Server Error"}
+
+PAGED_COLLECTIONS = {
+    "/api/deviceProfiles": "DEVICE_PROFILE",
+    "/api/tenant/devices": "DEVICE",
+    "/api/tenant/assets": "ASSET",
+    "/api/tenant/dashboards": "DASHBOARD",
+    "/api/customers": "CUSTOMER",
+    "/api/assetProfiles": "ASSET_PROFILE",
+    "/api/tenant/entityViews": "ENTITY_VIEW",
+    "/api/ruleChains": "RULE_CHAIN",
+    "/api/widgetTypes": "WIDGET_TYPE",
+    "/api/widgetsBundles": "WIDGETS_BUNDLE",
+    "/api/notification/targets": "NOTIFICATION_TARGET",
+    "/api/notification/templates": "NOTIFICATION_TEMPLATE",
+    "/api/notification/rules": "NOTIFICATION_RULE",
+}
+
+CREATE_PATHS = {
+    "/api/deviceProfile": "DEVICE_PROFILE",
+    "/api/device": "DEVICE",
+    "/api/asset": "ASSET",
+    "/api/dashboard": "DASHBOARD",
+    "/api/customer": "CUSTOMER",
+    "/api/assetProfile": "ASSET_PROFILE",
+    "/api/entityView": "ENTITY_VIEW",
+    "/api/ruleChain": "RULE_CHAIN",
+    "/api/widgetType": "WIDGET_TYPE",
+    "/api/widgetsBundle": "WIDGETS_BUNDLE",
+    "/api/notification/target": "NOTIFICATION_TARGET",
+    "/api/notification/template": "NOTIFICATION_TEMPLATE",
+    "/api/notification/rule": "NOTIFICATION_RULE",
+}
+
+NAME_FIELDS = {"DASHBOARD": "title", "CUSTOMER": "title", "WIDGETS_BUNDLE": "alias", "WIDGET_TYPE": "fqn"}
+SHARED_NAMES = ("DASHBOARD", "RULE_CHAIN")  # Types whose names ThingsBoard does not require to be unique
+
+ENTITY_QUERY_PATH = "/api/entitiesQuery/find"
+
+ATTRIBUTE_KEY_SCOPES = {
+    "SERVER_ATTRIBUTE": ("SERVER_SCOPE",),
+    "SHARED_ATTRIBUTE": ("SHARED_SCOPE",),
+    "CLIENT_ATTRIBUTE": ("CLIENT_SCOPE",),
+    "ATTRIBUTE": ("SERVER_SCOPE", "SHARED_SCOPE", "CLIENT_SCOPE"),
+}
+
+ENTITY_PATH = re.compile(r"^(" + "|".join(map(re.escape, CREATE_PATHS)) + r")/([0-9a-f-]{36})$")
+RULE_CHAIN_ROOT_PATH = re.compile(r"^/api/ruleChain/([^/]+)/root$")
+RULE_CHAIN_METADATA_PATH = re.compile(r"^/api/ruleChain/([^/]+)/metadata$")
+BUNDLE_FQNS_PATH = re.compile(r"^/api/widgetsBundle/([^/]+)/widgetTypeFqns$")
+CREDENTIALS_PATH = re.compile(r"^/api/device/([^/]+)/credentials$")
+DEVICE_TELEMETRY_PATH = re.compile(r"^/api/v1/([^/]+)/telemetry$")
+TELEMETRY_PATH = re.compile(
+    r"^/api/plugins/telemetry/([A-Z_]+)/([^/]+)/(attributes/[A-Z_]+|values/attributes/[A-Z_]+|timeseries/[A-Z_]+"
+    r"|values/timeseries)$"
+)
+
+
+def raise_open_file_limit():
+    """Lift the soft open-file limit to the hard limit so thousands of sockets fit"""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class StubThingsBoardServer:
+    def __init__(self, host="127.0.0.1", port=0, mqtt_port=None, reuse_port=False, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, strict_tokens=False, seed=None):
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port  # Lets several stub processes share one port
+        self.mqtt_port = mqtt_port  # None disables MQTT, 0 picks a free port
+        self.latency_ms = latency_ms  # Added to every response
+        self.jitter_ms = jitter_ms  # Extra uniform random delay on top of latency_ms
+        self.error_rate = error_rate  # Fraction of requests (other than login) answered with a 500
+        self.strict_tokens = strict_tokens  # Reject v1 telemetry for unknown access tokens with a 401
+        self.random = random.Random(seed)
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.mqtt_messages = 0
+        self.gateway_device_updates = 0
+
+        # In-memory storage
+        self.entities = {entity_type: {} for entity_type in CREATE_PATHS.values()}  # type -> id -> entity
+        self.names = {}  # (type, name) -> id
+        self.credentials = {}  # device id -> access token
+        self.devices_by_token = {}  # access token -> device id
+        self.relations = {}  # from id -> [relation]
+        self.attributes = {}  # (entity id, scope) -> key -> {value, lastUpdateTs}
+        self.timeseries = {}  # entity id -> key -> {ts, value}, latest only
+        self.rule_chain_metadata = {}  # rule chain id -> metadata
+        self.bundle_fqns = {}  # widgets bundle id -> [widget type fqn]
+
+        self.loop = None
+        self.server = None
+        self.mqtt_server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Start the server in a background thread"""
+        raise_open_file_limit()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for its thread"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096,
+                                 reuse_port=self.reuse_port or None)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.mqtt_port is not None:
+            self.mqtt_server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_mqtt_connection, self.host, self.mqtt_port, backlog=4096)
+            )
+            self.mqtt_port = self.mqtt_server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            if self.mqtt_server:
+                self.mqtt_server.close()
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                if self.latency_ms or self.jitter_ms:
+                    await asyncio.sleep((self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000.0)
+                if self.error_rate and target != "/api/auth/login" and self.random.random() < self.error_rate:
+                    self.errors_injected += 1
+                    status, payload = 500, {"status": 500, "message": "Injected error"}
+                else:
+                    try:
+                        status, payload = self.handle(method, target, headers, body)
+                    except Exception as e:  # A stub bug answers 500 instead of dropping a keep-alive connection
+                        status, payload = 500, {"status": 500, "message": f"{type(e).__name__}: {e}"}
+                self.requests_served += 1
+                data = b"" if payload is None else json.dumps(payload).encode()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_mqtt_connection(self, reader, writer):
+        """Speak just enough MQTT 3.1.1 for a gateway client to connect and publish"""
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                packet_type = header[0] >> 4
+                multiplier, length = 1, 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+
+                if packet_type == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif packet_type == 3:  # PUBLISH
+                    qos = (header[0] >> 1) & 0x03
+                    topic_length = int.from_bytes(body[:2], "big")
+                    topic = body[2:2 + topic_length].decode()
+                    offset = 2 + topic_length
+                    if qos:
+                        packet_id = body[offset:offset + 2]
+                        offset += 2
+                        writer.write(b"\x40\x02" + packet_id)
+                    self.handle_publish(topic, body[offset:])
+                elif packet_type == 8:  # SUBSCRIBE
+                    topic_count = 0
+                    offset = 2
+                    while offset < len(body):
+                        offset += 2 + int.from_bytes(body[offset:offset + 2], "big") + 1
+                        topic_count += 1
+                    writer.write(bytes([0x90, 2 + topic_count]) + body[:2] + b"\x01" * topic_count)
+                elif packet_type == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif packet_type == 14:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def handle_publish(self, topic, payload):
+        """Record an MQTT publish; gateway telemetry updates known devices by name"""
+        self.mqtt_messages += 1
+        if topic == GATEWAY_TELEMETRY_TOPIC:
+            updates = json.loads(payload)
+            self.gateway_device_updates += len(updates)
+            for device_name, records in updates.items():
+                device_id = self.names.get(("DEVICE", device_name))
+                if device_id:
+                    self.store_timeseries(device_id, records)
+
+    # Storage
+
+    @staticmethod
+    def name_of(entity_type, data):
+        """The field names are unique by: title for dashboards and customers, alias for bundles, fqn for widget types"""
+        return data.get(NAME_FIELDS.get(entity_type, "name")) or data.get("name") or data.get("title")
+
+    def name_taken(self, entity_type, name, entity_id=None):
+        if entity_type in SHARED_NAMES:
+            return False
+        return self.names.get((entity_type, name), entity_id) != entity_id
+
+    def add_entity(self, entity_type, data, token=None):
+        """Store a new entity, returning it, or None if the name is taken"""
+        name = self.name_of(entity_type, data)
+        if not name or self.name_taken(entity_type, name) or (token and token in self.devices_by_token):
+            return None
+        entity = dict(data)
+        entity_id = str(uuid.uuid4())
+        entity["id"] = {"entityType": entity_type, "id": entity_id}
+        entity["createdTime"] = now_ms()
+        entity["version"] = 1
+        if entity_type == "DEVICE":
+            token = token or uuid.uuid4().hex[:20]
+            self.credentials[entity_id] = token
+            self.devices_by_token[token] = entity_id
+        self.store_entity(entity_type, entity, name)
+        return entity
+
+    def update_entity(self, entity_type, data):
+        """Replace a stored entity by the id in data, returning it, or None if its new name is taken"""
+        current = self.entities[entity_type][data["id"]["id"]]
+        name = self.name_of(entity_type, data)
+        if not name or self.name_taken(entity_type, name, current["id"]["id"]):
+            return None
+        current_name = (entity_type, self.name_of(entity_type, current))
+        if self.names.get(current_name) == current["id"]["id"]:
+            del self.names[current_name]
+        entity = dict(data, id=current["id"], createdTime=current["createdTime"], version=current["version"] + 1)
+        self.store_entity(entity_type, entity, name)
+        return entity
+
+    def store_entity(self, entity_type, entity, name):
+        if entity_type == "DASHBOARD":
+            entity["name"] = name
+        elif entity_type == "DEVICE":
+            profile_ref = entity.get("deviceProfileId")
+            profile = profile_ref and self.entities["DEVICE_PROFILE"].get(profile_ref.get("id"))
+            entity["type"] = profile["name"] if profile else entity.get("type", "default")
+        elif entity_type in ("ASSET", "DEVICE_PROFILE"):
+            entity.setdefault("type", "default")
+        self.entities[entity_type][entity["id"]["id"]] = entity
+        self.names[(entity_type, name)] = entity["id"]["id"]
+
+    def add_device(self, name, device_type="default", **fields):
+        """Pre-populate a device, returning it"""
+        return self.add_entity("DEVICE", dict(fields, name=name, type=device_type))
+
+    def add_asset(self, name, asset_type="default", **fields):
+        """Pre-populate an asset, returning it"""
+        return self.add_entity("ASSET", dict(fields, name=name, type=asset_type))
+
+    def add_relation(self, from_entity, to_entity, relation_type="Contains"):
+        """Relate two stored entities, returning the relation"""
+        relation = {"from": from_entity["id"], "to": to_entity["id"], "type": relation_type,
+                    "typeGroup": "COMMON"}
+        self.relations.setdefault(from_entity["id"]["id"], []).append(relation)
+        return relation
+
+    def store_timeseries(self, entity_id, data):
+        """Keep the latest value per key of a {values} dict or a list of {ts, values}"""
+        records = data if isinstance(data, list) else [data]
+        latest = self.timeseries.setdefault(entity_id, {})
+        for record in records:
+            if "values" in record:
+                ts, values = record.get("ts", now_ms()), record["values"]
+            else:
+                ts, values = now_ms(), record
+            for key, value in values.items():
+                current = latest.get(key)
+                if current is None or ts >= current["ts"]:
+                    latest[key] = {"ts": ts, "value": value}
+
+    def page(self, entity_type, query):
+        """One page of stored entities, ordered by name"""
+        page_size = int(query.get("pageSize", 10))
+        page_number = int(query.get("page", 0))
+        wanted_type = query.get("type")
+        text_search = query.get("textSearch", "").lower()
+        matches = [
+            entity for entity in self.entities[entity_type].values()
+            if (not wanted_type or entity.get("type") == wanted_type)
+            and (not text_search or text_search in self.name_of(entity_type, entity).lower())
+        ]
+        matches.sort(key=lambda entity: self.name_of(entity_type, entity))
+        return self.paginate(matches, page_size, page_number)
+
+    @staticmethod
+    def paginate(items, page_size, page_number):
+        total = len(items)
+        start = page_number * page_size
+        return {
+            "data": items[start:start + page_size],
+            "totalPages": (total + page_size - 1) // page_size if page_size else 0,
+            "totalElements": total,
+            "hasNext": start + page_size < total
+        }
+
+    def latest_value(self, entity, key_type, key):
+        """One latest value in entity data query form; missing keys come back as ts 0 and an empty value"""
+        entity_id = entity["id"]["id"]
+        if key_type == "ENTITY_FIELD":
+            value = entity.get(key)
+            return {"ts": entity["createdTime"], "value": "" if value is None else str(value)}
+        if key_type == "TIME_SERIES":
+            stored = self.timeseries.get(entity_id, {}).get(key)
+            ts_key = "ts"
+        else:
+            stored = None
+            for scope in ATTRIBUTE_KEY_SCOPES.get(key_type, ()):
+                stored = self.attributes.get((entity_id, scope), {}).get(key)
+                if stored is not None:
+                    break
+            ts_key = "lastUpdateTs"
+        if stored is None:
+            return {"ts": 0, "value": ""}
+        value = stored["value"]
+        return {"ts": stored[ts_key], "value": value if isinstance(value, str) else json.dumps(value)}
+
+    def related_entities(self, entity_filter):
+        """Entities one "FROM" hop away from a relationsQuery filter's root"""
+        if entity_filter.get("direction", "FROM") != "FROM" or entity_filter.get("maxLevel", 1) != 1:
+            return None
+        relation_filters = entity_filter.get("filters") or [{}]
+        related = []
+        for relation in self.relations.get(entity_filter["rootEntity"]["id"], []):
+            to = relation["to"]
+            if any((not f.get("relationType") or f["relationType"] == relation["type"])
+                   and (not f.get("entityTypes") or to["entityType"] in f["entityTypes"])
+                   for f in relation_filters):
+                entity = self.entities.get(to["entityType"], {}).get(to["id"])
+                if entity is not None:
+                    related.append(entity)
+        return related
+
+    def entity_data_page(self, query):
+        """One page of an entity data query (entityType, deviceType, assetType and one-level relationsQuery)"""
+        entity_filter = query.get("entityFilter", {})
+        filter_type = entity_filter.get("type")
+        wanted_types = None
+        name_prefix = ""
+        if filter_type == "relationsQuery":
+            candidates = self.related_entities(entity_filter)
+        elif filter_type == "entityType":
+            candidates = self.entities.get(entity_filter.get("entityType"), {}).values()
+        elif filter_type in ("deviceType", "assetType"):
+            prefix = "device" if filter_type == "deviceType" else "asset"
+            candidates = self.entities[prefix.upper()].values()
+            wanted_types = entity_filter.get(f"{prefix}Types") or [entity_filter.get(f"{prefix}Type")]
+            name_prefix = (entity_filter.get(f"{prefix}NameFilter") or "").lower()
+        else:
+            candidates = None
+        if candidates is None:
+            return None
+        matches = [
+            entity for entity in candidates
+            if (wanted_types is None or entity.get("type") in wanted_types)
+            and entity["name"].lower().startswith(name_prefix)
+        ]
+        page_link = query.get("pageLink", {})
+        sort_key = page_link.get("sortOrder", {}).get("key", {}).get("key")
+        if sort_key not in ("createdTime", "name"):
+            sort_key = "name"
+        matches.sort(key=lambda entity: (entity[sort_key], entity["name"]))
+        if page_link.get("sortOrder", {}).get("direction") == "DESC":
+            matches.reverse()
+
+        keys = [("ENTITY_FIELD", key["key"]) for key in query.get("entityFields", [])]
+        keys += [(key["type"], key["key"]) for key in query.get("latestValues", [])]
+        result = self.paginate(matches, int(page_link.get("pageSize", 10)), int(page_link.get("page", 0)))
+        rows = []
+        for entity in result["data"]:
+            latest = {}
+            for key_type, key in keys:
+                latest.setdefault(key_type, {})[key] = self.latest_value(entity, key_type, key)
+            rows.append({"entityId": entity["id"], "latest": latest, "timeseries": {}})
+        result["data"] = rows
+        return result
+
+    # Routing
+
+    def handle(self, method, target, headers, body):
+        """Route a request, returning (status, JSON payload or None)"""
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/")
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return 400, {"status": 400, "message": "Invalid JSON"}
+
+        if method == "POST" and path == "/api/auth/login":
+            return 200, {"token": STUB_TOKEN, "refreshToken": STUB_TOKEN}
+
+        match = DEVICE_TELEMETRY_PATH.match(path)
+        if method == "POST" and match:
+            device_id = self.devices_by_token.get(match.group(1))
+            if device_id is None:
+                return (401, {"status": 401, "message": "Invalid device token"}) if self.strict_tokens else (200, None)
+            self.store_timeseries(device_id, data or {})
+            return 200, None
+
+        if headers.get("x-authorization") != f"Bearer {STUB_TOKEN}":
+            return 401, {"status": 401, "message": "Authentication failed"}
+
+        if method == "GET" and path in PAGED_COLLECTIONS:
+            return 200, self.page(PAGED_COLLECTIONS[path], query)
+
+        if method == "POST" and path in CREATE_PATHS:
+            entity_type, data = CREATE_PATHS[path], data or {}
+            ref = data.get("id")
+            if isinstance(ref, dict) and ref.get("id"):
+                if ref["id"] not in self.entities[entity_type]:
+                    return 404, {"status": 404, "message": "Requested item wasn't found"}
+                entity = self.update_entity(entity_type, data)
+            else:
+                entity = self.add_entity(entity_type, data)
+            if entity is None:
+                return 400, {"status": 400, "message": "Entity with such name already exists or name is missing"}
+            return 200, entity
+
+        match = ENTITY_PATH.match(path)
+        if method == "GET" and match:
+            entity = self.entities[CREATE_PATHS[match.group(1)]].get(match.group(2))
+            if entity is None:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            return 200, entity
+
+        if method == "POST" and path == "/api/device-with-credentials":
+            credentials = (data or {}).get("credentials") or {}
+            entity = self.add_entity("DEVICE", (data or {}).get("device") or {}, credentials.get("credentialsId"))
+            if entity is None:
+                return 400, {"status": 400, "message": "Device name or access token already in use"}
+            return 200, entity
+
+        if method == "POST" and path == "/api/ruleChain/metadata":
+            chain_id = ((data or {}).get("ruleChainId") or {}).get("id")
+            if chain_id not in self.entities["RULE_CHAIN"]:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            nodes = [dict(node, id={"entityType": "RULE_NODE", "id": str(uuid.uuid4())})
+                     for node in data.get("nodes") or []]
+            self.rule_chain_metadata[chain_id] = dict(data, nodes=nodes)
+            self.entities["RULE_CHAIN"][chain_id]["version"] += 1
+            return 200, self.rule_chain_metadata[chain_id]
+
+        match = RULE_CHAIN_METADATA_PATH.match(path)
+        if method == "GET" and match:
+            metadata = self.rule_chain_metadata.get(match.group(1))
+            if metadata is None:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            return 200, metadata
+
+        match = RULE_CHAIN_ROOT_PATH.match(path)
+        if method == "POST" and match:
+            chain = self.entities["RULE_CHAIN"].get(match.group(1))
+            if chain is None:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            for other in self.entities["RULE_CHAIN"].values():
+                if other.get("type", "CORE") == chain.get("type", "CORE"):
+                    other["root"] = other is chain
+            return 200, chain
+
+        match = BUNDLE_FQNS_PATH.match(path)
+        if method == "POST" and match:
+            if match.group(1) not in self.entities["WIDGETS_BUNDLE"]:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            self.bundle_fqns[match.group(1)] = list(data or [])
+            self.entities["WIDGETS_BUNDLE"][match.group(1)]["version"] += 1
+            return 200, None
+
+        match = BUNDLE_FQNS_PATH.match(path)
+        if method == "GET" and match:
+            if match.group(1) not in self.entities["WIDGETS_BUNDLE"]:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            return 200, self.bundle_fqns.get(match.group(1), [])
+
+        if method == "POST" and path == ENTITY_QUERY_PATH:
+            result = self.entity_data_page(data or {})
+            if result is None:
+                return 400, {"status": 400, "message": "Unsupported entity filter"}
+            return 200, result
+
+        match = CREDENTIALS_PATH.match(path)
+        if method == "GET" and match:
+            device_id = match.group(1)
+            token = self.credentials.get(device_id)
+            if token is None:
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            return 200, {"deviceId": {"entityType": "DEVICE", "id": device_id},
+                         "credentialsType": "ACCESS_TOKEN", "credentialsId": token}
+
+        if method == "POST" and path == "/api/relation":
+            if not all(isinstance((data or {}).get(end), dict) and data[end].get("id") for end in ("from", "to")):
+                return 400, {"status": 400, "message": "Relation 'from' and 'to' are required"}
+            self.relations.setdefault(data["from"]["id"], []).append(data)
+            return 200, None
+
+        if method == "GET" and path == "/api/relations/info" and "toId" in query:
+            relations = []
+            for outgoing in self.relations.values():
+                for relation in outgoing:
+                    if relation["to"]["id"] == query["toId"]:
+                        source = relation["from"]
+                        source_entity = self.entities.get(source["entityType"], {}).get(source["id"], {})
+                        relations.append(dict(relation, fromName=source_entity.get("name")))
+            return 200, relations
+
+        if method == "GET" and path == "/api/relations/info":
+            relations = []
+            for relation in self.relations.get(query.get("fromId"), []):
+                to = relation["to"]
+                target_entity = self.entities.get(to["entityType"], {}).get(to["id"], {})
+                relations.append(dict(relation, toName=target_entity.get("name")))
+            return 200, relations
+
+        match = TELEMETRY_PATH.match(path)
+        if match:
+            entity_type, entity_id, action = match.groups()
+            if entity_id not in self.entities.get(entity_type, {}):
+                return 404, {"status": 404, "message": "Requested item wasn't found"}
+            kind, _, scope = action.rpartition("/")
+            if method == "POST" and kind == "attributes":
+                stored = self.attributes.setdefault((entity_id, scope), {})
+                for key, value in (data or {}).items():
+                    stored[key] = {"value": value, "lastUpdateTs": now_ms()}
+                return 200, None
+            if method == "GET" and kind == "values/attributes":
+                stored = self.attributes.get((entity_id, scope), {})
+                return 200, [dict(value, key=key) for key, value in stored.items()]
+            if method == "POST" and kind == "timeseries":
+                self.store_timeseries(entity_id, data or {})
+                return 200, None
+            if method == "GET" and action == "values/timeseries":
+                latest = self.timeseries.get(entity_id, {})
+                keys = query["keys"].split(",") if query.get("keys") else list(latest)
+                return 200, {
+                    key: [{"ts": latest[key]["ts"], "value": str(latest[key]["value"])}]
+                    for key in keys if key in latest
+                }
+
+        return 404, {"status": 404, "message": f"No stub route for {method} {path}"}
+
+
+def serve_forever(port=8080, mqtt_port=1883, reuse_port=False, quiet=False, latency_ms=0, jitter_ms=0,
+                  error_rate=0.0, strict_tokens=False):
+    """Run a stub until interrupted (also the entry point for stub worker processes)"""
+    server = StubThingsBoardServer(port=port, mqtt_port=mqtt_port, reuse_port=reuse_port, latency_ms=latency_ms,
+                                   jitter_ms=jitter_ms, error_rate=error_rate, strict_tokens=strict_tokens).start()
+    if not quiet:
+        print(f"✓ Stub ThingsBoard listening on {server.url} (MQTT on port {server.mqtt_port})")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run an in-memory ThingsBoard stand-in")
+    parser.add_argument("--port", type=int, default=8080, help="HTTP port")
+    parser.add_argument("--mqtt-port", type=int, default=1883, help="MQTT port for the gateway API")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random delay up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 500 (login is never failed)")
+    parser.add_argument("--strict-tokens", action="store_true",
+                        help="Reject device telemetry for unknown access tokens with a 401")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve_forever(port=args.port, mqtt_port=args.mqtt_port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                  error_rate=args.error_rate, strict_tokens=args.strict_tokens)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Telemetry Recorder and Replayer
+Captures the telemetry the simulator successfully sends to an append-only,
+gzip-compressed JSONL file ({"t": ts ms, "d": device name, "v": values} per
+line; field asset telemetry adds "e": "ASSET") and replays it at 1x, Nx or
+maximum speed with the original spacing scaled.
+"""
+
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPLAY_WORKERS = 8  # Max in-flight sends during replay
+
+
+class TelemetryRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.lock = threading.Lock()  # Sync sends, async workers and field telemetry threads share the file
+        # Appending adds a new gzip member; readers see one continuous stream
+        self.file = gzip.open(path, "at", encoding="utf-8")
+
+    def write(self, ts, name, values, entity_type="DEVICE"):
+        record = {"t": ts, "d": name, "v": values}
+        if entity_type != "DEVICE":
+            record["e"] = entity_type
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.records += 1
+
+    def close(self):
+        self.file.close()
+
+
+def iter_recording(path, seek_seconds=0):
+    """Stream records from a recording, skipping the first seek_seconds of it"""
+    first_ts = None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if first_ts is None:
+                first_ts = record["t"]
+            if record["t"] - first_ts >= seek_seconds * 1000:
+                yield record
+
+
+def replay(simulator, path, speed=1.0, seek_seconds=0, preserve_timestamps=False, workers=REPLAY_WORKERS):
+    """Re-send a recording through the simulator's client.
+
+    speed scales the original inter-arrival spacing (2 = twice as fast);
+    0 sends as fast as possible.
+    """
+    stats = {"sent": 0, "failed": 0, "skipped": 0}
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(workers)
+
+    def send(record_type, target, payload):
+        try:
+            if record_type == "ASSET":
+                ok = simulator.send_asset_telemetry(target, payload)
+            else:
+                ok = simulator.send_telemetry(target, payload)
+        except Exception:
+            ok = False
+        with lock:
+            stats["sent" if ok else "failed"] += 1
+        in_flight.release()
+
+    print("\n" + "="*60)
+    print(f"Replaying {path} at {'max speed' if not speed else f'{speed:g}x'}"
+          + (f" from +{seek_seconds}s" if seek_seconds else ""))
+    print("="*60)
+
+    base_ts = None
+    start = time.perf_counter()
+    last_report = start
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for record in iter_recording(path, seek_seconds):
+            record_type = record.get("e", "DEVICE")
+            if record_type == "ASSET":
+                target = simulator.asset_ids.get(record["d"])
+            else:
+                target = (simulator.device_tokens.get(record["d"]) or {}).get('token')
+            if target is None:
+                stats["skipped"] += 1
+                continue
+
+            if base_ts is None:
+                base_ts = record["t"]
+            if speed:
+                delay = start + (record["t"] - base_ts) / 1000.0 / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            payload = {"ts": record["t"], "values": record["v"]} if preserve_timestamps else record["v"]
+            in_flight.acquire()
+            pool.submit(send, record_type, target, payload)
+
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                last_report = now
+                print(f"  {stats['sent']} sent, {stats['failed']} failed, "
+                      f"{stats['sent'] / (now - start):.0f} msg/s")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Replay complete: {stats['sent']} sent, {stats['failed']} failed, "
+          f"{stats['skipped']} unknown devices/fields skipped in {elapsed:.1f}s "
+          f"({stats['sent'] / elapsed if elapsed else 0:.0f} msg/s)\n")
+    return stats